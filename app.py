@@ -1,44 +1,56 @@
+import os
+
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 import plotly.express as px
 
 # Tus módulos personalizados
 import core.priorizacion
 import ui.session_manager
 import core.agendador
+import core.asistencia
+import core.analitica
+import core.kpis
 from data.conexion_sqlite import ConexionSQLite
 
 # --- 1. CONFIGURACIÓN Y CARGA INICIAL ---
 st.set_page_config(page_title="Gestión Bibliotecaria", layout="wide", page_icon="📚")
 
+# Copy-on-write de pandas para toda la app: las sesiones toman copias superficiales de las
+# tablas compartidas (data/almacen_compartido.py) y solo se duplica la columna que se modifica
+pd.set_option("mode.copy_on_write", True)
+
+# Cantidad de usuarios que se muestran en el ranking de pendientes
+TOP_RANKING = 100
+# Citas por página en el panel de gestión de asignaciones
+CITAS_POR_PAGINA = 20
+# Cada cuánto cada sesión revisa si cambiaron las tablas, para refrescar los paneles sin
+# controles (tarjetas KPI y ranking). Se configura con la variable de entorno
+# REFRESCO_PANELES (ej. "2min"); "0" lo desactiva (se refrescan al interactuar con la página)
+REFRESCO_PANELES = os.environ.get("REFRESCO_PANELES", "30s")
+if REFRESCO_PANELES.strip() in ("", "0"):
+    REFRESCO_PANELES = None
+# Tablas que muestran esos paneles
+TABLAS_PANELES = ("usuarios", "recursos", "asignaciones")
+
 
 # ---------------------------
 # Acciones: marcar entregado / ausente
 # ---------------------------
+# Se usan como on_click de los botones: corren ANTES de dibujar la página,
+# así que no hace falta st.rerun() para ver el cambio.
 def marcar_entregado(id_asig):
-    """Actualiza el estado de una asignación a 'entregado' en la DB."""
+    """Actualiza el estado de una asignación a 'entregado' en la DB (y en la sesión, sin recargar)."""
     datos_a_actualizar = {
         "estado": "entregado",
         "creado_ts": datetime.now().isoformat()
     }
-    condicion_where = "id = ?"
-    argumentos_where = (id_asig,)
-
-    exito = conexion_activa.actualizar_registros(
-        "asignaciones",
-        datos_a_actualizar,
-        condicion_where,
-        argumentos_where
-    )
-    if exito:
-        st.success("Marcado como entregado ✅")
-        conexion_activa.cargar_tabla_df.clear()
 
-        # Borrar caché de sesión para forzar recarga
-        if "asignaciones" in st.session_state: del st.session_state["asignaciones"]
-
-        st.rerun()
+    # Write-through: 1 UPDATE en SQLite + el mismo cambio en la fila de la sesión
+    exito = ui.session_manager.escribir_fila("asignaciones", int(id_asig), datos_a_actualizar)
+    if exito:
+        st.toast("Marcado como entregado ✅")
     else:
         st.error("Error al actualizar el estado.")
 
@@ -57,90 +69,46 @@ def marcar_ausente(id_asig):
         st.error("Asignación no encontrada")
         return
 
-    # --- CORRECCIÓN DE BUG: Manejo robusto de NULL/NaN ---
-    val_intentos = fila.iloc[0]["intentos_fallidos"]
-
-    # Verificamos explícitamente si es nulo usando pd.isna()
-    if pd.isna(val_intentos) or val_intentos is None or val_intentos == "":
-        intentos_actuales = 0
-    else:
-        try:
-            intentos_actuales = int(val_intentos)
-        except ValueError:
-            intentos_actuales = 0
-    # -----------------------------------------------------
-
-    id_usuario = int(fila.iloc[0]["id_usuario"])
-    id_recurso = int(fila.iloc[0]["id_recurso"])
-    fecha_actual_str = fila.iloc[0]["fecha_cita"]
-
-    # --- LÓGICA DE STRIKES ---
-
-    if intentos_actuales == 0:
-        # === STRIKE 1: REPROGRAMAR ===
-
-        # 1. Calcular fecha siguiente (Mañana)
-        try:
-            # Intentamos parsear la fecha actual
-            fecha_dt = datetime.strptime(fecha_actual_str, "%Y-%m-%d")
-        except (ValueError, TypeError):
-            # Si falla, usamos hoy como base
-            fecha_dt = datetime.now()
-
-        nueva_fecha = (fecha_dt + timedelta(days=1)).strftime("%Y-%m-%d")
-
-        # 2. Preparar actualización
-        datos_a_actualizar = {
-            "intentos_fallidos": intentos_actuales + 1,
-            "estado": "ausente_1",
-            "fecha_cita": nueva_fecha,  # <--- ¡ESTO LO MUEVE DE PESTAÑA!
-            "creado_ts": datetime.now().isoformat()
-        }
-
-        exito = conexion_activa.actualizar_registros(
-            "asignaciones",
-            datos_a_actualizar,
-            "id = ?",
-            (id_asig,)
-        )
-
-        if exito:
+    # La lógica de strikes es la misma que la del cierre masivo de jornada (core/asistencia.py)
+    try:
+        resumen = core.asistencia.registrar_asistencia(conexion_activa, [], [id_asig])
+        if resumen["reprogramados"]:
+            nueva_fecha = core.asistencia.dia_siguiente(fila.iloc[0]["fecha_cita"])
             st.toast(f"Reprogramado para {nueva_fecha} (Falta 1/2).", icon="📅")
+        else:
+            st.toast("Usuario eliminado del sistema por inasistencias.", icon="🚫")
+    except Exception as e:
+        st.error(f"Error al registrar la falta (no se aplicó ningún cambio): {e}")
 
-    else:
-        # === STRIKE 2: ELIMINACIÓN TOTAL ===
-
-        # 1. Liberar el recurso (volver a disponible)
-        conexion_activa.actualizar_registros(
-            "recursos",
-            {"estado": "disponible"},
-            "id = ?",
-            (id_recurso,)
-        )
-
-        # 2. Eliminar la ASIGNACIÓN (borrar registro)
-        conexion_activa.eliminar_registros(
-            "asignaciones",
-            "id = ?",
-            (id_asig,)
-        )
+    # --- LIMPIEZA FINAL ---
+    # Al dibujar la página, init_session trae a la sesión solo las filas que cambiaron
+    # en las 3 tablas (delta con lápidas para los borrados), sin recargarlas enteras
 
-        # 3. Eliminar al USUARIO (borrar registro para que no vuelva a postular)
-        conexion_activa.eliminar_registros(
-            "usuarios",
-            "id = ?",
-            (id_usuario,)
-        )
 
-        st.toast("Usuario eliminado del sistema por inasistencias.", icon="🚫")
+def cerrar_jornada(fecha, edicion: pd.DataFrame):
+    """
+    Asistencia masiva de un día: aplica en UNA transacción todas las filas marcadas
+    como 'Entregado' o 'Falta' en el editor de la pestaña.
+    """
+    entregados = edicion.loc[edicion["Entregado"] & ~edicion["Falta"], "id"].tolist()
+    ausentes = edicion.loc[edicion["Falta"] & ~edicion["Entregado"], "id"].tolist()
 
-    # --- LIMPIEZA FINAL ---
-    # Forzamos recarga de TODO porque hemos tocado las 3 tablas
-    conexion_activa.cargar_tabla_df.clear()
+    if (edicion["Entregado"] & edicion["Falta"]).any():
+        st.error("Hay citas marcadas como 'Entregado' y 'Falta' a la vez. Corrija antes de guardar.")
+        return
+    if not entregados and not ausentes:
+        st.warning(f"No se marcó ninguna cita del {fecha}.")
+        return
 
-    if "asignaciones" in st.session_state: del st.session_state["asignaciones"]
-    if "recursos" in st.session_state: del st.session_state["recursos"]
-    if "usuarios" in st.session_state: del st.session_state["usuarios"]
+    try:
+        resumen = core.asistencia.registrar_asistencia(conexion_activa, entregados, ausentes)
+        st.toast(
+            f"Jornada {fecha}: {resumen['entregados']} entregadas, {resumen['reprogramados']} reprogramadas, "
+            f"{resumen['eliminados']} eliminadas por inasistencias.", icon="✅"
+        )
+    except Exception as e:
+        st.error(f"Error al cerrar la jornada (no se aplicó ningún cambio): {e}")
+        return
 
     st.rerun()
 
@@ -307,12 +275,6 @@ def crear_tarjeta_financiera(demanda, stock, deficit, costo_unit, costo_total):
     """
 
 
-def binario_a_si_no_local(serie):
-    s = serie.astype(str).str.strip().str.lower().fillna("")
-    si_vals = {"1", "true", "t", "si", "sí", "yes", "y"}
-    return s.map(lambda v: "Sí" if v in si_vals else "No")
-
-
 # Estilo Gráfico: Fondo blanco explícito
 def estilo_grafico(fig):
     fig.update_layout(
@@ -326,6 +288,295 @@ def estilo_grafico(fig):
     return fig
 
 
+# Figuras memoizadas: se arman con los agregados de core/analitica.py (pocas filas)
+# y solo se vuelven a construir si esos conteos cambian.
+@st.cache_data(max_entries=32, show_spinner=False)
+def figura_histograma(datos, x, nbins, color):
+    # Histograma con pesos: una fila por valor distinto, 'n' usuarios en cada una
+    fig = px.histogram(datos, x=x, y="n", histfunc="sum", nbins=nbins, color_discrete_sequence=[color])
+    fig.update_yaxes(title_text="count")
+    return estilo_grafico(fig)
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def figura_barras_ocupacion(conteo):
+    datos = conteo.reset_index()
+    datos.columns = ["Ocupación", "Cantidad"]
+    fig = px.bar(datos, x="Ocupación", y="Cantidad", color="Cantidad", color_continuous_scale="Teal")
+    fig = estilo_grafico(fig)
+    fig.update_layout(xaxis_tickangle=-45, margin=dict(b=100))
+    return fig
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def figura_torta(datos, colores):
+    fig = px.pie(values=datos.values, names=datos.index, color_discrete_sequence=colores, hole=0.4)
+    fig = estilo_grafico(fig)
+    fig.update_layout(showlegend=False, margin=dict(t=0, b=0, l=0, r=0))
+    return fig
+
+
+# --- 4. PANELES DEL DASHBOARD (fragmentos) ---
+# Cada panel es un st.fragment: sus botones y controles vuelven a correr SOLO ese panel,
+# no la página completa (CSS, tarjetas, ranking y gráficos de la analítica).
+# Tarjetas y ranking no tienen controles propios: vigilar_cambios() vuelve a correr la página
+# cuando cambian sus tablas (lo marcado en el panel de asignaciones o en otra sesión).
+
+def versiones_paneles() -> tuple:
+    """Versión de las tablas de los paneles (cambia con cada escritura; ver ConexionSQLite.version_tabla)."""
+    return tuple(conexion_activa.version_tabla(tabla) for tabla in TABLAS_PANELES)
+
+
+@st.fragment(run_every=REFRESCO_PANELES)
+def vigilar_cambios():
+    """
+    No dibuja nada: cada REFRESCO_PANELES compara las versiones de las tablas con las de la
+    última vez que se dibujó la página, y solo si cambiaron la vuelve a correr. Una sesión
+    abierta sin cambios no vuelve a dibujar ni a enviar tarjetas y ranking.
+    """
+    if versiones_paneles() != st.session_state.get("versiones_paneles"):
+        st.rerun()
+
+
+@st.fragment
+def panel_kpis():
+    # Una sola consulta agregada en SQLite (cacheada hasta que se escriba en las tablas)
+    kpis = core.kpis.obtener_kpis(conexion_activa)
+
+    c1, c2, c3, c4 = st.columns(4)
+    with c1:
+        st.markdown(crear_tarjeta_kpi(" Usuarios", kpis["total_usuarios"]), unsafe_allow_html=True)
+    with c2:
+        st.markdown(crear_tarjeta_kpi(" Recursos", kpis["total_recursos"]), unsafe_allow_html=True)
+    with c3:
+        st.markdown(crear_tarjeta_kpi(" Disponibles", kpis["disponibles"]), unsafe_allow_html=True)
+    with c4:
+        st.markdown(crear_tarjeta_kpi(" Asignados Hoy", kpis["asignados"]), unsafe_allow_html=True)
+
+
+@st.fragment
+def panel_ranking():
+    # Traer a la sesión lo que otros paneles/sesiones escribieron (barato si no hubo cambios)
+    ui.session_manager.sincronizar_tablas()
+
+    st.subheader("Ranking (pendientes)")
+
+    # Leemos los primeros del índice de prioridad (ya ordenado): no se reordena a todos
+    indice_pendientes = core.priorizacion.obtener_indice_pendientes()
+
+    if len(indice_pendientes) > 0:
+        usuarios_ord = core.priorizacion.top_pendientes(TOP_RANKING)
+
+        st.dataframe(usuarios_ord[["id", "nombre", "ocupacion", "puntaje"]], use_container_width=True)
+        if len(indice_pendientes) > TOP_RANKING:
+            st.caption(f"Mostrando los {TOP_RANKING} primeros de {len(indice_pendientes)} pendientes.")
+    else:
+        st.info("¡No hay usuarios pendientes en la cola!")
+
+
+@st.fragment
+def panel_asignaciones():
+    st.subheader("Gestión de Asignaciones (Por Fecha)")
+
+    # Citas ACTIVAS ('asignado', 'ausente_1'); el historial 'entregado'/'eliminado' no se trae
+    filtro_activas = "estado IN (?, ?)"
+    estados_activos = ("asignado", "ausente_1")
+
+    # 1. Partir por día UNA sola vez: GROUP BY fecha_cita en SQLite (solo conteos, no filas)
+    citas_por_dia = conexion_activa.consultar(
+        "asignaciones", ["fecha_cita", "COUNT(*) AS n"], filtro_activas, estados_activos,
+        order_by="fecha_cita", group_by="fecha_cita"
+    )
+
+    if not citas_por_dia.empty:
+        citas_por_dia = citas_por_dia.dropna(subset=["fecha_cita"])
+        conteo_dia = dict(zip(citas_por_dia["fecha_cita"], citas_por_dia["n"]))
+
+        if conteo_dia:
+            # 2. Solo se dibuja el día elegido (no una pestaña llena por cada fecha)
+            fecha = st.selectbox(
+                "Día de atención", list(conteo_dia),
+                format_func=lambda f: f"📅 {f} ({conteo_dia[f]} citas)",
+                key="dia_gestion"
+            )
+            filtro_dia = f"{filtro_activas} AND fecha_cita = ?"
+            args_dia = estados_activos + (fecha,)
+            columnas_cita = ["id", "id_usuario", "id_recurso", "estado", "fecha_cita"]
+
+            # --- ASISTENCIA MASIVA: marcar muchas citas del día y guardar una sola vez ---
+            if st.toggle("Asistencia masiva", key=f"masivo_{fecha}"):
+                asign_dia = conexion_activa.consultar("asignaciones", columnas_cita, filtro_dia, args_dia,
+                                                      order_by="id")
+                with st.form(f"form_asistencia_{fecha}", border=False):
+                    tabla_dia = asign_dia[["id", "id_usuario", "id_recurso", "estado"]].assign(
+                        Entregado=False, Falta=False
+                    )
+                    edicion = st.data_editor(
+                        tabla_dia,
+                        key=f"editor_asistencia_{fecha}",
+                        hide_index=True,
+                        use_container_width=True,
+                        disabled=["id", "id_usuario", "id_recurso", "estado"],
+                    )
+                    if st.form_submit_button(f"Guardar jornada {fecha}", type="primary",
+                                             use_container_width=True):
+                        cerrar_jornada(fecha, edicion)
+            else:
+                # 3. Paginación en el servidor: solo se leen y dibujan las citas de UNA página
+                total_paginas = max(1, -(-int(conteo_dia[fecha]) // CITAS_POR_PAGINA))
+                pagina = 1
+                if total_paginas > 1:
+                    pagina = st.number_input(f"Página (de {total_paginas})", min_value=1,
+                                             max_value=total_paginas, value=1, key=f"pagina_{fecha}")
+                asign_pagina = conexion_activa.consultar(
+                    "asignaciones", columnas_cita, filtro_dia, args_dia, order_by="id",
+                    limite=CITAS_POR_PAGINA, desplazamiento=(pagina - 1) * CITAS_POR_PAGINA
+                )
+
+                for row in asign_pagina.to_dict("records"):
+                    estado_actual = row['estado']
+                    icono = "🔹" if estado_actual == "asignado" else "⚠️"  # ausente_1
+
+                    with st.expander(
+                            f"{icono} Cita #{row['id']} - Usuario {row['id_usuario']} ({estado_actual})"):
+                        col_info, col_btns = st.columns([2, 1])
+                        with col_info:
+                            st.write(f"**Recurso ID:** {row['id_recurso']}")
+                            st.write(f"**Puntaje:** {row.get('puntaje_snapshot', 'N/A')}")
+                        with col_btns:
+                            # Aquí solo mostramos botones de acción porque SON activas
+                            st.button("✅ Entregado", key=f"ent_{row['id']}", use_container_width=True,
+                                      on_click=marcar_entregado, args=(row['id'],))
+                            st.button("🚫 Falta", key=f"aus_{row['id']}", use_container_width=True,
+                                      on_click=marcar_ausente, args=(row['id'],))
+        else:
+            st.info("Hay asignaciones activas pero sin fecha válida.")
+    else:
+        st.info("¡Todo al día! No hay citas pendientes de atención.")
+
+
+@st.fragment
+def panel_criterios_y_ejecucion():
+    with st.expander("⚙ Criterios", expanded=st.session_state.editando):
+        # ... (Tus controles de sliders)
+        pesos_ctrl = st.session_state["temp_pesos"]
+        disabled = not st.session_state.editando
+
+        # --- CORRECCIÓN: Asignar el valor de retorno al diccionario ---
+
+        pesos_ctrl["ocupacion"] = st.slider(
+            "Ocupación", 1, 10,
+            key="s_ocup",
+            value=pesos_ctrl["ocupacion"],
+            disabled=disabled
+        )
+
+        pesos_ctrl["edad"] = st.slider(
+            "Edad", 1, 10,
+            key="s_edad",
+            value=pesos_ctrl["edad"],
+            disabled=disabled
+        )
+
+        pesos_ctrl["acceso_internet"] = st.slider(
+            "Internet", 1, 10,
+            key="s_net",
+            value=pesos_ctrl["acceso_internet"],
+            disabled=disabled
+        )
+
+        pesos_ctrl["dispositivo_propio"] = st.slider(
+            "Dispositivo", 1, 10,
+            key="s_dev",
+            value=pesos_ctrl["dispositivo_propio"],
+            disabled=disabled
+        )
+        # ... (Logica de guardar pesos) ...
+        if st.session_state.editando:
+            # Cambiar pesos afecta al ranking y a la analítica: se vuelve a correr la app completa
+            if st.button("Guardar"):
+                ui.session_manager.guardar_cambios()
+                st.rerun()
+        else:
+            st.button("Editar", on_click=ui.session_manager.cambiar_estado_edicion)
+
+    with st.container(border=True):
+        st.markdown("####  Ejecutar")
+        capacidad = st.number_input("Cupos", min_value=1, value=5)
+        fecha_inicio = st.date_input("Fecha", value=datetime.now().date())
+
+        if st.button(" Asignar", type="primary", use_container_width=True):
+            core.agendador.agendar_citas_disponibles(conexion_activa, capacidad, fecha_inicio)
+
+            # Al volver a correr, init_session trae solo las citas y recursos nuevos (delta)
+            st.rerun()
+
+
+@st.fragment
+def panel_analitica():
+    usuarios_df = st.session_state["usuarios"]
+
+    if usuarios_df.empty:
+        st.warning("Sin datos.")
+    else:
+        # --- 1. TARJETA FINANCIERA (HTML PURO - FONDO BLANCO GARANTIZADO) ---
+        # Mismos KPIs (y misma fórmula de demanda) que la estimación de presupuesto del agendador
+        kpis = core.kpis.obtener_kpis(conexion_activa)
+
+        # Renderizamos el componente HTML puro (Este SI o SI será blanco)
+        st.markdown(
+            crear_tarjeta_financiera(kpis["demanda"], kpis["stock"], kpis["deficit"], kpis["costo_unitario"],
+                                     kpis["presupuesto_total"]),
+            unsafe_allow_html=True)
+
+        # --- 2. GRÁFICOS (Dentro de contenedores con borde) ---
+        # Conteos agregados (GROUP BY cacheado por versión de la tabla), no la tabla completa
+        g1, g2 = st.columns(2)
+
+        with g1:
+            with st.container(border=True):
+                st.markdown("<h5>Distribución de Puntajes</h5>", unsafe_allow_html=True)
+                if "puntaje" in usuarios_df.columns:
+                    fig = figura_histograma(core.analitica.distribucion_puntajes(), "puntaje", 15, "#3e9786")
+                    st.plotly_chart(fig, use_container_width=True, theme=None)
+
+        with g2:
+            with st.container(border=True):
+                st.markdown("<h5>Distribución de Edades</h5>", unsafe_allow_html=True)
+                if "edad" in usuarios_df.columns:
+                    datos = core.analitica.distribucion_valores(conexion_activa, "edad")
+                    fig = figura_histograma(datos, "edad", 10, "#264653")
+                    st.plotly_chart(fig, use_container_width=True, theme=None)
+
+        if "ocupacion" in usuarios_df.columns:
+            with st.container(border=True):
+                st.markdown("<h5>Ocupaciones Registradas</h5>", unsafe_allow_html=True)
+                fig = figura_barras_ocupacion(core.analitica.conteo_categorias(conexion_activa, "ocupacion"))
+                st.plotly_chart(fig, use_container_width=True, theme=None)
+
+        # --- 3. PIE CHARTS ---
+        p1, p2, p3 = st.columns(3)
+
+
+        def plot_pie_wrapper(col, titulo, datos, colores):
+            with col:
+                with st.container(border=True):
+                    st.markdown(f"<h5>{titulo}</h5>", unsafe_allow_html=True)
+                    st.plotly_chart(figura_torta(datos, colores), use_container_width=True, theme=None)
+
+
+        if "sexo" in usuarios_df.columns:
+            plot_pie_wrapper(p1, "Sexo", core.analitica.conteo_categorias(conexion_activa, "sexo"),
+                             ["#3e9786", "#e9c46a"])
+
+        if "internet" in usuarios_df.columns:
+            datos = core.analitica.conteo_si_no(conexion_activa, "internet")
+            plot_pie_wrapper(p2, "Internet", datos, ["#264653", "#babbbd"])
+
+        if "dispositivo" in usuarios_df.columns:
+            datos = core.analitica.conteo_si_no(conexion_activa, "dispositivo")
+            plot_pie_wrapper(p3, "Dispositivo", datos, ["#e76f51", "#babbbd"])
+
 # --- 3. NAVEGACIÓN ---
 def navegar_a(pagina):
     st.session_state.pagina_actual = pagina
@@ -380,10 +631,11 @@ if st.session_state.pagina_actual == "Registrar usuario":
                     "fecha_registro": datetime.now().date().isoformat(),
                     "puntaje": 0.0
                 }
-                usuarios = pd.concat([usuarios, pd.DataFrame([nuevo])], ignore_index=True)
-                st.session_state["usuarios"] = usuarios
-                conexion_activa.insertar_registro("usuarios", nuevo)
-                core.priorizacion.recalcular_puntajes_asignaciones()
+                # 'puntaje' es una columna virtual: no existe en la tabla de la DB
+                conexion_activa.insertar_registro("usuarios", {k: v for k, v in nuevo.items() if k != "puntaje"})
+                # Se publica en el almacén compartido y la sesión toma solo la fila nueva
+                # (se puntúa solo esa fila, no toda la tabla)
+                ui.session_manager.sincronizar_tablas()
                 st.success(f" Ficha creada.")
 
 # ==========================================
@@ -392,25 +644,12 @@ if st.session_state.pagina_actual == "Registrar usuario":
 elif st.session_state.pagina_actual == "Dashboard":
     st.title(" Torre de Control")
 
-    # --- KPI CARDS ---
-    usuarios_df = st.session_state["usuarios"]
-    asignaciones_df = st.session_state["asignaciones"]
-    recursos_df = st.session_state["recursos"]
-
-    total_usuarios = len(usuarios_df)
-    total_recursos = len(recursos_df)
-    disponibles = len(recursos_df[recursos_df["estado"] == "disponible"])
-    asignados = len(asignaciones_df[asignaciones_df["estado"] == "asignado"]) if not asignaciones_df.empty else 0
+    # Lo que se dibuja a continuación corresponde a estas versiones de las tablas
+    st.session_state["versiones_paneles"] = versiones_paneles()
+    vigilar_cambios()
 
-    c1, c2, c3, c4 = st.columns(4)
-    with c1:
-        st.markdown(crear_tarjeta_kpi(" Usuarios", total_usuarios), unsafe_allow_html=True)
-    with c2:
-        st.markdown(crear_tarjeta_kpi(" Recursos", total_recursos), unsafe_allow_html=True)
-    with c3:
-        st.markdown(crear_tarjeta_kpi(" Disponibles", disponibles), unsafe_allow_html=True)
-    with c4:
-        st.markdown(crear_tarjeta_kpi(" Asignados Hoy", asignados), unsafe_allow_html=True)
+    # --- KPI CARDS ---
+    panel_kpis()
 
     st.markdown("---")
     tab_gestion, tab_analitica = st.tabs([" Gestión Operativa", " Estadísticas e Insights"])
@@ -419,215 +658,11 @@ elif st.session_state.pagina_actual == "Dashboard":
         col_izq, col_der = st.columns([2, 1])
         with col_izq:
             with st.container(border=True):
-                st.subheader("Ranking (pendientes)")
-
-                # Forzar recarga si acabamos de asignar (doble seguridad)
-                df_asig = st.session_state["asignaciones"]
-                ids_excluir = set()
-
-                if not df_asig.empty:
-                    # Aseguramos que la columna id_usuario sea ENTERO
-                    # errors='coerce' convierte basura en NaN, fillna(0) lo hace 0, astype(int) lo hace entero
-                    df_asig_clean = df_asig.copy()
-                    df_asig_clean["id_usuario"] = pd.to_numeric(df_asig_clean["id_usuario"], errors='coerce').fillna(
-                        0).astype(int)
-
-                    ids_excluir = set(
-                        df_asig_clean[df_asig_clean["estado"].isin(["asignado", "entregado"])]["id_usuario"]
-                    )
-
-                # Filtrar
-                df_usuarios = st.session_state["usuarios"]
-                # Aseguramos que el ID de usuario también sea entero para comparar peras con peras
-                usuarios_pendientes_visual = df_usuarios[~df_usuarios["id"].astype(int).isin(ids_excluir)]
-
-                # 3. Ordenar y mostrar
-                if not usuarios_pendientes_visual.empty:
-                    usuarios_ord = usuarios_pendientes_visual.sort_values(
-                        ["puntaje", "fecha_registro"],
-                        ascending=[False, True]
-                    ).reset_index(drop=True)
-
-                    st.dataframe(usuarios_ord[["id", "nombre", "ocupacion", "puntaje"]], use_container_width=True)
-                else:
-                    st.info("¡No hay usuarios pendientes en la cola!")
-
-                # --- FIN DEL FILTRO ---
-            st.subheader("Gestión de Asignaciones (Por Fecha)")
-
-            asign = st.session_state["asignaciones"]
-
-            if not asign.empty:
-                # 1. Separar ACTIVAS vs HISTORIAL
-                # Activas: 'asignado', 'ausente_1'
-                # Historial: 'entregado', 'eliminado'
-                asign_activas = asign[asign["estado"].isin(["asignado", "ausente_1"])].copy()
-                asign_historial = asign[asign["estado"].isin(["entregado", "eliminado"])].copy()
-
-                # --- SECCIÓN DE PESTAÑAS (Solo para activas) ---
-                if not asign_activas.empty:
-                    # Asegurar orden
-                    asign_activas = asign_activas.sort_values("fecha_cita")
-                    fechas_unicas = asign_activas["fecha_cita"].unique()
-                    fechas_unicas = sorted([f for f in fechas_unicas if f is not None])
-
-                    if len(fechas_unicas) > 0:
-                        # Crear pestañas dinámicas
-                        tabs = st.tabs([f"📅 {f}" for f in fechas_unicas])
-
-                        for i, fecha in enumerate(fechas_unicas):
-                            with tabs[i]:
-                                asign_dia = asign_activas[asign_activas["fecha_cita"] == fecha]
-
-                                for index, row in asign_dia.iterrows():
-                                    estado_actual = row['estado']
-                                    icono = "🔹" if estado_actual == "asignado" else "⚠️"  # ausente_1
-
-                                    with st.expander(
-                                            f"{icono} Cita #{row['id']} - Usuario {row['id_usuario']} ({estado_actual})"):
-                                        col_info, col_btns = st.columns([2, 1])
-                                        with col_info:
-                                            st.write(f"**Recurso ID:** {row['id_recurso']}")
-                                            st.write(f"**Puntaje:** {row.get('puntaje_snapshot', 'N/A')}")
-                                        with col_btns:
-                                            # Aquí solo mostramos botones de acción porque SON activas
-                                            if st.button("✅ Entregado", key=f"ent_{row['id']}",
-                                                         use_container_width=True):
-                                                marcar_entregado(row['id'])
-                                            if st.button("🚫 Falta", key=f"aus_{row['id']}", use_container_width=True):
-                                                marcar_ausente(row['id'])
-                    else:
-                        st.info("Hay asignaciones activas pero sin fecha válida.")
-                else:
-                    st.info("¡Todo al día! No hay citas pendientes de atención.")
+                panel_ranking()
+            panel_asignaciones()
 
         with col_der:
-            with st.expander("⚙ Criterios", expanded=st.session_state.editando):
-                # ... (Tus controles de sliders)
-                pesos_ctrl = st.session_state["temp_pesos"]
-                disabled = not st.session_state.editando
-
-                # --- CORRECCIÓN: Asignar el valor de retorno al diccionario ---
-
-                pesos_ctrl["ocupacion"] = st.slider(
-                    "Ocupación", 1, 10,
-                    key="s_ocup",
-                    value=pesos_ctrl["ocupacion"],
-                    disabled=disabled
-                )
-
-                pesos_ctrl["edad"] = st.slider(
-                    "Edad", 1, 10,
-                    key="s_edad",
-                    value=pesos_ctrl["edad"],
-                    disabled=disabled
-                )
-
-                pesos_ctrl["acceso_internet"] = st.slider(
-                    "Internet", 1, 10,
-                    key="s_net",
-                    value=pesos_ctrl["acceso_internet"],
-                    disabled=disabled
-                )
-
-                pesos_ctrl["dispositivo_propio"] = st.slider(
-                    "Dispositivo", 1, 10,
-                    key="s_dev",
-                    value=pesos_ctrl["dispositivo_propio"],
-                    disabled=disabled
-                )
-                # ... (Logica de guardar pesos) ...
-                if st.session_state.editando:
-                    st.button("Guardar", on_click=ui.session_manager.guardar_cambios)
-                else:
-                    st.button("Editar", on_click=ui.session_manager.cambiar_estado_edicion)
-
-            with st.container(border=True):
-                st.markdown("####  Ejecutar")
-                capacidad = st.number_input("Cupos", min_value=1, value=5)
-                fecha_inicio = st.date_input("Fecha", value=datetime.now().date())
-
-                if st.button(" Asignar", type="primary", use_container_width=True):
-                    core.agendador.agendar_citas_disponibles(conexion_activa, capacidad, fecha_inicio)
-
-                    # --- AGREGAR ESTO PARA FORZAR RECARGA ---
-                    # Borramos las llaves viejas de la memoria
-                    if "asignaciones" in st.session_state: del st.session_state["asignaciones"]
-                    if "recursos" in st.session_state: del st.session_state["recursos"]
-                    # ----------------------------------------
-
-                    st.rerun()
+            panel_criterios_y_ejecucion()
 
     with tab_analitica:
-        if usuarios_df.empty:
-            st.warning("Sin datos.")
-        else:
-            # --- 1. TARJETA FINANCIERA (HTML PURO - FONDO BLANCO GARANTIZADO) ---
-            # Calculamos los datos aquí mismo para pasarlos al componente
-            # Supuesto: Demand = Total usuarios - Asignados (aproximado para el ejemplo)
-            demanda_real = len(usuarios_df) - len(asignaciones_df[asignaciones_df['estado'] == 'asignado'])
-            if demanda_real < 0: demanda_real = 0
-
-            stock_actual = len(recursos_df[recursos_df['estado'] == 'disponible'])
-            deficit = max(0, demanda_real - stock_actual)
-            costo_unitario = 960.00
-            presupuesto_total = deficit * costo_unitario
-
-            # Renderizamos el componente HTML puro (Este SI o SI será blanco)
-            st.markdown(
-                crear_tarjeta_financiera(demanda_real, stock_actual, deficit, costo_unitario, presupuesto_total),
-                unsafe_allow_html=True)
-
-            # --- 2. GRÁFICOS (Dentro de contenedores con borde) ---
-            g1, g2 = st.columns(2)
-
-            with g1:
-                with st.container(border=True):
-                    st.markdown("<h5>Distribución de Puntajes</h5>", unsafe_allow_html=True)
-                    if "puntaje" in usuarios_df.columns:
-                        fig = px.histogram(usuarios_df, x="puntaje", nbins=15, color_discrete_sequence=["#3e9786"])
-                        fig = estilo_grafico(fig)
-                        st.plotly_chart(fig, use_container_width=True, theme=None)
-
-            with g2:
-                with st.container(border=True):
-                    st.markdown("<h5>Distribución de Edades</h5>", unsafe_allow_html=True)
-                    if "edad" in usuarios_df.columns:
-                        fig = px.histogram(usuarios_df, x="edad", nbins=10, color_discrete_sequence=["#264653"])
-                        fig = estilo_grafico(fig)
-                        st.plotly_chart(fig, use_container_width=True, theme=None)
-
-            if "ocupacion" in usuarios_df.columns:
-                with st.container(border=True):
-                    st.markdown("<h5>Ocupaciones Registradas</h5>", unsafe_allow_html=True)
-                    conteo = usuarios_df["ocupacion"].value_counts().reset_index()
-                    conteo.columns = ["Ocupación", "Cantidad"]
-                    fig = px.bar(conteo, x="Ocupación", y="Cantidad", color="Cantidad", color_continuous_scale="Teal")
-                    fig = estilo_grafico(fig)
-                    fig.update_layout(xaxis_tickangle=-45, margin=dict(b=100))
-                    st.plotly_chart(fig, use_container_width=True, theme=None)
-
-            # --- 3. PIE CHARTS ---
-            p1, p2, p3 = st.columns(3)
-
-
-            def plot_pie_wrapper(col, titulo, datos, colores):
-                with col:
-                    with st.container(border=True):
-                        st.markdown(f"<h5>{titulo}</h5>", unsafe_allow_html=True)
-                        fig = px.pie(values=datos.values, names=datos.index, color_discrete_sequence=colores, hole=0.4)
-                        fig = estilo_grafico(fig)
-                        fig.update_layout(showlegend=False, margin=dict(t=0, b=0, l=0, r=0))
-                        st.plotly_chart(fig, use_container_width=True, theme=None)
-
-
-            if "sexo" in usuarios_df.columns:
-                plot_pie_wrapper(p1, "Sexo", usuarios_df["sexo"].value_counts(), ["#3e9786", "#e9c46a"])
-
-            if "internet" in usuarios_df.columns:
-                datos = binario_a_si_no_local(usuarios_df["internet"]).value_counts()
-                plot_pie_wrapper(p2, "Internet", datos, ["#264653", "#babbbd"])
-
-            if "dispositivo" in usuarios_df.columns:
-                datos = binario_a_si_no_local(usuarios_df["dispositivo"]).value_counts()
-                plot_pie_wrapper(p3, "Dispositivo", datos, ["#e76f51", "#babbbd"])
\ No newline at end of file
+        panel_analitica()
@@ -0,0 +1,73 @@
+# benchmarks/bench_conexion_sheets.py
+"""
+Compara la carga hoja por hoja de ConexionSheets.load_data (worksheet() + get_all_records(),
+2 peticiones por hoja) contra la carga en lote (1 sola petición values_batch_get),
+con un cliente falso en memoria que cuenta peticiones y simula la latencia de red.
+
+Verifica además que ambos caminos devuelven los MISMOS DataFrames
+(incluida la hoja 'Asignaciones' vacía, que se crea con sus columnas).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_conexion_sheets
+    python -m benchmarks.bench_conexion_sheets --filas 5000 --latencia 0.2
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from tests.fake_gspread import LibroFalso, conectar
+
+HOJAS = ["Usuarios", "Recursos", "Asignaciones"]
+
+
+def generar_libro(n: int, latencia: float, semilla: int = 42) -> LibroFalso:
+    """Libro falso con usuarios y recursos sintéticos y la hoja de asignaciones vacía."""
+    rng = np.random.default_rng(semilla)
+    usuarios = [["id", "nombre", "edad", "ocupacion", "internet", "dispositivo"]]
+    for i in range(1, n + 1):
+        fila = [i, f"Usuario {i}", int(rng.integers(0, 100)), rng.choice(["docente", "hogar", "jubilado"]),
+                int(rng.integers(0, 2)), int(rng.integers(0, 2))]
+        # Algunas filas con celdas vacías al final (la API no las devuelve)
+        usuarios.append(fila[:4] if i % 7 == 0 else fila)
+    recursos = [["id", "identificador", "tipo", "estado", "precio"]]
+    recursos += [[i, f"TAB-{i:05d}", "tablet", "disponible", "960.5"] for i in range(1, n // 10 + 1)]
+    return LibroFalso({"Usuarios": usuarios, "Recursos": recursos, "Asignaciones": []}, latencia=latencia)
+
+
+def medir_carga(libro: LibroFalso, batch: bool):
+    """Carga las hojas y devuelve (segundos, peticiones, datos)."""
+    conexion = conectar(libro)
+    libro.reiniciar_conteo()
+    inicio = time.perf_counter()
+    datos = conexion.load_data(HOJAS, batch=batch)
+    return time.perf_counter() - inicio, len(libro.peticiones), datos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=2_000)
+    parser.add_argument("--latencia", type=float, default=0.15, help="segundos simulados por petición")
+    args = parser.parse_args()
+
+    libro = generar_libro(args.filas, args.latencia)
+    t_hojas, p_hojas, datos_hojas = medir_carga(libro, batch=False)
+    t_lote, p_lote, datos_lote = medir_carga(libro, batch=True)
+
+    for hoja in HOJAS:
+        pd.testing.assert_frame_equal(datos_hojas[hoja], datos_lote[hoja])
+    assert list(datos_lote["Asignaciones"].columns) == ["id_usuario", "id_recurso", "puntaje", "estado",
+                                                        "fecha_cita", "intentos_fallidos"]
+    assert p_hojas == 2 * len(HOJAS) and p_lote == 1, (p_hojas, p_lote)
+
+    print(f"{len(HOJAS)} hojas, {args.filas:,} usuarios, latencia simulada {args.latencia * 1000:.0f} ms/petición")
+    print(f"{'modo':>14} | {'peticiones':>10} | {'tiempo (s)':>10}")
+    print("-" * 40)
+    print(f"{'hoja por hoja':>14} | {p_hojas:>10} | {t_hojas:>10.3f}")
+    print(f"{'en lote':>14} | {p_lote:>10} | {t_lote:>10.3f}")
+    print("✅ Mismos DataFrames en ambos modos")
+
+
+if __name__ == "__main__":
+    main()
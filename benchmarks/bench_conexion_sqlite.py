@@ -0,0 +1,70 @@
+# benchmarks/bench_conexion_sqlite.py
+"""
+Compara la inserción masiva con DataFrame.to_sql (camino anterior) contra
+ConexionSQLite.insertar_masivo (INSERT preparado + executemany en una transacción).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_conexion_sqlite
+    python -m benchmarks.bench_conexion_sqlite --tamanos 10000 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data.conexion_sqlite import ConexionSQLite
+
+
+def generar_lote(n: int, id_inicial: int) -> pd.DataFrame:
+    """Lote de asignaciones con la misma forma que el que arma el agendador."""
+    return pd.DataFrame({
+        "id": id_inicial + np.arange(n),
+        "id_usuario": np.arange(1, n + 1),
+        "id_recurso": np.arange(1, n + 1),
+        "puntaje": np.full(n, 61.0),
+        "estado": "asignado",
+        "fecha_cita": np.datetime_as_string(np.datetime64("2025-11-21") + np.arange(n) // 40, unit="D"),
+        "creado_ts": datetime.now().isoformat(),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        # DB nueva: las migraciones crean el esquema completo al abrir el pool
+        conexion = ConexionSQLite(os.path.join(carpeta, "bench.db"))
+        siguiente_id = 1
+
+        print(f"{'filas':>8} | {'to_sql (s)':>10} | {'insertar_masivo (s)':>19} | {'aceleración':>11}")
+        print("-" * 58)
+        for n in args.tamanos:
+            df = generar_lote(n, siguiente_id)
+            inicio = time.perf_counter()
+            with conexion.escritura() as conn:
+                df.to_sql(name="asignaciones", con=conn, if_exists="append", index=False)
+                conn.commit()
+            t_to_sql = time.perf_counter() - inicio
+            siguiente_id += n
+
+            df = generar_lote(n, siguiente_id)
+            inicio = time.perf_counter()
+            assert conexion.insertar_dataframe(df, "asignaciones")
+            t_masivo = time.perf_counter() - inicio
+            siguiente_id += n
+
+            print(f"{n:>8,} | {t_to_sql:>10.3f} | {t_masivo:>19.3f} | {t_to_sql / t_masivo:>10.1f}x")
+
+        with conexion.lectura() as conn:
+            total = conn.execute("SELECT COUNT(*) FROM asignaciones").fetchone()[0]
+        assert total == siguiente_id - 1, "faltan filas insertadas"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_priorizacion.py
+"""
+Compara el cálculo de puntajes fila a fila (apply) contra el motor vectorizado,
+y mide el costo de un cambio de pesos con los usuarios ya codificados
+(rellenar la tabla de puntajes + un gather).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_priorizacion
+    python -m benchmarks.bench_priorizacion --tamanos 10000 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.priorizacion import (calcular_puntaje_row, calcular_puntajes_vectorizado, codificar_usuarios,
+                               construir_tabla_puntajes, pesos_internos)
+
+PESOS_GLOBALES = {"ocupacion": 4, "acceso_internet": 5, "dispositivo_propio": 4, "edad": 3}
+PESOS_EDITADOS = {"ocupacion": 7, "acceso_internet": 2, "dispositivo_propio": 9, "edad": 5}
+
+
+def generar_usuarios(n: int, semilla: int = 42) -> pd.DataFrame:
+    """Genera n usuarios sintéticos con la misma forma que la tabla 'usuarios'."""
+    rng = np.random.default_rng(semilla)
+    ocupaciones = list(pesos_internos["ocupacion"].keys()) + ["Estudiante", "Empleado"]
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "edad": rng.integers(0, 100, n),
+        "ocupacion": rng.choice(ocupaciones, n),
+        "acceso_internet": rng.integers(0, 2, n),
+        "dispositivo_propio": rng.integers(0, 2, n),
+    })
+
+
+def medir(funcion, repeticiones: int = 1) -> tuple:
+    """Ejecuta la función y devuelve (mejor tiempo en segundos, resultado)."""
+    mejor, resultado = float("inf"), None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'usuarios':>10} | {'apply (s)':>10} | {'vectorizado (s)':>15} | {'aceleración':>11} | "
+          f"{'cambio de pesos (s)':>19}")
+    print("-" * 78)
+    for n in args.tamanos:
+        df = generar_usuarios(n)
+        t_apply, esperado = medir(lambda: df.apply(
+            calcular_puntaje_row, axis=1, pesos_internos=pesos_internos, pesos_globales=PESOS_GLOBALES))
+        t_vec, obtenido = medir(lambda: calcular_puntajes_vectorizado(df, pesos_internos, PESOS_GLOBALES),
+                                repeticiones=3)
+
+        # El motor vectorizado debe ser un reemplazo exacto
+        pd.testing.assert_series_equal(obtenido, esperado, check_names=False)
+
+        # Cambio de pesos: los usuarios ya están codificados, solo se rellena la tabla
+        codigos = codificar_usuarios(df, pesos_internos)
+        t_pesos, _ = medir(lambda: construir_tabla_puntajes(pesos_internos, PESOS_EDITADOS)[codigos],
+                           repeticiones=3)
+        print(f"{n:>10,} | {t_apply:>10.3f} | {t_vec:>15.4f} | {t_apply / t_vec:>10.0f}x | {t_pesos:>19.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_sheets_concurrente.py
+"""
+Mide el tiempo de pared de ConexionSheets.load_data sobre N hojas con un cliente falso
+que simula la latencia de red (y errores temporales de la API):
+
+1. Hoja por hoja, secuencial (hilos=1): 2 peticiones por hoja, una detrás de otra.
+2. Hoja por hoja, con el pool de hilos (hilos=8): las hojas independientes se leen a la vez.
+3. En lote (1 petición values_batch_get).
+4. Con el pool y ~20% de peticiones fallando con 429/503: los reintentos con espera
+   exponencial con jitter recuperan TODO y los DataFrames son los mismos.
+5. Con un límite de tasa bajo: el token bucket no deja pasar más peticiones que la cuota.
+
+Verifica que todos los modos devuelven los MISMOS DataFrames.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_sheets_concurrente
+    python -m benchmarks.bench_sheets_concurrente --hojas 30 --latencia 0.3 --hilos 8
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from data.conexion_sheets import LimitadorTasa
+from tests.fake_gspread import LibroFalso, conectar
+
+
+def generar_hojas(n_hojas: int, filas: int) -> dict:
+    """N hojas con el mismo esquema (p. ej. una por sede) y filas sintéticas."""
+    hojas = {}
+    for h in range(1, n_hojas + 1):
+        encabezado = ["id", "nombre", "edad", "ocupacion"]
+        hojas[f"Sede {h}"] = [encabezado] + [[i, f"Usuario {h}-{i}", 18 + (i * h) % 60, "hogar"]
+                                            for i in range(1, filas + 1)]
+    return hojas
+
+
+def medir(libro: LibroFalso, nombres: list, batch: bool, hilos: int, limitador: LimitadorTasa = None):
+    """Carga las hojas y devuelve (segundos, peticiones, errores, datos)."""
+    conexion = conectar(libro, hilos=hilos, limitador=limitador)
+    # Esperas cortas entre reintentos para que la prueba no tarde (en producción: 1 s a 64 s)
+    conexion.espera_base, conexion.espera_maxima = 0.05, 0.5
+    libro.reiniciar_conteo()
+    inicio = time.perf_counter()
+    datos = conexion.load_data(nombres, batch=batch)
+    return time.perf_counter() - inicio, len(libro.peticiones), len(libro.errores), datos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hojas", type=int, default=12)
+    parser.add_argument("--filas", type=int, default=500)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos simulados por petición")
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--errores", type=float, default=0.2, help="probabilidad de 429/503 por petición")
+    parser.add_argument("--por-minuto", type=float, default=600, help="cuota para el paso del límite de tasa")
+    args = parser.parse_args()
+
+    hojas = generar_hojas(args.hojas, args.filas)
+    nombres = list(hojas)
+
+    libro = LibroFalso(hojas, latencia=args.latencia)
+    libro_errores = LibroFalso(hojas, latencia=args.latencia, probabilidad_error=args.errores)
+
+    # Ráfaga de 4 y luego (por_minuto - 4) por minuto: nunca más de por_minuto en 60 s
+    limitador = LimitadorTasa(args.por_minuto, capacidad=4)
+    minimo_limitado = (2 * args.hojas - limitador.capacidad) / limitador.tasa
+
+    modos = [
+        ("hoja por hoja (1 hilo)", medir(libro, nombres, batch=False, hilos=1)),
+        (f"hoja por hoja ({args.hilos} hilos)", medir(libro, nombres, batch=False, hilos=args.hilos)),
+        ("en lote", medir(libro, nombres, batch=True, hilos=args.hilos)),
+        (f"{args.hilos} hilos + errores", medir(libro_errores, nombres, batch=False, hilos=args.hilos)),
+        (f"{args.hilos} hilos, {args.por_minuto:.0f}/min",
+         medir(libro, nombres, batch=False, hilos=args.hilos, limitador=limitador)),
+    ]
+
+    referencia = modos[0][1][3]
+    for _, (_, _, _, datos) in modos[1:]:
+        assert list(datos) == nombres
+        for nombre in nombres:
+            pd.testing.assert_frame_equal(referencia[nombre], datos[nombre])
+    t_secuencial, t_hilos = modos[0][1][0], modos[1][1][0]
+    assert t_hilos < t_secuencial / 2, (t_hilos, t_secuencial)
+    assert modos[3][1][2] > 0, "no se inyectó ningún error"
+    assert modos[4][1][0] >= minimo_limitado * 0.95, (modos[4][1][0], minimo_limitado)
+
+    print(f"{args.hojas} hojas x {args.filas:,} filas, latencia simulada {args.latencia * 1000:.0f} ms/petición")
+    print(f"{'modo':>28} | {'peticiones':>10} | {'errores':>7} | {'tiempo (s)':>10}")
+    print("-" * 66)
+    for titulo, (segundos, peticiones, errores, _) in modos:
+        print(f"{titulo:>28} | {peticiones:>10} | {errores:>7} | {segundos:>10.3f}")
+    print(f"✅ Mismos DataFrames en todos los modos; con {args.por_minuto:.0f}/min el límite de tasa "
+          f"exige >= {minimo_limitado:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
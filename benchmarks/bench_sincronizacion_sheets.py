@@ -0,0 +1,156 @@
+# benchmarks/bench_sincronizacion_sheets.py
+"""
+Prueba de punta a punta de la sincronización incremental SQLite <-> Google Sheets
+(data/sincronizacion_sheets.py) contra el cliente falso en memoria, contando peticiones:
+
+1. Primera sincronización: la hoja vacía recibe toda la tabla.
+2. Sin cambios: solo se lee la hoja, no se escribe nada.
+3. Cambios en la app (modificar, borrar, insertar): se envían solo esas filas.
+4. Cambios del personal en la hoja (editar filas, agregar filas sin id): se reciben solo esas.
+5. Conflictos (la misma fila cambia en los dos lados): gana el cambio más reciente.
+
+Al final de cada paso la hoja y la tabla deben coincidir.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_sincronizacion_sheets
+    python -m benchmarks.bench_sincronizacion_sheets --usuarios 20000 --latencia 0.1
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from data.conexion_sqlite import ConexionSQLite
+from data.sincronizacion_sheets import (COLUMNA_TS, SincronizadorSheets, _texto, _valor_hoja, ahora_ts,
+                                        clave_fila)
+from tests.fake_gspread import LibroFalso, conectar
+
+ESQUEMA_USUARIOS = """
+CREATE TABLE usuarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nombre TEXT, edad INTEGER, ocupacion TEXT
+)
+"""
+
+
+def crear_db(ruta: str, n: int) -> ConexionSQLite:
+    """DB temporal con n usuarios (las demás tablas las crean las migraciones)."""
+    with sqlite3.connect(ruta) as conn:
+        conn.execute(ESQUEMA_USUARIOS)
+        conn.executemany("INSERT INTO usuarios (nombre, edad, ocupacion) VALUES (?, ?, ?)",
+                         [(f"Usuario {i}", 18 + i % 60, "hogar") for i in range(1, n + 1)])
+    return ConexionSQLite(ruta)
+
+
+def comprobar_iguales(conexion: ConexionSQLite, libro: LibroFalso):
+    """La hoja 'Usuarios' y la tabla usuarios tienen las mismas filas y valores."""
+    with conexion.lectura() as conn:
+        cursor = conn.execute("SELECT * FROM usuarios")
+        columnas = [d[0] for d in cursor.description]
+        tabla = {clave_fila(fila[0]): dict(zip(columnas, fila)) for fila in cursor}
+
+    valores = libro._hojas["Usuarios"].get_all_values()
+    encabezado, filas = valores[0], valores[1:]
+    hoja = {clave_fila(fila[0]): dict(zip(encabezado, fila)) for fila in filas}
+
+    assert set(tabla) == set(hoja), (set(tabla) ^ set(hoja))
+    for clave, registro in tabla.items():
+        for col in columnas:
+            assert _valor_hoja(_texto(registro[col])) == _valor_hoja(hoja[clave][col]), (clave, col)
+
+
+def editar_celdas(fila: list, cambios: dict):
+    """Edita celdas de una fila de la hoja falsa, como haría el personal ({posición: valor})."""
+    fila += [""] * (max(cambios) + 1 - len(fila))
+    for pos, valor in cambios.items():
+        fila[pos] = valor
+
+
+def pasada(sincronizador, libro, conexion, titulo, **esperado):
+    """Una sincronización: mide, cuenta peticiones, verifica el resumen y que ambos lados coincidan."""
+    libro.reiniciar_conteo()
+    inicio = time.perf_counter()
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+    segundos = time.perf_counter() - inicio
+    peticiones = len(libro.peticiones)
+
+    assert resumen is not None, "la sincronización falló"
+    for clave, valor in esperado.items():
+        assert resumen[clave] == valor, (titulo, clave, resumen[clave], valor)
+    comprobar_iguales(conexion, libro)
+    print(f"{titulo:>34} | {peticiones:>10} | {segundos:>10.3f} | {resumen}")
+    return resumen, peticiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=5_000)
+    parser.add_argument("--latencia", type=float, default=0.05, help="segundos simulados por petición")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        conexion = crear_db(os.path.join(carpeta, "sync.db"), args.usuarios)
+        libro = LibroFalso({"Usuarios": []}, latencia=args.latencia)
+        sincronizador = SincronizadorSheets(conexion, conectar(libro))
+        hoja = libro._hojas["Usuarios"]
+
+        print(f"{args.usuarios:,} usuarios, latencia simulada {args.latencia * 1000:.0f} ms/petición")
+        print(f"{'paso':>34} | {'peticiones':>10} | {'tiempo (s)':>10} | resumen")
+        print("-" * 110)
+
+        # 1. Primera vez: worksheet + lectura + encabezado + append
+        _, peticiones = pasada(sincronizador, libro, conexion, "1. primera sincronización",
+                               enviadas=args.usuarios)
+        assert peticiones == 4, peticiones
+
+        # 2. Sin cambios: solo worksheet + lectura
+        _, peticiones = pasada(sincronizador, libro, conexion, "2. sin cambios",
+                               enviadas=0, borradas=0, recibidas=0)
+        assert peticiones == 2, peticiones
+
+        # 3. Cambios en la app: 5 modificados, 2 borrados, 3 nuevos
+        for i in range(1, 6):
+            conexion.actualizar_registros("usuarios", {"ocupacion": "docente"}, "id = ?", (i,))
+        conexion.eliminar_registros("usuarios", "id IN (?, ?)", (10, 11))
+        for i in range(3):
+            conexion.insertar_registro("usuarios", {"nombre": f"Nuevo {i}", "edad": 30, "ocupacion": "jubilado"})
+        _, peticiones = pasada(sincronizador, libro, conexion, "3. cambios en la app",
+                               enviadas=8, borradas=2, recibidas=0)
+        assert peticiones == 5, peticiones  # + batch_update + append_rows + borrado
+
+        # 4. Cambios del personal: 4 filas editadas (con su ts) y 2 filas nuevas sin id
+        encabezado = hoja.filas[0]
+        pos_edad, pos_ts = encabezado.index("edad"), encabezado.index(COLUMNA_TS)
+        for numero_fila in range(20, 24):
+            editar_celdas(hoja.filas[numero_fila], {pos_edad: "99", pos_ts: ahora_ts()})
+        for i in range(2):
+            hoja.filas.append(["", f"Personal {i}", "41", "docente", ahora_ts()])
+        _, peticiones = pasada(sincronizador, libro, conexion, "4. cambios en la hoja",
+                               enviadas=0, borradas=0, recibidas=6)
+        assert peticiones == 3, peticiones  # + batch_update (ids de las filas nuevas)
+
+        # 5. Conflictos: la fila 30 cambia antes en la hoja que en la app (gana la app);
+        #    la fila 31 cambia antes en la app que en la hoja (gana la hoja)
+        fila_30 = next(f for f in hoja.filas[1:] if f[0] == "30")
+        fila_31 = next(f for f in hoja.filas[1:] if f[0] == "31")
+        editar_celdas(fila_30, {pos_edad: "70", pos_ts: ahora_ts()})
+        time.sleep(0.01)
+        conexion.actualizar_registros("usuarios", {"edad": 50}, "id IN (?, ?)", (30, 31))
+        time.sleep(0.01)
+        editar_celdas(fila_31, {pos_edad: "71", pos_ts: ahora_ts()})
+        pasada(sincronizador, libro, conexion, "5. conflictos", enviadas=1, recibidas=1, conflictos=2)
+        with conexion.lectura() as conn:
+            edades = dict(conn.execute("SELECT id, edad FROM usuarios WHERE id IN (30, 31)").fetchall())
+        assert edades == {30: 50, 31: 71}, edades
+
+        # 6. Lo recibido no vuelve a enviarse: otra pasada no escribe nada
+        _, peticiones = pasada(sincronizador, libro, conexion, "6. sin cambios (después de recibir)",
+                               enviadas=0, borradas=0, recibidas=0)
+        assert peticiones == 2, peticiones
+
+    print("✅ Hoja y tabla coinciden en todos los pasos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_upserts_sheets.py
+"""
+Compara los upserts fila a fila de ConexionSheets.save_or_update (find() remoto +
+update()/append_row() por fila) contra los upserts con buffer (save_or_update_many:
+1 lectura de claves + 1 batch_update + 1 append_rows), con un cliente falso en memoria
+que cuenta peticiones y simula la latencia de red.
+
+Verifica además que ambos caminos dejan la hoja EXACTAMENTE igual.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.bench_upserts_sheets
+    python -m benchmarks.bench_upserts_sheets --existentes 1000 --upserts 300 --latencia 0.05
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tests.fake_gspread import LibroFalso, conectar
+
+ENCABEZADO = ["id", "nombre", "edad", "ocupacion"]
+
+
+def generar_libro(existentes: int, latencia: float) -> LibroFalso:
+    """Libro falso con una hoja 'Usuarios' de `existentes` filas."""
+    filas = [ENCABEZADO] + [[i, f"Usuario {i}", 30, "hogar"] for i in range(1, existentes + 1)]
+    return LibroFalso({"Usuarios": filas}, latencia=latencia)
+
+
+def generar_upserts(existentes: int, n: int, semilla: int = 42) -> list:
+    """Mitad actualizaciones de usuarios existentes y mitad usuarios nuevos (con alguna clave repetida)."""
+    rng = np.random.default_rng(semilla)
+    actualizados = rng.choice(np.arange(1, existentes + 1), n // 2, replace=False)
+    nuevos = existentes + 1 + np.arange(n - n // 2)
+    ids = np.concatenate([actualizados, nuevos, nuevos[:3]])
+    return [[int(i), f"Usuario {i} (editado {k})", int(rng.integers(0, 100)), "docente"] for k, i in enumerate(ids)]
+
+
+def medir(libro: LibroFalso, funcion):
+    """Ejecuta los upserts y devuelve (segundos, peticiones)."""
+    # Sin límite de tasa: se comparan peticiones y latencia, no la cuota
+    conexion = conectar(libro)
+    libro.reiniciar_conteo()
+    inicio = time.perf_counter()
+    funcion(conexion)
+    return time.perf_counter() - inicio, len(libro.peticiones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existentes", type=int, default=1_000)
+    parser.add_argument("--upserts", type=int, default=300)
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos simulados por petición")
+    args = parser.parse_args()
+
+    filas = generar_upserts(args.existentes, args.upserts)
+
+    libro_filas = generar_libro(args.existentes, args.latencia)
+
+    def fila_a_fila(conexion):
+        for fila in filas:
+            conexion.save_or_update("Usuarios", fila)
+
+    t_filas, p_filas = medir(libro_filas, fila_a_fila)
+
+    libro_lote = generar_libro(args.existentes, args.latencia)
+    t_lote, p_lote = medir(libro_lote, lambda conexion: conexion.save_or_update_many("Usuarios", filas))
+
+    hoja_filas = libro_filas.worksheet("Usuarios").get_all_values()
+    hoja_lote = libro_lote.worksheet("Usuarios").get_all_values()
+    assert hoja_filas == hoja_lote, "los dos caminos dejaron la hoja distinta"
+    # worksheet() + col_values() + batch_update() + append_rows()
+    assert p_lote == 4, p_lote
+
+    print(f"{len(filas)} upserts sobre {args.existentes:,} filas, "
+          f"latencia simulada {args.latencia * 1000:.0f} ms/petición")
+    print(f"{'modo':>12} | {'peticiones':>10} | {'tiempo (s)':>10}")
+    print("-" * 38)
+    print(f"{'fila a fila':>12} | {p_filas:>10} | {t_filas:>10.3f}")
+    print(f"{'en lote':>12} | {p_lote:>10} | {t_lote:>10.3f}")
+    print("✅ La hoja queda igual en ambos modos")
+
+
+if __name__ == "__main__":
+    main()
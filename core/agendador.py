@@ -1,7 +1,11 @@
+import numpy as np
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from data.conexion_sqlite import ConexionSQLite
+from data.agenda_cupos import AgendaCupos
+from core.priorizacion import ESTADOS_CITA_ACTIVA, obtener_indice_pendientes, top_pendientes
+from core.kpis import obtener_kpis, COSTO_PROMEDIO_POR_DEFECTO
 
 
 def calcular_fecha_cita(i, capacidad_diaria, fecha_inicio):
@@ -10,149 +14,156 @@ def calcular_fecha_cita(i, capacidad_diaria, fecha_inicio):
     return (fecha_inicio + timedelta(days=dia_offset)).isoformat()
 
 
-def agendar_citas_disponibles(conexion: ConexionSQLite, capacidad_diaria: int, fecha_inicio: datetime.date):
-    """
-    Toma TODOS los recursos disponibles y los asigna a los usuarios
-    con mayor prioridad que estén pendientes.
-
-    Esta versión es EFICIENTE: solo escribe en la DB dos veces (1 UPDATE, 1 INSERT).
-    """
-
-    # 1. Cargar el estado actual desde la sesión (que viene de la DB)
-    recursos_df = st.session_state["recursos"].copy()
-    usuarios_df = st.session_state["usuarios"].copy()
-    asignaciones_df = st.session_state["asignaciones"].copy()
-
-    # 2. Calcular el LÍMITE (Tu restricción)
-    recursos_disponibles = recursos_df[recursos_df["estado"] == "disponible"].reset_index(drop=True)
-    stock_real = len(recursos_disponibles)
-
-    if stock_real == 0:
-        st.warning("No hay recursos 'disponibles' para agendar.")
-        return
-
-    # 3. Encontrar a los usuarios candidatos (pendientes)
-    ids_con_cita_activa = set(
-        asignaciones_df[asignaciones_df["estado"].isin(["asignado", "entregado"])]
-        ["id_usuario"].astype(int).tolist()
-    ) if not asignaciones_df.empty else set()
+def calcular_fechas_cita(n: int, capacidad_diaria: int, fecha_inicio: datetime.date) -> np.ndarray:
+    """Versión vectorizada de calcular_fecha_cita para los índices 0..n-1 (fechas 'YYYY-MM-DD')."""
+    dia_offset = np.arange(n) // capacidad_diaria
+    return np.datetime_as_string(np.datetime64(fecha_inicio, "D") + dia_offset, unit="D")
 
-    usuarios_pendientes = usuarios_df[
-        ~usuarios_df["id"].astype(int).isin(ids_con_cita_activa)
-    ].sort_values(["puntaje", "fecha_registro"], ascending=[False, True]).reset_index(drop=True)
 
-    if usuarios_pendientes.empty:
-        st.warning("No hay usuarios pendientes para agendar.")
-        return
-
-    # 4. Determinar el lote a procesar
-    lote_a_procesar = min(stock_real, len(usuarios_pendientes))
-    print(f"Iniciando agendamiento: {lote_a_procesar} citas se crearán.")
-
-    # --- Listas de "borrador" para preparar la escritura en DB ---
-    nuevas_asignaciones_list = []  # Para las NUEVAS filas de 'asignaciones'
-    recursos_ids_a_actualizar = []  # Para los ID de 'recursos' que hay que ACTUALIZAR
-
-    # 5. El Bucle de Agendamiento (¡Solo en Memoria!)
-    id_asignacion_max = asignaciones_df["id"].max() if not asignaciones_df.empty else 0
-
-    for i in range(lote_a_procesar):
-        # Tomar al usuario y al recurso de este "lote"
-
-        usuario_actual = usuarios_pendientes.iloc[i]
-
-        recurso_actual = recursos_disponibles.iloc[i]
-
-        # Calcular la fecha usando tu parámetro de capacidad diaria
-        fecha_cita_calculada = calcular_fecha_cita(i, capacidad_diaria, fecha_inicio)
+def construir_lote_asignaciones(usuarios_lote: pd.DataFrame, recursos_lote: pd.DataFrame, fechas_cita: np.ndarray,
+                                id_asignacion_max: int) -> pd.DataFrame:
+    """
+    Arma el lote completo de nuevas asignaciones en una sola pasada con arreglos:
+    el i-ésimo usuario (por prioridad) recibe el i-ésimo recurso disponible
+    y la i-ésima fecha.
+
+    Args:
+        usuarios_lote (pd.DataFrame): Usuarios pendientes, ya ordenados por prioridad.
+        recursos_lote (pd.DataFrame): Recursos disponibles, misma cantidad de filas.
+        fechas_cita (np.ndarray): Fecha de cada cita (ver calcular_fechas_cita / AgendaCupos).
+        id_asignacion_max (int): Mayor id existente en 'asignaciones'.
+
+    Returns:
+        pd.DataFrame: Las nuevas filas de 'asignaciones', listas para insertar.
+    """
+    n = len(usuarios_lote)
+    return pd.DataFrame({
+        "id": id_asignacion_max + 1 + np.arange(n),
+        "id_usuario": usuarios_lote["id"].to_numpy(dtype=np.int64),
+        "id_recurso": recursos_lote["id"].to_numpy(dtype=np.int64),
+        "puntaje": usuarios_lote["puntaje"].to_numpy(dtype=float),  # ¡Importante! La foto del puntaje
+        "estado": "asignado",
+        "fecha_cita": fechas_cita,
+        "creado_ts": datetime.now().isoformat(),  # Una sola marca de tiempo para todo el lote
+    })
 
-        # --- A. Preparar la actualización del Recurso ---
 
-        # Guardamos el ID del recurso para actualizarlo más tarde
-        recursos_ids_a_actualizar.append(int(recurso_actual["id"]))
+def agendar_citas_disponibles(conexion: ConexionSQLite, capacidad_diaria: int, fecha_inicio: datetime.date):
+    """
+    Toma TODOS los recursos disponibles y los asigna a los usuarios
+    con mayor prioridad que estén pendientes.
 
-        # --- B. Preparar la Nueva Asignación ---
-        nuevo_dict = {
-            "id": id_asignacion_max + 1 + i,
-            "id_usuario": int(usuario_actual["id"]),
-            "id_recurso": int(recurso_actual["id"]),
-            "puntaje": float(usuario_actual["puntaje"]),  # ¡Importante! La foto del puntaje
-            "estado": "asignado",
-            "fecha_cita": fecha_cita_calculada,
-            "creado_ts": datetime.now().isoformat(),
-            # ... (tus otros campos)
-        }
-        nuevas_asignaciones_list.append(nuevo_dict)
+    Esta versión es EFICIENTE: 1 UPDATE de recursos, 1 INSERT masivo de asignaciones
+    y 1 actualización del libro de cupos por día, todo en una sola transacción.
 
-    # El bucle terminó. Ahora hacemos las 2 operaciones de DB.
+    Todo lo que decide el lote (recursos disponibles, cupos libres por día y el mayor id)
+    se lee DENTRO de esa transacción (BEGIN IMMEDIATE, conexión de escritura): dos
+    operadores agendando a la vez no pueden tomar los mismos recursos ni los mismos cupos.
+    """
+    agenda = AgendaCupos(conexion)
 
-    if not nuevas_asignaciones_list:
-        st.warning("No se preparó ninguna asignación nueva.")
+    # --- Lectura y guardado: TODO en una sola transacción (1 commit, 1 limpieza de caché) ---
+    # Si cualquier paso falla, se revierte el agendamiento completo.
+    try:
+        with conexion.transaccion(inmediata=True) as conn:
+            # 1-2. Calcular el LÍMITE (Tu restricción): solo los id de recursos 'disponible',
+            #      filtrados en SQLite (no se trae la tabla completa)
+            recursos_disponibles = pd.read_sql_query(
+                "SELECT id FROM recursos WHERE estado = ? ORDER BY rowid", conn, params=("disponible",))
+            stock_real = len(recursos_disponibles)
+
+            if stock_real == 0:
+                st.warning("No hay recursos 'disponibles' para agendar.")
+                return
+
+            # 3. Encontrar a los usuarios candidatos (pendientes): solo los N primeros del índice,
+            #    donde N es el stock disponible (no hace falta ordenar a todos).
+            #    Sin los que otra sesión acaba de agendar (su índice en memoria aún no lo sabe).
+            usuarios_pendientes = top_pendientes(stock_real)
+            if not usuarios_pendientes.empty:
+                ya_agendados = _usuarios_con_cita_activa(conn, usuarios_pendientes["id"])
+                usuarios_pendientes = usuarios_pendientes[~usuarios_pendientes["id"].isin(ya_agendados)]
+
+            if usuarios_pendientes.empty:
+                st.warning("No hay usuarios pendientes para agendar.")
+                return
+
+            # 4. Determinar el lote a procesar
+            lote_a_procesar = min(stock_real, len(usuarios_pendientes))
+            print(f"Iniciando agendamiento: {lote_a_procesar} citas se crearán.")
+
+            # 5. Ubicar las citas en los primeros cupos libres (respetando días ya reservados)
+            fechas_cita = agenda.asignar_fechas(lote_a_procesar, capacidad_diaria, fecha_inicio)
+
+            # 6. Armar TODO el lote de una vez con arreglos (¡Solo en Memoria!)
+            id_asignacion_max = conn.execute("SELECT COALESCE(MAX(id), 0) FROM asignaciones").fetchone()[0]
+
+            df_nuevas = construir_lote_asignaciones(
+                usuarios_pendientes.iloc[:lote_a_procesar],
+                recursos_disponibles.iloc[:lote_a_procesar],
+                fechas_cita,
+                int(id_asignacion_max)
+            )
+
+            if df_nuevas.empty:
+                st.warning("No se preparó ninguna asignación nueva.")
+                return
+
+            # Los ID de 'recursos' que hay que ACTUALIZAR
+            recursos_ids_a_actualizar = df_nuevas["id_recurso"].tolist()
+            datos_a_actualizar = {"estado": "asignado"}
+            placeholders = ', '.join(['?'] * len(recursos_ids_a_actualizar))
+            condicion_where = f"id IN ({placeholders})"
+            argumentos_where = tuple(recursos_ids_a_actualizar)
+
+            # 1. Actualizar 'recursos' (con UPDATE quirúrgico)
+            conexion.actualizar_registros("recursos", datos_a_actualizar, condicion_where, argumentos_where)
+
+            # 2. Insertar 'asignaciones' (con INSERT masivo)
+            conexion.insertar_dataframe(df_nuevas, "asignaciones")
+
+            # 3. Ocupar los cupos de cada día en el libro de la agenda
+            agenda.registrar(df_nuevas["fecha_cita"])
+    except Exception as e:
+        st.error(f"¡Fallo crítico! No se pudo guardar el agendamiento (no se aplicó ningún cambio): {e}")
         return
 
-    # --- Guardado 1: Actualizar 'recursos' (con UPDATE quirúrgico) ---
-    datos_a_actualizar = {"estado": "asignado"}
-    placeholders = ', '.join(['?'] * len(recursos_ids_a_actualizar))
-    condicion_where = f"id IN ({placeholders})"
-    argumentos_where = tuple(recursos_ids_a_actualizar)  # ¡Ahora esta variable SÍ existe!
-
-    exito_recursos = conexion.actualizar_registros(
-        "recursos",
-        datos_a_actualizar,
-        condicion_where,
-        argumentos_where
-    )
-
-    if not exito_recursos:
-        st.error("¡Fallo crítico! No se pudo actualizar el estado de los recursos.")
-        return  # Detener si falla el primer guardado
-
-    # --- Guardado 2: Insertar 'asignaciones' (con INSERT masivo) ---
-    df_nuevas = pd.DataFrame(nuevas_asignaciones_list)  # Convertimos la lista de dicts en un DataFrame
-
-    exito_asignaciones = conexion.insertar_dataframe(df_nuevas, "asignaciones")
+    # Los usuarios agendados dejan de estar pendientes: O(log n) cada uno
+    indice = obtener_indice_pendientes()
+    for id_usuario in df_nuevas["id_usuario"]:
+        indice.eliminar(id_usuario)
 
-    if not exito_asignaciones:
-        st.error("¡Fallo crítico! No se pudieron guardar las nuevas asignaciones.")
-        return
+    st.success(f"¡Éxito! Se agendaron {len(df_nuevas)} nuevas citas.")
 
-    # Si todo salió bien, limpiamos la caché para que Streamlit recargue
-    conexion.cargar_tabla_df.clear()
 
-    st.success(f"¡Éxito! Se agendaron {len(df_nuevas)} nuevas citas.")
+def _usuarios_con_cita_activa(conn, ids_usuario) -> set:
+    """IDs (de entre los dados) que ya tienen una cita activa en la DB, leídos con la conexión dada."""
+    ids = [int(i) for i in ids_usuario]
+    estados = ', '.join(['?'] * len(ESTADOS_CITA_ACTIVA))
+    encontrados = set()
+    # De a 900 ids: límite de parámetros por sentencia de SQLite
+    for inicio in range(0, len(ids), 900):
+        lote = ids[inicio:inicio + 900]
+        filas = conn.execute(
+            f"SELECT DISTINCT id_usuario FROM asignaciones WHERE estado IN ({estados}) "
+            f"AND id_usuario IN ({', '.join(['?'] * len(lote))})",
+            (*ESTADOS_CITA_ACTIVA, *lote)
+        ).fetchall()
+        encontrados.update(fila[0] for fila in filas)
+    return encontrados
 
 
 def calcular_y_mostrar_presupuesto():
     """
     Calcula el déficit de recursos y estima el presupuesto
-    necesario, basándose en los datos de session_state.
+    necesario, con los KPIs agregados de core/kpis.py (una consulta cacheada).
     Muestra los resultados directamente en la UI de Streamlit.
     """
 
-    # 1. Cargar el estado actual (igual que en agendar_citas)
-    try:
-        recursos_df = st.session_state["recursos"].copy()
-        usuarios_df = st.session_state["usuarios"].copy()
-        asignaciones_df = st.session_state["asignaciones"].copy()
-    except KeyError:
-        st.error("Error: Los datos de sesión no están cargados. Asegúrese de que init_session se haya ejecutado.")
-        return
-
-    # 2. Calcular Demanda Real (Usuarios Pendientes)
-    ids_con_cita_activa = set(
-        asignaciones_df[asignaciones_df["estado"].isin(["asignado", "entregado"])]
-        ["id_usuario"].astype(int).tolist()
-    ) if not asignaciones_df.empty else set()
-
-    usuarios_pendientes_df = usuarios_df[
-        ~usuarios_df["id"].astype(int).isin(ids_con_cita_activa)
-    ]
-    demanda_real = len(usuarios_pendientes_df)
-
-    # 3. Calcular Stock Actual
-    stock_actual = len(recursos_df[recursos_df["estado"] == "disponible"])
-
-    # 4. Calcular Déficit
+    # 1-4. Demanda real (usuarios pendientes), stock actual, déficit y costo promedio
+    kpis = obtener_kpis(ConexionSQLite())
+    demanda_real = kpis["demanda"]
+    stock_actual = kpis["stock"]
     deficit = demanda_real - stock_actual
 
     # 5. Calcular y Mostrar Resultados
@@ -170,22 +181,14 @@ def calcular_y_mostrar_presupuesto():
     # --- Lógica de Presupuesto (Si hay déficit) ---
     col3.metric("Déficit de Recursos", f"{deficit} Unidades", delta_color="inverse")
 
-    # 6. Calcular Costo Promedio (El paso de "Data Science")
-    # Usamos un valor por defecto en caso de que la columna no exista o esté vacía
-    costo_promedio_default = 350.0
-    costo_promedio_real = costo_promedio_default
-
-    if "precio" in recursos_df.columns and not recursos_df["precio"].isnull().all():
-        # Calcula el promedio solo de los precios válidos (mayores a 0)
-        precios_validos = recursos_df[recursos_df["precio"] > 0]["precio"]
+    # 6. Costo Promedio (El paso de "Data Science"): AVG(precio) de los precios válidos (> 0)
+    costo_promedio_real = kpis["costo_unitario"]
 
-        if not precios_validos.empty:
-            costo_promedio_real = precios_validos.mean()
-        else:
-            st.warning("No se encontraron precios válidos (> 0) en el inventario. Usando costo por defecto.")
-    else:
+    if not kpis["hay_precio"]:
         st.warning(
-            f"No se encontró una columna 'precio' válida en la tabla 'recursos'. Usando un costo promedio por defecto de S/ {costo_promedio_default:,.2f}.")
+            f"No se encontró una columna 'precio' válida en la tabla 'recursos'. Usando un costo promedio por defecto de S/ {COSTO_PROMEDIO_POR_DEFECTO:,.2f}.")
+    elif kpis["precio_promedio"] is None:
+        st.warning("No se encontraron precios válidos (> 0) en el inventario. Usando costo por defecto.")
 
     # 7. Calcular Presupuesto Total
     presupuesto_total = deficit * costo_promedio_real
@@ -0,0 +1,100 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data.conexion_sqlite import ConexionSQLite
+
+# --- AGREGADOS DE LA ANALÍTICA ---
+# Los gráficos de "Estadísticas e Insights" se arman con conteos pequeños
+# (un renglón por valor distinto / por puntaje), no con la tabla de usuarios entera.
+# Cada agregado se calcula UNA vez por versión de los datos y queda cacheado.
+
+VALORES_SI = {"1", "true", "t", "si", "sí", "yes", "y"}
+
+
+def binario_a_si_no(valor) -> str:
+    """'Sí' si el valor representa un verdadero (1, true, sí, ...), 'No' en otro caso (incluye NULL)."""
+    return "Sí" if str(valor).strip().lower() in VALORES_SI else "No"
+
+
+def conteo_categorias(conexion: ConexionSQLite, columna: str) -> pd.Series:
+    """
+    Equivalente a usuarios_df[columna].value_counts(), pero con un GROUP BY en SQLite:
+    solo viaja un renglón por valor distinto (cacheado hasta que se escriba en la tabla).
+
+    Args:
+        conexion (ConexionSQLite): Conexión a la base de datos de la app.
+        columna (str): Columna de usuarios (ej. 'ocupacion').
+
+    Returns:
+        pd.Series: Cantidad de usuarios por valor, de mayor a menor (sin NULL).
+    """
+    # Empates en el mismo orden que value_counts(): primero el valor que aparece antes
+    df = conexion.consultar("usuarios", [columna, "COUNT(*) AS n"], f"{columna} IS NOT NULL",
+                            order_by="n DESC, MIN(rowid)", group_by=columna)
+    if df.empty:
+        return pd.Series(dtype="int64", name="count")
+    return df.set_index(columna)["n"].rename("count")
+
+
+def conteo_si_no(conexion: ConexionSQLite, columna: str) -> pd.Series:
+    """
+    Conteo 'Sí'/'No' de una columna binaria (internet, dispositivo). La conversión
+    se aplica a los pocos valores distintos, no a cada usuario.
+
+    Returns:
+        pd.Series: Cantidad de usuarios por 'Sí'/'No', de mayor a menor.
+    """
+    df = conexion.consultar("usuarios", [columna, "COUNT(*) AS n", "MIN(rowid) AS primera"], group_by=columna)
+    if df.empty:
+        return pd.Series(dtype="int64", name="count")
+    conteo = df.groupby(df[columna].map(binario_a_si_no)).agg(n=("n", "sum"), primera=("primera", "min"))
+    return conteo.sort_values(["n", "primera"], ascending=[False, True])["n"].rename("count")
+
+
+def distribucion_valores(conexion: ConexionSQLite, columna: str) -> pd.DataFrame:
+    """
+    Valores distintos de una columna numérica con su cantidad de usuarios, para
+    dibujar el histograma con pesos (px.histogram(..., y='n', histfunc='sum')).
+
+    Returns:
+        pd.DataFrame: Columnas [columna, 'n'], ordenadas por valor (sin NULL).
+    """
+    return conexion.consultar("usuarios", [columna, "COUNT(*) AS n"], f"{columna} IS NOT NULL",
+                              order_by=columna, group_by=columna)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _usuarios_por_codigo(huella_usuarios: str, _codigos: np.ndarray) -> np.ndarray:
+    """
+    Cuántos usuarios hay en cada celda de la tabla de puntajes (ver core/priorizacion.py).
+    Es el único paso O(usuarios) y se hace una vez por versión de los datos de usuarios:
+    la huella_usuarios la identifica, por eso `_codigos` no se hashea.
+    """
+    print(f"[{datetime.datetime.now()}] 📊 Analítica: contando usuarios por celda de la tabla de puntajes")
+    return np.bincount(_codigos)
+
+
+def distribucion_puntajes() -> pd.DataFrame:
+    """
+    Puntajes distintos de la sesión con su cantidad de usuarios. Se arma con la
+    tabla de puntajes (unos cientos de celdas) y el conteo de usuarios por celda:
+    cambiar los pesos solo vuelve a agrupar las celdas, no recorre a los usuarios.
+
+    Returns:
+        pd.DataFrame: Columnas ['puntaje', 'n'], ordenadas por puntaje.
+    """
+    codigos = st.session_state.get("codigos_usuarios")
+    tabla = st.session_state.get("tabla_puntajes")
+    if codigos is None or tabla is None:
+        # Sin códigos en la sesión (se invalidaron): contar la columna directamente
+        conteo = st.session_state["usuarios"]["puntaje"].value_counts().sort_index()
+        return pd.DataFrame({"puntaje": conteo.index, "n": conteo.to_numpy()})
+
+    conteo = _usuarios_por_codigo(st.session_state["huella_usuarios"], codigos.to_numpy())
+    celdas = pd.DataFrame({"puntaje": tabla[:len(conteo)], "n": conteo})
+    celdas = celdas[celdas["n"] > 0]
+    return celdas.groupby("puntaje", as_index=False)["n"].sum()
+
@@ -0,0 +1,109 @@
+import pandas as pd
+import streamlit as st
+from datetime import datetime, timedelta
+from data.conexion_sqlite import ConexionSQLite
+from data.agenda_cupos import AgendaCupos
+
+
+def intentos_previos(valor) -> int:
+    """Faltas previas de una asignación; NULL/NaN/'' o valores inválidos cuentan como 0."""
+    if pd.isna(valor) or valor is None or valor == "":
+        return 0
+    try:
+        return int(valor)
+    except ValueError:
+        return 0
+
+
+def dia_siguiente(fecha_cita) -> str:
+    """Fecha 'YYYY-MM-DD' del día siguiente a la cita (desde hoy si la fecha no es válida)."""
+    try:
+        fecha_dt = datetime.strptime(fecha_cita, "%Y-%m-%d")
+    except (ValueError, TypeError):
+        fecha_dt = datetime.now()
+    return (fecha_dt + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def _placeholders(n: int) -> str:
+    return ', '.join(['?'] * n)
+
+
+def registrar_asistencia(conexion: ConexionSQLite, entregados, ausentes) -> dict:
+    """
+    Cierra de una vez muchas citas de la jornada:
+    - entregados: pasan a 'entregado' (1 UPDATE).
+    - ausentes con 0 faltas (STRIKE 1): se reprograman al día siguiente, en estado 'ausente_1'
+      (1 UPDATE por día de origen) y se mueve su cupo en el libro de la agenda.
+    - ausentes con 1 falta (STRIKE 2): se libera el recurso, se borra la asignación y se
+      BORRA al usuario (1 UPDATE + 2 DELETE) y se libera su cupo.
+
+    Todo va en UNA sola transacción: o se aplica la jornada completa o nada.
+    Lanza la excepción si algo falla (la transacción ya quedó revertida).
+
+    Args:
+        conexion (ConexionSQLite): Conexión a la base de datos de la app.
+        entregados: IDs de asignación a marcar como entregadas.
+        ausentes: IDs de asignación con falta.
+
+    Returns:
+        dict: Cantidades {'entregados', 'reprogramados', 'eliminados'}.
+    """
+    asign = st.session_state["asignaciones"]
+    entregados = [int(i) for i in asign.loc[asign["id"].isin([int(i) for i in entregados]), "id"]]
+    filas_ausentes = asign[asign["id"].isin([int(i) for i in ausentes])]
+
+    intentos = filas_ausentes["intentos_fallidos"].map(intentos_previos)
+    strike_1 = filas_ausentes[intentos == 0]
+    strike_2 = filas_ausentes[intentos > 0]
+
+    agenda = AgendaCupos(conexion)
+    ahora = datetime.now().isoformat()
+
+    with conexion.transaccion():
+        # --- ENTREGADOS ---
+        if entregados:
+            conexion.actualizar_registros(
+                "asignaciones",
+                {"estado": "entregado", "creado_ts": ahora},
+                f"id IN ({_placeholders(len(entregados))})",
+                tuple(entregados)
+            )
+
+        # --- STRIKE 1: REPROGRAMAR (un UPDATE por día de origen: todos van al mismo día siguiente) ---
+        nuevas_fechas = []
+        for fecha_origen, grupo in strike_1.groupby("fecha_cita", dropna=False):
+            nueva_fecha = dia_siguiente(fecha_origen)
+            ids = tuple(int(i) for i in grupo["id"])
+            conexion.actualizar_registros(
+                "asignaciones",
+                {"intentos_fallidos": 1, "estado": "ausente_1", "fecha_cita": nueva_fecha, "creado_ts": ahora},
+                f"id IN ({_placeholders(len(ids))})",
+                ids
+            )
+            nuevas_fechas += [nueva_fecha] * len(ids)
+        if not strike_1.empty:
+            agenda.registrar(strike_1["fecha_cita"], delta=-1)
+            agenda.registrar(nuevas_fechas, delta=1)
+
+        # --- STRIKE 2: ELIMINACIÓN TOTAL ---
+        if not strike_2.empty:
+            ids_recurso = tuple(int(i) for i in strike_2["id_recurso"])
+            ids_asignacion = tuple(int(i) for i in strike_2["id"])
+            ids_usuario = tuple(int(i) for i in strike_2["id_usuario"])
+
+            # 1. Liberar los recursos (volver a disponible)
+            conexion.actualizar_registros(
+                "recursos", {"estado": "disponible"}, f"id IN ({_placeholders(len(ids_recurso))})", ids_recurso
+            )
+            # 2. Eliminar las ASIGNACIONES
+            conexion.eliminar_registros(
+                "asignaciones", f"id IN ({_placeholders(len(ids_asignacion))})", ids_asignacion
+            )
+            # 3. Eliminar a los USUARIOS (para que no vuelvan a postular)
+            conexion.eliminar_registros(
+                "usuarios", f"id IN ({_placeholders(len(ids_usuario))})", ids_usuario
+            )
+            # 4. Liberar los cupos que ocupaban las citas
+            agenda.registrar(strike_2["fecha_cita"], delta=-1)
+
+    return {"entregados": len(entregados), "reprogramados": len(strike_1), "eliminados": len(strike_2)}
@@ -0,0 +1,95 @@
+import sqlite3
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from data.conexion_sqlite import ConexionSQLite
+from core.priorizacion import ESTADOS_CITA_ACTIVA
+
+# Costo por unidad cuando el inventario no tiene precios válidos (> 0)
+COSTO_PROMEDIO_POR_DEFECTO = 350.0
+
+# Tablas de las que dependen los KPIs: la caché se invalida si se escribe en cualquiera
+TABLAS_KPI = ("usuarios", "recursos", "asignaciones")
+
+# KPIs cuando la consulta falla (se muestran en cero, sin cachear)
+KPIS_VACIOS = {"total_usuarios": 0, "pendientes": 0, "total_recursos": 0, "disponibles": 0,
+               "asignados": 0, "entregados": 0, "precio_promedio": None, "hay_precio": False}
+
+
+def obtener_kpis(conexion: ConexionSQLite) -> dict:
+    """
+    Todas las métricas del dashboard (tarjetas KPI y proyección financiera) en UNA
+    consulta agregada de SQLite, cacheada por la versión de las tablas involucradas.
+    El costo no depende del tamaño de las tablas en la sesión.
+
+    Demanda real = usuarios pendientes: los que NO tienen una cita activa
+    ('asignado' o 'entregado'), igual que el ranking y el agendador.
+
+    Args:
+        conexion (ConexionSQLite): Conexión a la base de datos de la app.
+
+    Returns:
+        dict: total_usuarios, pendientes, total_recursos, disponibles, asignados, entregados,
+            precio_promedio (None si no hay precios válidos), hay_precio (existe la columna),
+            demanda, stock, deficit, costo_unitario y presupuesto_total.
+    """
+    versiones = tuple(conexion.version_tabla(tabla) for tabla in TABLAS_KPI)
+    try:
+        kpis = dict(_leer_kpis(conexion.db_name, versiones))
+    except (pd.errors.DatabaseError, sqlite3.Error) as e:
+        # Fuera de la función cacheada: un error pasajero (p. ej. 'database is locked')
+        # no queda guardado en la caché y el próximo intento vuelve a consultar
+        st.warning(f"No se pudieron calcular los KPIs: {e}")
+        kpis = dict(KPIS_VACIOS)
+
+    kpis["demanda"] = kpis["pendientes"]
+    kpis["stock"] = kpis["disponibles"]
+    kpis["deficit"] = max(0, kpis["demanda"] - kpis["stock"])
+    kpis["costo_unitario"] = kpis["precio_promedio"] if kpis["precio_promedio"] is not None \
+        else COSTO_PROMEDIO_POR_DEFECTO
+    kpis["presupuesto_total"] = kpis["deficit"] * kpis["costo_unitario"]
+    return kpis
+
+
+def _sql_kpis(hay_precio: bool) -> str:
+    """Texto de la consulta de KPIs (un solo SELECT con subconsultas agregadas)."""
+    activos = ", ".join(["?"] * len(ESTADOS_CITA_ACTIVA))
+    precio = "AVG(CASE WHEN precio > 0 THEN precio END)" if hay_precio else "NULL"
+    return f"""
+        SELECT
+            (SELECT COUNT(*) FROM usuarios) AS total_usuarios,
+            (SELECT COUNT(*) FROM usuarios u WHERE NOT EXISTS (
+                SELECT 1 FROM asignaciones a WHERE a.id_usuario = u.id AND a.estado IN ({activos})
+            )) AS pendientes,
+            r.total_recursos, r.disponibles, r.precio_promedio,
+            a.asignados, a.entregados
+        FROM
+            (SELECT COUNT(*) AS total_recursos,
+                    COALESCE(SUM(CASE WHEN estado = 'disponible' THEN 1 ELSE 0 END), 0) AS disponibles,
+                    {precio} AS precio_promedio
+             FROM recursos) AS r,
+            (SELECT COALESCE(SUM(CASE WHEN estado = 'asignado' THEN 1 ELSE 0 END), 0) AS asignados,
+                    COALESCE(SUM(CASE WHEN estado = 'entregado' THEN 1 ELSE 0 END), 0) AS entregados
+             FROM asignaciones) AS a
+    """
+
+
+@st.cache_data(ttl=3600, max_entries=32)
+def _leer_kpis(db_name: str, versiones: tuple) -> dict:
+    """
+    Lectura cacheada de los KPIs. `versiones` (una por tabla de TABLAS_KPI) forma parte
+    de la clave: cualquier escritura en esas tablas obliga a recalcular.
+    Si la consulta falla lanza el error (st.cache_data no cachea excepciones).
+    """
+    print(f"[{datetime.now()}] 🔄 Ejecutando LECTURA de DB: KPIs del dashboard (1 consulta agregada)")
+    with ConexionSQLite(db_name).lectura() as conn:
+        hay_precio = any(fila[1] == "precio" for fila in conn.execute("PRAGMA table_info(recursos)"))
+        fila = pd.read_sql_query(_sql_kpis(hay_precio), conn, params=tuple(ESTADOS_CITA_ACTIVA)).iloc[0]
+
+    kpis = {clave: int(fila[clave]) for clave in
+            ("total_usuarios", "pendientes", "total_recursos", "disponibles", "asignados", "entregados")}
+    kpis["precio_promedio"] = None if pd.isna(fila["precio_promedio"]) else float(fila["precio_promedio"])
+    kpis["hay_precio"] = hay_precio
+    return kpis
@@ -1,5 +1,8 @@
+import bisect
 import datetime
+import hashlib
 
+import numpy as np
 import pandas as pd
 
 import streamlit as st
@@ -51,25 +54,383 @@ def calcular_puntaje_row(row, pesos_internos, pesos_globales):
     return s
 
 
+# --- MOTOR VECTORIZADO (TABLA DE PUNTAJES) ---
+# Todas las entradas del puntaje son discretas: ocupación x internet x dispositivo x tramo de edad.
+# Cada usuario se codifica UNA vez como un índice entero a una tabla pequeña con el puntaje
+# de cada combinación. Cambiar los pesos solo rellena la tabla y hace un único gather.
+
+# Límites (inclusive) de los tramos de edad_interna y el puntaje de cada tramo.
+# El último tramo (índice 6) representa una edad inválida (puntaje 0).
+LIMITES_EDAD = np.array([5, 10, 17, 30, 59])
+PUNTAJES_EDAD = np.array([10, 9, 7, 5, 4, 8, 0])
+TRAMO_EDAD_INVALIDA = len(PUNTAJES_EDAD) - 1
+
+
+def _mapear_valores(serie: pd.Series, funcion) -> np.ndarray:
+    """
+    Aplica `funcion` solo sobre los valores ÚNICOS de la serie y
+    reparte el resultado a todas las filas (un gather).
+
+    Como las columnas son categóricas (pocos valores distintos),
+    el costo en Python es O(valores únicos) y no O(usuarios).
+    """
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    valores = np.asarray([funcion(v) for v in unicos], dtype=np.int64)
+    if valores.size == 0:
+        return np.zeros(len(serie), dtype=np.int64)
+    return valores[codigos]
+
+
+def _tramo_edad(e) -> int:
+    """Tramo de edad (0-5) con la misma semántica que edad_interna; TRAMO_EDAD_INVALIDA si no es un entero."""
+    try:
+        e = int(e)
+    except:
+        return TRAMO_EDAD_INVALIDA
+    return int(np.digitize(e, LIMITES_EDAD, right=True))
+
+
+def _tramos_edad_vectorizado(serie: pd.Series) -> np.ndarray:
+    """Equivalente columnar de edad_interna (np.digitize sobre los tramos)."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        edades = serie.to_numpy(dtype=float)
+        validas = np.isfinite(edades)
+        # int(e) trunca hacia cero, igual que en edad_interna
+        tramos = np.digitize(np.trunc(np.where(validas, edades, 0)), LIMITES_EDAD, right=True)
+        return np.where(validas, tramos, TRAMO_EDAD_INVALIDA)
+
+    # Columnas de texto / mixtas: misma semántica exacta, evaluada por valor único
+    return _mapear_valores(serie, _tramo_edad)
+
+
+def _columna(usuarios_df: pd.DataFrame, nombre: str, defecto) -> pd.Series:
+    """Devuelve la columna o una serie constante (igual que row.get(nombre, defecto))."""
+    if nombre in usuarios_df.columns:
+        return usuarios_df[nombre]
+    return pd.Series(defecto, index=usuarios_df.index, dtype=object)
+
+
+def _dimensiones_tabla(pesos_internos: dict) -> tuple:
+    """Forma de la tabla: cada categoría conocida + 1 casilla para 'no reconocido' (puntaje 0)."""
+    return (
+        len(pesos_internos["ocupacion"]) + 1,
+        len(pesos_internos["acceso_internet"]) + 1,
+        len(pesos_internos["dispositivo_propio"]) + 1,
+        len(PUNTAJES_EDAD),
+    )
+
+
+def codificar_usuarios(usuarios_df: pd.DataFrame, pesos_internos: dict) -> np.ndarray:
+    """
+    Codifica cada usuario como un índice entero a la tabla de puntajes.
+    Solo depende de los datos del usuario, NO de los pesos globales.
+
+    Args:
+        usuarios_df (pd.DataFrame): Tabla de usuarios.
+        pesos_internos (dict): Puntajes internos por categoría (definen las categorías).
+
+    Returns:
+        np.ndarray: Un código por usuario, en el mismo orden que usuarios_df.
+    """
+    def posiciones(tabla):
+        return {clave: i for i, clave in enumerate(tabla)}
+
+    pos_ocupacion = posiciones(pesos_internos["ocupacion"])
+    pos_internet = posiciones(pesos_internos["acceso_internet"])
+    pos_dispositivo = posiciones(pesos_internos["dispositivo_propio"])
+
+    ocupacion = _mapear_valores(_columna(usuarios_df, "ocupacion", None),
+                                lambda v: pos_ocupacion.get(v, len(pos_ocupacion)))
+    internet = _mapear_valores(_columna(usuarios_df, "acceso_internet", 0),
+                               lambda v: pos_internet.get(int(v), len(pos_internet)))
+    dispositivo = _mapear_valores(_columna(usuarios_df, "dispositivo_propio", 0),
+                                  lambda v: pos_dispositivo.get(int(v), len(pos_dispositivo)))
+    edad = _tramos_edad_vectorizado(_columna(usuarios_df, "edad", 0))
+
+    return np.ravel_multi_index((ocupacion, internet, dispositivo, edad), _dimensiones_tabla(pesos_internos))
+
+
+def construir_tabla_puntajes(pesos_internos: dict, pesos_globales: dict) -> np.ndarray:
+    """
+    Construye la tabla con el puntaje de CADA combinación posible de categorías
+    (unos cientos de celdas). Se rellena de nuevo cada vez que cambian los pesos.
+
+    Args:
+        pesos_internos (dict): Puntajes internos por categoría.
+        pesos_globales (dict): Pesos de cada criterio (sliders).
+
+    Returns:
+        np.ndarray: Tabla aplanada, indexable con los códigos de codificar_usuarios.
+    """
+    ocupacion = np.array(list(pesos_internos["ocupacion"].values()) + [0])
+    internet = np.array(list(pesos_internos["acceso_internet"].values()) + [0])
+    dispositivo = np.array(list(pesos_internos["dispositivo_propio"].values()) + [0])
+
+    # Mismo orden de suma que calcular_puntaje_row (resultados idénticos)
+    s = 0
+    s = s + (ocupacion * pesos_globales["ocupacion"])[:, None, None, None]
+    s = s + (internet * pesos_globales["acceso_internet"])[None, :, None, None]
+    s = s + (dispositivo * pesos_globales["dispositivo_propio"])[None, None, :, None]
+    s = s + (PUNTAJES_EDAD * pesos_globales["edad"])[None, None, None, :]
+
+    return s.ravel()
+
+
+def calcular_puntajes_vectorizado(usuarios_df: pd.DataFrame, pesos_internos: dict, pesos_globales: dict) -> pd.Series:
+    """
+    Calcula el puntaje de TODOS los usuarios con operaciones de arreglos.
+    Reemplazo directo de `usuarios_df.apply(calcular_puntaje_row, axis=1)`:
+    produce exactamente los mismos puntajes.
+
+    Args:
+        usuarios_df (pd.DataFrame): Tabla de usuarios.
+        pesos_internos (dict): Puntajes internos por categoría.
+        pesos_globales (dict): Pesos de cada criterio (sliders).
+
+    Returns:
+        pd.Series: Puntajes alineados con el índice de usuarios_df.
+    """
+    tabla = construir_tabla_puntajes(pesos_internos, pesos_globales)
+    codigos = codificar_usuarios(usuarios_df, pesos_internos)
+    return pd.Series(tabla[codigos], index=usuarios_df.index, name="puntaje")
+
+
+def _huella_codigos(codigos: np.ndarray) -> str:
+    """Huella (hash) de los datos de usuarios relevantes para el puntaje: sus códigos, en orden."""
+    return hashlib.blake2b(np.ascontiguousarray(codigos, dtype=np.int64).tobytes(), digest_size=16).hexdigest()
+
+
+def _guardar_codigos(codigos: pd.Series):
+    """Guarda los códigos en la sesión junto con su huella (versión de los datos)."""
+    st.session_state["codigos_usuarios"] = codigos
+    st.session_state["huella_usuarios"] = _huella_codigos(codigos.to_numpy())
+
+
+def _codigos_en_sesion(usuarios_df: pd.DataFrame) -> np.ndarray:
+    """Devuelve los códigos de la sesión; solo codifica si la tabla de usuarios cambió de forma."""
+    codigos = st.session_state.get("codigos_usuarios")
+    if codigos is None or not codigos.index.equals(usuarios_df.index):
+        print("🔢 Codificando usuarios para la tabla de puntajes...")
+        codigos = pd.Series(codificar_usuarios(usuarios_df, pesos_internos), index=usuarios_df.index)
+        _guardar_codigos(codigos)
+    return codigos.to_numpy()
+
+
+@st.cache_data(max_entries=32, show_spinner=False)  # LRU: conserva las 32 combinaciones más recientes
+def _puntajes_memoizados(huella_usuarios: str, clave_pesos: tuple, _codigos: np.ndarray) -> np.ndarray:
+    """
+    Puntajes cacheados por (versión de los datos de usuarios, configuración de pesos).
+    Volver a una configuración de pesos ya usada es un acierto de caché.
+
+    El guion bajo en `_codigos` le indica a Streamlit que NO lo hashee:
+    la huella_usuarios ya lo identifica.
+    """
+    print(f"[{datetime.datetime.now()}] 🧮 Caché de puntajes: calculando para pesos {dict(clave_pesos)}")
+    return construir_tabla_puntajes(pesos_internos, dict(clave_pesos))[_codigos]
+
 
 def recalcular_puntajes_asignaciones():
     """ Calcula los puntajes y lo guarda en la columna puntaje de la sessionState usuarios"""
     usuarios_df = st.session_state["usuarios"]
     print("🔄 Recalculando puntajes...")
 
-    nuevos_puntajes = usuarios_df.apply(
-        calcular_puntaje_row,  # La función que se llamará por cada fila
-        axis=1,  # ¡Importante! Significa "por fila"
-
-        # --- Argumentos extra que se pasarán a 'calcular_puntaje_row' ---
-        pesos_globales=st.session_state["pesos_globales"],
-        pesos_internos=pesos_internos
+    # Rellenar la tabla (pocos cientos de celdas) y hacer un único gather, memoizado
+    pesos_globales = st.session_state["pesos_globales"]
+    tabla = construir_tabla_puntajes(pesos_internos, pesos_globales)
+    codigos = _codigos_en_sesion(usuarios_df)
+    nuevos_puntajes = pd.Series(
+        _puntajes_memoizados(st.session_state["huella_usuarios"], tuple(sorted(pesos_globales.items())), codigos),
+        index=usuarios_df.index
     )
 
     st.session_state["usuarios"]["puntaje"] = nuevos_puntajes
+    # Guardamos con qué pesos se calculó para evitar recálculos completos innecesarios
+    st.session_state["tabla_puntajes"] = tabla
+    st.session_state["pesos_puntaje"] = dict(st.session_state["pesos_globales"])
+    # Los puntajes cambiaron: el índice de prioridad se reconstruye en la próxima lectura
+    st.session_state.pop("indice_pendientes", None)
 
     print("✅ Recálculo local completado")
 
+
+def pesos_cambiaron() -> bool:
+    """True si los puntajes en sesión no corresponden a los pesos_globales actuales."""
+    return st.session_state.get("pesos_puntaje") != st.session_state["pesos_globales"]
+
+
+def recalcular_puntajes_incremental(indices):
+    """
+    Calcula el puntaje SOLO de las filas indicadas (nuevas o modificadas)
+    y lo fusiona en la columna puntaje de la sessionState usuarios.
+    Si los pesos cambiaron desde el último cálculo, hace un recálculo completo.
+
+    Args:
+        indices: Etiquetas del índice de st.session_state["usuarios"] a puntuar.
+    """
+    if pesos_cambiaron():
+        recalcular_puntajes_asignaciones()
+        return
+
+    usuarios_df = st.session_state["usuarios"]
+    filas = usuarios_df.loc[indices]
+    print(f"🔄 Puntuando {len(filas)} usuario(s) nuevo(s)/modificado(s)...")
+
+    nuevos_codigos = codificar_usuarios(filas, pesos_internos)
+    usuarios_df.loc[indices, "puntaje"] = st.session_state["tabla_puntajes"][nuevos_codigos]
+
+    # Mantener los códigos de la sesión alineados con la tabla de usuarios
+    codigos = st.session_state.get("codigos_usuarios")
+    if codigos is not None:
+        codigos = codigos.reindex(usuarios_df.index)
+        codigos.loc[filas.index] = nuevos_codigos
+        if codigos.isna().any():
+            st.session_state["codigos_usuarios"] = None
+        else:
+            _guardar_codigos(codigos.astype(np.int64))
+
+    # Mantener el índice de pendientes al día: O(log n) por usuario
+    indice = st.session_state.get("indice_pendientes")
+    if indice is not None:
+        ids_activos = None
+        for _, fila in usuarios_df.loc[filas.index].iterrows():
+            id_usuario = int(fila["id"])
+            if indice.eliminar(id_usuario):
+                indice.insertar(id_usuario, fila["puntaje"], fila.get("fecha_registro"))
+                continue
+            if ids_activos is None:
+                ids_activos = ids_con_cita_activa(st.session_state["asignaciones"])
+            if id_usuario not in ids_activos:
+                indice.insertar(id_usuario, fila["puntaje"], fila.get("fecha_registro"))
+
+
+# --- ÍNDICE DE PRIORIDAD (USUARIOS PENDIENTES) ---
+
+ESTADOS_CITA_ACTIVA = ["asignado", "entregado"]
+
+
+def ids_con_cita_activa(asignaciones_df: pd.DataFrame) -> set:
+    """IDs de usuario que ya tienen una cita 'asignado' o 'entregado' (no son pendientes)."""
+    if asignaciones_df.empty:
+        return set()
+
+    activas = asignaciones_df[asignaciones_df["estado"].isin(ESTADOS_CITA_ACTIVA)]
+    # id_usuario ya es INTEGER en la DB (ver data/migraciones.py): no hace falta convertir
+    return set(activas["id_usuario"].dropna().tolist())
+
+
+class IndicePrioridad:
+    """
+    Índice ordenado de los usuarios pendientes, del más prioritario al menos:
+    puntaje descendente y, a igual puntaje, fecha_registro más antigua primero.
+
+    - insertar / eliminar: búsqueda binaria O(log n) (bisect).
+    - top(k): O(k), es un simple corte de la lista ya ordenada.
+    """
+
+    def __init__(self):
+        self._claves = []  # Lista ordenada de (-puntaje, sin_fecha, fecha_registro, id)
+        self._por_id = {}  # id -> clave (para poder eliminar por id)
+
+    @staticmethod
+    def _clave(id_usuario: int, puntaje, fecha_registro) -> tuple:
+        sin_fecha = fecha_registro is None or pd.isna(fecha_registro)
+        return -float(puntaje), sin_fecha, "" if sin_fecha else str(fecha_registro), int(id_usuario)
+
+    @classmethod
+    def desde_dataframe(cls, usuarios_df: pd.DataFrame) -> "IndicePrioridad":
+        """Construye el índice (O(n log n)) a partir de un DataFrame con id, puntaje y fecha_registro."""
+        indice = cls()
+        fechas = usuarios_df["fecha_registro"] if "fecha_registro" in usuarios_df.columns \
+            else [None] * len(usuarios_df)
+        for id_usuario, puntaje, fecha in zip(usuarios_df["id"], usuarios_df["puntaje"], fechas):
+            clave = cls._clave(id_usuario, puntaje, fecha)
+            indice._por_id[clave[-1]] = clave
+        indice._claves = sorted(indice._por_id.values())
+        return indice
+
+    def insertar(self, id_usuario: int, puntaje, fecha_registro):
+        """Agrega (o reubica) a un usuario pendiente."""
+        self.eliminar(id_usuario)
+        clave = self._clave(id_usuario, puntaje, fecha_registro)
+        bisect.insort(self._claves, clave)
+        self._por_id[clave[-1]] = clave
+
+    def eliminar(self, id_usuario: int) -> bool:
+        """Quita a un usuario (p. ej. porque recibió una cita). Devuelve True si estaba en el índice."""
+        clave = self._por_id.pop(int(id_usuario), None)
+        if clave is None:
+            return False
+        del self._claves[bisect.bisect_left(self._claves, clave)]
+        return True
+
+    def top(self, k: int = None) -> list:
+        """IDs de los k usuarios más prioritarios (todos si k es None)."""
+        claves = self._claves if k is None else self._claves[:k]
+        return [clave[-1] for clave in claves]
+
+    def __len__(self):
+        return len(self._claves)
+
+    def __contains__(self, id_usuario):
+        return int(id_usuario) in self._por_id
+
+
+def obtener_indice_pendientes() -> IndicePrioridad:
+    """
+    Devuelve el índice de prioridad de la sesión, construyéndolo solo si no existe
+    (primera carga, recarga de tablas o cambio de pesos).
+    """
+    indice = st.session_state.get("indice_pendientes")
+    if indice is None:
+        print("📇 Construyendo índice de prioridad de pendientes...")
+        usuarios_df = st.session_state["usuarios"]
+        activos = ids_con_cita_activa(st.session_state["asignaciones"])
+        pendientes = usuarios_df[~usuarios_df["id"].isin(activos)]
+        indice = IndicePrioridad.desde_dataframe(pendientes)
+        st.session_state["indice_pendientes"] = indice
+    return indice
+
+
+def actualizar_pendientes(ids_usuario):
+    """
+    Revisa SOLO a estos usuarios (p. ej. los de asignaciones que cambiaron) y los
+    saca o devuelve al índice de pendientes según tengan o no una cita activa.
+    Si el índice aún no existe no hace nada: se construirá completo al leerlo.
+
+    Args:
+        ids_usuario: IDs de usuario a revisar.
+    """
+    indice = st.session_state.get("indice_pendientes")
+    if indice is None or not ids_usuario:
+        return
+
+    activos = ids_con_cita_activa(st.session_state["asignaciones"])
+    usuarios_df = st.session_state["usuarios"]
+    candidatos = usuarios_df[usuarios_df["id"].isin(ids_usuario)]
+    for id_usuario in ids_usuario:
+        if id_usuario in activos:
+            indice.eliminar(id_usuario)
+    for _, fila in candidatos.iterrows():
+        if fila["id"] not in activos and fila["id"] not in indice:
+            indice.insertar(fila["id"], fila["puntaje"], fila.get("fecha_registro"))
+
+
+def top_pendientes(k: int = None) -> pd.DataFrame:
+    """
+    Los k usuarios pendientes más prioritarios, ya ordenados, leídos del índice.
+
+    Args:
+        k (int): Cantidad de usuarios (todos si es None).
+
+    Returns:
+        pd.DataFrame: Filas de st.session_state["usuarios"] en orden de prioridad.
+    """
+    ids = obtener_indice_pendientes().top(k)
+    usuarios_df = st.session_state["usuarios"]
+    seleccion = usuarios_df[usuarios_df["id"].isin(ids)]
+    return seleccion.set_index(seleccion["id"]).loc[ids].reset_index(drop=True)
+
+
 def edad_interna(e):
     try:
         e = int(e)
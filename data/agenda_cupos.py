@@ -0,0 +1,145 @@
+# data/agenda_cupos.py
+
+import sqlite3
+
+import numpy as np
+
+from data.conexion_sqlite import ConexionSQLite
+
+# Estados de 'asignaciones' que ocupan un cupo en su fecha_cita
+ESTADOS_QUE_OCUPAN_CUPO = ("asignado", "ausente_1", "entregado")
+
+
+class AgendaCupos:
+    """
+    Libro de cupos por día (tabla 'agenda_cupos', creada por la migración 5), indexado
+    por fecha_cita. Lleva la cuenta de cuántas citas ocupa cada día para que el agendador
+    llene primero los cupos libres y no sobrecargue días ya reservados.
+    """
+
+    def __init__(self, conexion: ConexionSQLite):
+        """
+        Args:
+            conexion (ConexionSQLite): Conexión a la base de datos de la app.
+        """
+        self.conexion = conexion
+
+    def asignar_fechas(self, n: int, capacidad_diaria: int, fecha_inicio) -> np.ndarray:
+        """
+        Reparte n citas en los primeros cupos libres a partir de fecha_inicio,
+        respetando lo que ya está ocupado cada día. Lee la ocupación con UNA sola consulta.
+
+        Lee con la conexión de escritura: llamarla dentro de conexion.transaccion(inmediata=True)
+        junto con registrar(), para que otra sesión no ocupe los mismos cupos entre medio.
+
+        Args:
+            n (int): Cantidad de citas a ubicar.
+            capacidad_diaria (int): Máximo de citas por día.
+            fecha_inicio (datetime.date): Primer día posible.
+
+        Returns:
+            np.ndarray: n fechas 'YYYY-MM-DD', en orden (la i-ésima cita, el i-ésimo cupo libre).
+        """
+        inicio = np.datetime64(fecha_inicio, "D")
+
+        with self.conexion.escritura() as conn:
+            filas = conn.execute(
+                "SELECT fecha_cita, ocupados FROM agenda_cupos WHERE fecha_cita >= ? ORDER BY fecha_cita",
+                (str(inicio),)
+            ).fetchall()
+        ocupacion = dict(filas)
+
+        # Cada día ya ocupado puede empujar como máximo un día extra
+        horizonte = -(-n // capacidad_diaria) + len(ocupacion)
+        dias = inicio + np.arange(horizonte)
+        ocupados = np.array([ocupacion.get(d, 0) for d in np.datetime_as_string(dias, unit="D")], dtype=np.int64)
+        libres = np.clip(capacidad_diaria - ocupados, 0, None)
+
+        return np.datetime_as_string(np.repeat(dias, libres)[:n], unit="D")
+
+    def registrar(self, fechas, delta: int = 1) -> bool:
+        """
+        Suma (o resta, con delta negativo) un cupo ocupado por cada fecha recibida.
+        Agrupa por día y escribe todo con un único executemany.
+        Dentro de conexion.transaccion() se confirma junto con el resto del grupo.
+
+        Args:
+            fechas: Iterable de fechas 'YYYY-MM-DD' (puede repetir días).
+            delta (int): +1 para ocupar, -1 para liberar.
+
+        Returns:
+            bool: True si fue exitoso, False si falló.
+        """
+        # Solo fechas válidas (una cita sin fecha no ocupa ningún día)
+        fechas = [str(f) for f in fechas if isinstance(f, (str, np.str_)) and f]
+        if not fechas:
+            return True
+        dias, conteos = np.unique(fechas, return_counts=True)
+
+        try:
+            with self.conexion.escritura() as conn:
+                conn.executemany(
+                    "INSERT INTO agenda_cupos (fecha_cita, ocupados) VALUES (?, MAX(0, ?)) "
+                    "ON CONFLICT(fecha_cita) DO UPDATE SET ocupados = MAX(0, ocupados + ?)",
+                    [(str(dia), int(conteo) * delta, int(conteo) * delta) for dia, conteo in zip(dias, conteos)]
+                )
+                if not self.conexion.en_transaccion:
+                    conn.commit()
+                self.conexion.registrar_escritura("agenda_cupos")
+            return True
+
+        except sqlite3.Error as e:
+            if self.conexion.en_transaccion: raise  # transaccion() revierte todo el grupo
+            print(f"  > ¡ERROR! Transacción revertida (rollback) para 'agenda_cupos'.")
+            print(f"Error al registrar cupos: {e}")
+            return False
+
+    def reconstruir(self, fechas) -> bool:
+        """
+        Vuelve a contar desde 'asignaciones' los cupos ocupados de esos días, para
+        escrituras que no pasaron por registrar()/mover()/liberar() (p. ej. filas
+        recibidas de Google Sheets). Dentro de conexion.transaccion() se confirma junto
+        con el resto del grupo.
+
+        Args:
+            fechas: Iterable de fechas 'YYYY-MM-DD' de los días afectados.
+
+        Returns:
+            bool: True si fue exitoso, False si falló.
+        """
+        dias = sorted({str(f) for f in fechas if isinstance(f, (str, np.str_)) and f})
+        if not dias:
+            return True
+        estados = ", ".join(["?"] * len(ESTADOS_QUE_OCUPAN_CUPO))
+
+        try:
+            with self.conexion.escritura() as conn:
+                # Por lotes: límite de parámetros de SQLite
+                for inicio in range(0, len(dias), 900):
+                    lote = dias[inicio:inicio + 900]
+                    marcas = ", ".join(["?"] * len(lote))
+                    conn.execute(f"DELETE FROM agenda_cupos WHERE fecha_cita IN ({marcas})", lote)
+                    conn.execute(
+                        f"INSERT INTO agenda_cupos (fecha_cita, ocupados) "
+                        f"SELECT fecha_cita, COUNT(*) FROM asignaciones "
+                        f"WHERE fecha_cita IN ({marcas}) AND estado IN ({estados}) GROUP BY fecha_cita",
+                        lote + list(ESTADOS_QUE_OCUPAN_CUPO)
+                    )
+                if not self.conexion.en_transaccion:
+                    conn.commit()
+                self.conexion.registrar_escritura("agenda_cupos")
+            return True
+
+        except sqlite3.Error as e:
+            if self.conexion.en_transaccion: raise  # transaccion() revierte todo el grupo
+            print(f"  > ¡ERROR! Transacción revertida (rollback) para 'agenda_cupos'.")
+            print(f"Error al reconstruir cupos: {e}")
+            return False
+
+    def mover(self, fecha_origen: str, fecha_destino: str) -> bool:
+        """Pasa un cupo ocupado de un día a otro (p. ej. al reprogramar por falta)."""
+        return self.registrar([fecha_origen], delta=-1) and self.registrar([fecha_destino], delta=1)
+
+    def liberar(self, fecha: str) -> bool:
+        """Libera un cupo de ese día (p. ej. al eliminar la asignación)."""
+        return self.registrar([fecha], delta=-1)
@@ -0,0 +1,122 @@
+# data/almacen_compartido.py
+
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from data.conexion_sqlite import ConexionSQLite
+from data.carga_delta import CargaDelta, aplicar_delta
+
+# Pasos de delta que recuerda cada tabla (una sesión más atrasada recarga completo)
+PASOS_HISTORIAL = 64
+
+# Versión canónica (inmutable) de una tabla:
+# - df: el DataFrame compartido (¡no modificarlo! usar una copia superficial)
+# - marca: último seq de registro_cambios incluido
+# - version: versión de la tabla en el pool cuando se armó
+# - historial: pasos (marca_desde, marca_hasta, ids_tocados) para ponerse al día
+Instantanea = namedtuple("Instantanea", ["df", "marca", "version", "historial"])
+
+
+def copia_compartida(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copia de una instantánea que se puede modificar sin tocar la compartida.
+
+    Con copy-on-write de pandas (app.py lo activa al arrancar) es una copia superficial:
+    comparte la memoria de las columnas y solo duplica la que alguien modifica, así cada
+    sesión "tiene su copia" sin duplicar la tabla. Sin copy-on-write, una copia superficial
+    dejaría que una sesión modifique la instantánea de todas: se hace una copia completa.
+    """
+    return df.copy(deep=pd.get_option("mode.copy_on_write") is not True)
+
+
+class AlmacenTablas:
+    """
+    Almacén de tablas compartido por TODAS las sesiones del proceso: guarda una sola
+    versión canónica de cada tabla. Las sesiones leen instantáneas inmutables y,
+    cuando alguien escribe en la DB, la primera sesión que pide la tabla la pone
+    al día con un delta (una sola vez para todos) y publica la nueva instantánea.
+    """
+
+    def __init__(self, db_name: str):
+        """
+        Args:
+            db_name (str): Ruta del archivo .db.
+        """
+        self.conexion = ConexionSQLite(db_name)
+        self.carga = CargaDelta(self.conexion)
+        self._instantaneas = {}
+        self._candado = threading.Lock()
+
+    def instantanea(self, table_name: str) -> Instantanea:
+        """
+        Devuelve la instantánea vigente de la tabla. Si se escribió en la tabla desde
+        la última, aplica el delta (o recarga completo si hace falta) y publica una nueva.
+
+        Args:
+            table_name (str): Nombre de la tabla (ej. 'usuarios').
+
+        Returns:
+            Instantanea: La versión canónica actual.
+        """
+        version = self.conexion.version_tabla(table_name)
+        actual = self._instantaneas.get(table_name)
+        if actual is not None and actual.version == version:
+            return actual
+
+        with self._candado:
+            # Otra sesión pudo haberla puesto al día mientras esperábamos
+            actual = self._instantaneas.get(table_name)
+            if actual is not None and actual.version == version:
+                return actual
+
+            delta = None if actual is None else self.carga.cambios_desde(table_name, actual.marca)
+            if delta is None:
+                df, marca = self.carga.cargar_completa(table_name)
+                nueva = Instantanea(df, marca, version, ())
+            else:
+                filas, borrados, marca = delta
+                df = actual.df
+                if not filas.empty or borrados:
+                    # Con copy-on-write solo se duplican las columnas que cambian
+                    df, _ = aplicar_delta(copia_compartida(actual.df), filas, borrados)
+                paso = (actual.marca, marca, frozenset(filas["id"].tolist()) | frozenset(borrados)) \
+                    if marca != actual.marca else None
+                historial = (actual.historial + (paso,))[-PASOS_HISTORIAL:] if paso else actual.historial
+                nueva = Instantanea(df, marca, version, historial)
+
+            self._instantaneas[table_name] = nueva
+            return nueva
+
+    def tocados_desde(self, instantanea: Instantanea, marca: int):
+        """
+        IDs que cambiaron (insertados, modificados o borrados) entre `marca` y la instantánea.
+
+        Args:
+            instantanea (Instantanea): Instantánea vigente (de instantanea()).
+            marca (int): Marca de la instantánea que tiene la sesión.
+
+        Returns:
+            set: IDs tocados, o None si el historial no alcanza (la sesión debe tomarla completa).
+        """
+        if marca == instantanea.marca:
+            return set()
+
+        pasos = [paso for paso in instantanea.historial if paso[0] >= marca]
+        if not pasos or pasos[0][0] != marca:
+            return None
+
+        tocados = set()
+        for _, _, ids in pasos:
+            tocados |= ids
+        return tocados
+
+
+@st.cache_resource
+def obtener_almacen(db_name: str = r"db/libreria.db") -> AlmacenTablas:
+    """Almacén de tablas del proceso (uno por archivo de DB), compartido por todas las sesiones."""
+    print(f"[{datetime.now()}] 🗃️ Creando almacén compartido de tablas para: {db_name}")
+    return AlmacenTablas(db_name)
@@ -0,0 +1,145 @@
+# data/carga_delta.py
+
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data.conexion_sqlite import ConexionSQLite
+
+
+class CargaDelta:
+    """
+    Carga incremental de tablas usando la bitácora 'registro_cambios' (ver data/migraciones.py).
+
+    Cada carga devuelve una MARCA (el último seq de la bitácora que ya incluye).
+    Con esa marca, cambios_desde() trae solo las filas insertadas o modificadas
+    después, más las lápidas (ids borrados): el costo depende del tamaño del
+    cambio, no del tamaño de la tabla.
+    """
+
+    def __init__(self, conexion: ConexionSQLite):
+        """
+        Args:
+            conexion (ConexionSQLite): Conexión a la base de datos de la app.
+        """
+        self.conexion = conexion
+
+    def cargar_completa(self, table_name: str):
+        """
+        Carga la tabla completa junto con su marca, leídas en la MISMA instantánea
+        (ningún cambio queda entre la tabla y la marca). Sin caché: quien la guarda
+        es el almacén compartido (ver data/almacen_compartido.py).
+
+        Args:
+            table_name (str): Nombre de la tabla (ej. 'asignaciones').
+
+        Returns:
+            tuple: (pd.DataFrame, int marca). Si falla: (DataFrame vacío, 0).
+        """
+        return _leer_con_marca(self.conexion, table_name)
+
+    def cambios_desde(self, table_name: str, marca: int):
+        """
+        Trae lo que cambió en la tabla después de la marca.
+
+        Args:
+            table_name (str): Nombre de la tabla.
+            marca (int): Marca de la última carga (completa o incremental).
+
+        Returns:
+            tuple: (filas, borrados, nueva_marca) donde filas es un DataFrame con las filas
+                insertadas/modificadas y borrados un set de ids borrados (lápidas).
+                None si la marca es anterior a lo que conserva la bitácora (hay que recargar completo).
+        """
+        return _leer_cambios(self.conexion, table_name, int(marca))
+
+
+def _instantanea_marca(conn: sqlite3.Connection):
+    """Abre una transacción de lectura y devuelve (marca actual, menor seq conservado)."""
+    conn.execute("BEGIN")
+    marca, seq_min = conn.execute("SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM registro_cambios").fetchone()
+    return marca, seq_min
+
+
+def _leer_con_marca(conexion: ConexionSQLite, table_name: str):
+    """Lectura completa + marca en una sola transacción de lectura."""
+    print(f"[{datetime.now()}] 🔄 Ejecutando LECTURA COMPLETA de DB: 'SELECT * FROM {table_name}' (con marca)")
+    try:
+        with conexion.lectura() as conn:
+            marca, _ = _instantanea_marca(conn)
+            df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
+        return df, marca
+    except (pd.errors.DatabaseError, sqlite3.Error) as e:
+        st.warning(f"No se pudo cargar la tabla {table_name}: {e}. ¿Existe?")
+        return pd.DataFrame(), 0
+
+
+def _leer_cambios(conexion: ConexionSQLite, table_name: str, marca: int):
+    """Filas cambiadas + lápidas desde la marca, en una sola transacción de lectura."""
+    try:
+        with conexion.lectura() as conn:
+            nueva_marca, seq_min = _instantanea_marca(conn)
+            if nueva_marca == marca:
+                return pd.DataFrame(), set(), marca
+            if seq_min is None or seq_min > marca + 1:
+                print(f"[{datetime.now()}] ⚠️ Marca {marca} ya podada de la bitácora: recarga completa de '{table_name}'")
+                return None
+
+            rango = (table_name, marca, nueva_marca)
+            tocados = {fila[0] for fila in conn.execute(
+                "SELECT DISTINCT id_fila FROM registro_cambios WHERE tabla = ? AND seq > ? AND seq <= ?", rango
+            )}
+            filas = pd.read_sql_query(
+                f"SELECT * FROM {table_name} WHERE id IN "
+                "(SELECT id_fila FROM registro_cambios WHERE tabla = ? AND seq > ? AND seq <= ?)",
+                conn, params=rango
+            )
+    except (pd.errors.DatabaseError, sqlite3.Error) as e:
+        print(f"Error al leer cambios de {table_name}: {e}")
+        return None
+
+    # Lápidas: ids tocados que ya no existen en la tabla
+    borrados = tocados - set(filas["id"].tolist())
+    print(f"[{datetime.now()}] 🔄 Delta de '{table_name}': {len(filas)} fila(s) nuevas/modificadas, "
+          f"{len(borrados)} borrada(s) (marca {marca} -> {nueva_marca})")
+    return filas, borrados, nueva_marca
+
+
+def aplicar_delta(df: pd.DataFrame, filas: pd.DataFrame, borrados: set, clave: str = "id"):
+    """
+    Fusiona un delta en un DataFrame en memoria: quita los borrados, actualiza en su
+    lugar las filas que ya estaban (por clave) y agrega al final las nuevas.
+    Las columnas que no vienen en el delta (p. ej. 'puntaje', virtual) se conservan.
+
+    Args:
+        df (pd.DataFrame): La tabla en memoria (p. ej. de st.session_state).
+        filas (pd.DataFrame): Filas insertadas/modificadas (de cambios_desde).
+        borrados (set): Claves borradas.
+        clave (str): Columna clave (única) para emparejar filas.
+
+    Returns:
+        tuple: (pd.DataFrame fusionado, pd.Index con las etiquetas de las filas actualizadas/nuevas).
+    """
+    if borrados:
+        df = df.loc[~df[clave].isin(borrados)].copy()
+    if filas.empty:
+        return df, df.index[:0]
+
+    posicion = pd.Series(np.arange(len(df)), index=df[clave].to_numpy())
+    ya_estan = filas[clave].isin(posicion.index).to_numpy()
+
+    existentes = filas[ya_estan]
+    etiquetas_existentes = df.index[posicion.loc[existentes[clave].to_numpy()].to_numpy()]
+    for col in filas.columns:
+        df.loc[etiquetas_existentes, col] = existentes[col].to_numpy()
+
+    nuevas = filas[~ya_estan]
+    inicio = int(df.index.max()) + 1 if len(df) else 0
+    nuevas = nuevas.set_axis(pd.RangeIndex(inicio, inicio + len(nuevas)))
+    if not nuevas.empty:
+        df = pd.concat([df, nuevas]) if len(df) else nuevas.copy()
+
+    return df, etiquetas_existentes.append(nuevas.index)
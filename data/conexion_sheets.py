@@ -1,58 +1,285 @@
 # data/conexion_sheets.py
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
 import gspread
 import pandas as pd
+import requests
+from gspread.utils import a1_range_to_grid_range, absolute_range_name, fill_gaps, numericise_all, to_records
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# --- CUOTA Y REINTENTOS DE LA API DE GOOGLE SHEETS ---
+# Cuota de la API: 60 peticiones por minuto por usuario (lecturas y escrituras por separado)
+PETICIONES_POR_MINUTO = 60
+# Ráfaga del límite de tasa: peticiones que pueden salir de golpe, descontadas de la tasa
+# sostenida para que ninguna ventana de 60 s supere la cuota
+RAFAGA_POR_DEFECTO = 5
+# Hilos para leer hojas independientes a la vez (acotado: más hilos solo agotan la cuota antes)
+HILOS_POR_DEFECTO = 4
+# Hojas por petición values_batch_get (los nombres van en la URL)
+HOJAS_POR_LOTE = 50
+
+# Reintentos con espera exponencial con jitter (full jitter: al azar entre 0 y base * 2^intento)
+INTENTOS_MAXIMOS = 6
+ESPERA_BASE = 1.0  # segundos
+ESPERA_MAXIMA = 64.0  # segundos (la guía de Google para 429 sugiere hasta ~64 s)
+# 429 = cuota agotada, 5xx = error temporal del servidor
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+# Columnas de la hoja 'Asignaciones' cuando está vacía (sin encabezado)
+ASIGNACIONES_COLUMNS = [
+    'id_usuario',
+    'id_recurso',
+    'puntaje',
+    'estado',
+    'fecha_cita',
+    'intentos_fallidos'
+]
+
+
+def _codigo_http(error: Exception):
+    """Código HTTP de un error de la API de gspread (None si no lo tiene)."""
+    respuesta = getattr(error, "response", None)
+    return getattr(respuesta, "status_code", None) or getattr(error, "code", None)
+
+
+def es_reintentable(error: Exception) -> bool:
+    """Errores temporales: cuota agotada (429), 5xx o fallas de red. Reintentar no cambia el resultado."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return _codigo_http(error) in CODIGOS_REINTENTABLES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def es_cuota_agotada(error: Exception) -> bool:
+    """Solo 429: la API rechazó la petición sin aplicarla (seguro de reintentar aunque no sea idempotente)."""
+    return isinstance(error, gspread.exceptions.APIError) and _codigo_http(error) == 429
+
+
+def _avisar_reintento(estado):
+    """Log de tenacity antes de cada espera entre reintentos."""
+    error = estado.outcome.exception()
+    print(f"⚠️ Error temporal de Google Sheets ({_codigo_http(error) or type(error).__name__}), "
+          f"reintento {estado.attempt_number} en {estado.next_action.sleep:.2f} s...")
+
+
+def _llamar_directo(funcion, *args, idempotente: bool = True, **kwargs):
+    """Petición sin límite de tasa ni reintentos (EscritorLotes usado fuera de ConexionSheets)."""
+    return funcion(*args, **kwargs)
+
+
+class LimitadorTasa:
+    """
+    Cubeta de fichas (token bucket) compartida por todos los hilos: permite ráfagas de hasta
+    `capacidad` peticiones y recarga (por_minuto - capacidad) fichas por minuto, así que en
+    cualquier ventana de 60 s salen como mucho `por_minuto` peticiones (la cuota de la API).
+    Cada petición toma una ficha; si no hay, espera a que se recargue.
+    """
+
+    def __init__(self, por_minuto: float = PETICIONES_POR_MINUTO, capacidad: int = RAFAGA_POR_DEFECTO):
+        """
+        Args:
+            por_minuto (float): Peticiones como máximo en cualquier ventana de 60 s.
+            capacidad (int): Ráfaga máxima (a lo sumo la mitad de la cuota).
+        """
+        self.capacidad = max(1, min(int(capacidad or RAFAGA_POR_DEFECTO), int(por_minuto // 2)))
+        # Con cuotas menores a 2/min la ráfaga mínima (1) se pasa un poco de la cuota
+        self.tasa = max(por_minuto - self.capacidad, por_minuto / 2) / 60.0
+        self._fichas = float(self.capacidad)
+        self._ultima_recarga = time.monotonic()
+        self._candado = threading.Lock()
+
+    def tomar(self):
+        """Toma una ficha (bloquea hasta que haya una)."""
+        while True:
+            with self._candado:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima_recarga) * self.tasa)
+                self._ultima_recarga = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.tasa
+            time.sleep(espera)
+
+
+# Un límite de tasa por cuota para todo el proceso: la cuota de la API es de la cuenta de
+# servicio, no de cada ConexionSheets (cada sesión de Streamlit crea la suya)
+_limitadores = {}
+_candado_limitadores = threading.Lock()
+
+
+def limitador_compartido(por_minuto: float = PETICIONES_POR_MINUTO) -> LimitadorTasa:
+    """LimitadorTasa del proceso para esa cuota (se crea la primera vez que se pide)."""
+    with _candado_limitadores:
+        if por_minuto not in _limitadores:
+            _limitadores[por_minuto] = LimitadorTasa(por_minuto)
+        return _limitadores[por_minuto]
 
 
 class ConexionSheets:
     """
     Clase para manejar la conexión y lectura de datos desde Google Sheets.
+
+    Cada petición a la API pasa por llamar(): respeta la cuota (el LimitadorTasa compartido
+    por todas las conexiones del proceso, ver limitador_compartido()) y reintenta los errores
+    temporales (429/5xx) con espera exponencial con jitter. Las hojas independientes se
+    leen en paralelo con un pool de hilos acotado.
     """
 
-    def __init__(self, creds_json, spreadsheet_name):
+    def __init__(self, creds_json, spreadsheet_name, por_minuto: float = PETICIONES_POR_MINUTO,
+                 hilos: int = HILOS_POR_DEFECTO, limitador: LimitadorTasa = None):
 
         self.creds_json = creds_json
         self.spreadsheet_name = spreadsheet_name
         self.client = None
         self.spreadsheet = None
+        self.hilos = hilos
+        self.limitador = limitador or limitador_compartido(por_minuto)
+        self.intentos_maximos = INTENTOS_MAXIMOS
+        self.espera_base = ESPERA_BASE
+        self.espera_maxima = ESPERA_MAXIMA
+        self._candado_conexion = threading.Lock()
 
     def connect(self):
 
-        if self.spreadsheet is None:
-            self.client = gspread.service_account(filename=self.creds_json)
-            self.spreadsheet = self.client.open(self.spreadsheet_name)
+        # Con candado: varios hilos pueden pedir la conexión a la vez
+        with self._candado_conexion:
+            if self.spreadsheet is None:
+                self.client = gspread.service_account(filename=self.creds_json)
+                self.spreadsheet = self.llamar(self.client.open, self.spreadsheet_name)
         return self.spreadsheet
 
-    def get_worksheet_df(self, sheet_name):
+    def llamar(self, funcion, *args, idempotente: bool = True, **kwargs):
+        """
+        Hace UNA petición a la API (p. ej. worksheet.get_all_records) respetando el límite
+        de tasa y reintentando los errores temporales con espera exponencial con jitter.
+
+        Args:
+            funcion: Método de gspread a llamar.
+            idempotente (bool): False para peticiones que no se pueden repetir sin efecto
+                (append, borrar filas): solo se reintentan si la API las rechazó (429).
 
-        ASSIGNACIONES_COLUMNS = [
-            'id_usuario',
-            'id_recurso',
-            'puntaje',
-            'estado',
-            'fecha_cita',
-            'intentos_fallidos'
-        ]
+        Returns:
+            Lo que devuelva `funcion`. Si se agotan los reintentos, relanza el último error.
+        """
+        reintentar = es_reintentable if idempotente else es_cuota_agotada
+        for intento in Retrying(
+            retry=retry_if_exception(reintentar),
+            wait=wait_random_exponential(multiplier=self.espera_base, max=self.espera_maxima),
+            stop=stop_after_attempt(self.intentos_maximos),
+            before_sleep=_avisar_reintento,
+            reraise=True,
+        ):
+            with intento:
+                self.limitador.tomar()
+                return funcion(*args, **kwargs)
+
+    def get_worksheet_df(self, sheet_name):
 
         spreadsheet = self.connect()
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = self.llamar(spreadsheet.worksheet, sheet_name)
 
         # Obtiene el DataFrame (será Empty DataFrame, Columns: [] si está vacía)
-        df = pd.DataFrame(worksheet.get_all_records())
+        return self._registros_a_df(sheet_name, self.llamar(worksheet.get_all_records))
+
+    @staticmethod
+    def _registros_a_df(sheet_name, registros):
+        """Arma el DataFrame de una hoja a partir de sus registros (lista de dicts)."""
+
+        df = pd.DataFrame(registros)
 
         # Lógica de verificación para hojas vacías
         if df.empty and not df.columns.any() and sheet_name == "Asignaciones":
             print(f"⚠️ Aviso: La hoja '{sheet_name}' está vacía. Creando estructura de columnas.")
             # Crea un DataFrame vacío con las columnas predefinidas
-            df = pd.DataFrame(columns=ASSIGNACIONES_COLUMNS)
+            df = pd.DataFrame(columns=ASIGNACIONES_COLUMNS)
 
         return df
 
-    def load_data(self, sheet_names):
+    @staticmethod
+    def _valores_a_registros(valores):
+        """
+        Convierte los valores crudos de una hoja (filas de celdas, la primera es el encabezado)
+        en registros, igual que worksheet.get_all_records(): rellena las filas cortas,
+        convierte a número los textos numéricos y rechaza encabezados repetidos
+        (lanza gspread.exceptions.GSpreadException).
+        """
+        if not valores:
+            return []
+
+        valores = fill_gaps(valores)
+        encabezado, filas = valores[0], valores[1:]
+
+        # Como get_all_records(): con columnas repetidas se perderían datos (un dict por fila)
+        repetidas = [columna for columna, n in Counter(encabezado).items() if n > 1]
+        if repetidas:
+            raise gspread.exceptions.GSpreadException(
+                f"the header row in the worksheet contains duplicates: {repetidas}"
+            )
+        return to_records(encabezado, [numericise_all(fila) for fila in filas])
 
+    def load_data(self, sheet_names, batch=True):
+        """
+        Carga varias hojas como DataFrames.
+
+        Args:
+            sheet_names (list): Nombres de las hojas (ej. ['Usuarios', 'Asignaciones']).
+            batch (bool): True = UNA petición values_batch_get cada HOJAS_POR_LOTE hojas y los
+                DataFrames se arman en local. False = hoja por hoja (2 peticiones por hoja).
+                En ambos modos las peticiones independientes van en paralelo (self.hilos).
+
+        Returns:
+            dict: {nombre_hoja: pd.DataFrame}
+        """
         spreadsheet = self.connect()
-        data = {sheet: self.get_worksheet_df(sheet) for sheet in sheet_names}
+        sheet_names = list(sheet_names)
+        if not sheet_names:
+            return {}
+
+        if not batch:
+            dfs = self._en_paralelo(self.get_worksheet_df, sheet_names)
+            return dict(zip(sheet_names, dfs))
+
+        lotes = [sheet_names[i:i + HOJAS_POR_LOTE] for i in range(0, len(sheet_names), HOJAS_POR_LOTE)]
+        valores_por_lote = self._en_paralelo(lambda lote: self._leer_lote(spreadsheet, lote), lotes)
+
+        data = {}
+        for lote, rangos_valores in zip(lotes, valores_por_lote):
+            for sheet, rango in zip(lote, rangos_valores):
+                registros = self._valores_a_registros(rango.get("values", []))
+                data[sheet] = self._registros_a_df(sheet, registros)
         return data
 
+    def _leer_lote(self, spreadsheet, sheet_names):
+        """Valores de varias hojas en UNA petición (la respuesta viene en el mismo orden)."""
+        # Un rango por hoja (solo el nombre = la hoja entera)
+        rangos = [absolute_range_name(sheet) for sheet in sheet_names]
+        respuesta = self.llamar(spreadsheet.values_batch_get, rangos)
+        return respuesta.get("valueRanges", [])
+
+    def _en_paralelo(self, funcion, elementos: list) -> list:
+        """Aplica `funcion` a cada elemento con el pool de hilos (resultados en el mismo orden)."""
+        if len(elementos) <= 1 or self.hilos <= 1:
+            return [funcion(elemento) for elemento in elementos]
+        with ThreadPoolExecutor(max_workers=min(self.hilos, len(elementos))) as pool:
+            return list(pool.map(funcion, elementos))
+
+    def escritor_lotes(self, sheet_name: str) -> "EscritorLotes":
+        """Escritor con buffer para hacer muchos upserts en la hoja (ver EscritorLotes)."""
+        return EscritorLotes(self.llamar(self.connect().worksheet, sheet_name), llamar=self.llamar)
+
+    def save_or_update_many(self, sheet_name: str, rows: list):
+        """
+        Upsert de muchas filas a la vez (clave = primera columna), en lote:
+        1 lectura de la columna de claves + 1 actualización en lote + 1 inserción en lote,
+        en vez de find() + update()/append_row() por cada fila.
+        """
+        with self.escritor_lotes(sheet_name) as escritor:
+            for row in rows:
+                escritor.upsert(row)
+
     def save_or_update(self, sheet_name: str, row: list):
 
         if not row:
@@ -60,7 +287,7 @@ class ConexionSheets:
             return
 
         spreadsheet = self.connect()
-        worksheet = spreadsheet.worksheet(sheet_name)
+        worksheet = self.llamar(spreadsheet.worksheet, sheet_name)
 
         # Definir la clave de búsqueda (user_id)
         search_key_value = str(row[0])
@@ -74,7 +301,7 @@ class ConexionSheets:
         cell = None
         try:
             # Intentamos encontrar la celda con el user_id en la Columna 1 ('A')
-            cell = worksheet.find(search_key_value, in_column=1)
+            cell = self.llamar(worksheet.find, search_key_value, in_column=1)
         except Exception as e:
             # Capturamos la excepción
 
@@ -86,12 +313,132 @@ class ConexionSheets:
 
             # Ejecutar la actualización
             range_to_update = f'A{row_to_update_index}'
-            worksheet.update(range_to_update, [row], value_input_option='USER_ENTERED')
+            self.llamar(worksheet.update, range_to_update, [row], value_input_option='USER_ENTERED')
             print(
                 f"✅ Fila actualizada en '{sheet_name}' para user_id = '{search_key_value}' (Fila {row_to_update_index}).")
 
         else:
 
-            worksheet.append_row(row, value_input_option='USER_ENTERED')
+            self.llamar(worksheet.append_row, row, value_input_option='USER_ENTERED', idempotente=False)
             print(f"✅ Nueva fila insertada en '{sheet_name}' para user_id = '{search_key_value}'.")
 
+
+class EscritorLotes:
+    """
+    Upserts con buffer sobre UNA hoja (clave = columna 'A', como save_or_update).
+
+    - Índice local clave -> número de fila, armado con UNA lectura de la columna A
+      (en vez de un worksheet.find() remoto por cada fila).
+    - upsert() solo encola; flush() envía todo en 1 batch_update (filas existentes)
+      + 1 append_rows (filas nuevas) + 1 borrado en lote (eliminar()).
+      Se puede usar como `with`: hace flush al salir.
+    """
+
+    def __init__(self, worksheet, columna_clave: int = 1, indice: dict = None, llamar=None):
+        """
+        Args:
+            worksheet: La hoja de gspread.
+            columna_clave (int): Columna (desde 1) que tiene la clave de cada fila.
+            indice (dict): Índice clave -> número de fila ya conocido (p. ej. porque la hoja
+                se acaba de leer). Si no se da, se arma leyendo la columna clave.
+            llamar: Cómo hacer cada petición (ConexionSheets.llamar: límite de tasa y reintentos).
+                Si no se da, se llama directo a gspread.
+        """
+        self.worksheet = worksheet
+        self.llamar = llamar or _llamar_directo
+        self.columna_clave = columna_clave
+        self._indice = dict(indice) if indice is not None else None
+        self._actualizaciones = {}  # fila -> valores (la última gana)
+        self._nuevas = {}  # clave -> valores (la última gana, en orden de llegada)
+        self._borrar = set()  # números de fila a borrar
+
+    def _cargar_indice(self):
+        if self._indice is None:
+            claves = self.llamar(self.worksheet.col_values, self.columna_clave)
+            self._indice = {}
+            for numero_fila, clave in enumerate(claves, start=1):
+                # Como find(): si la clave está repetida, vale la primera aparición
+                if clave != "":
+                    self._indice.setdefault(str(clave), numero_fila)
+        return self._indice
+
+    def upsert(self, row: list):
+        """Encola una fila: se actualiza si su clave ya está en la hoja, si no se agrega."""
+        if not row:
+            print("Error: La fila de datos está vacía.")
+            return
+
+        clave = str(row[self.columna_clave - 1])
+        numero_fila = self._cargar_indice().get(clave)
+        if numero_fila is not None:
+            self._actualizaciones[numero_fila] = list(row)
+        else:
+            self._nuevas[clave] = list(row)
+
+    def actualizar_fila(self, numero_fila: int, row: list):
+        """Encola la escritura de una fila en una posición conocida (p. ej. una fila sin clave)."""
+        self._actualizaciones[numero_fila] = list(row)
+        self._cargar_indice().setdefault(str(row[self.columna_clave - 1]), numero_fila)
+
+    def eliminar(self, clave) -> bool:
+        """Encola el borrado de la fila con esa clave. Devuelve False si la clave no está en la hoja."""
+        numero_fila = self._cargar_indice().get(str(clave))
+        if numero_fila is None:
+            return False
+        self._borrar.add(numero_fila)
+        self._actualizaciones.pop(numero_fila, None)
+        return True
+
+    def pendientes(self) -> int:
+        """Cantidad de filas encoladas que aún no se enviaron."""
+        return len(self._actualizaciones) + len(self._nuevas) + len(self._borrar)
+
+    def flush(self):
+        """Envía lo encolado: 1 batch_update + 1 append_rows + 1 borrado (solo los que hagan falta)."""
+        if self._actualizaciones:
+            datos = [{"range": f"A{numero_fila}", "values": [row]}
+                     for numero_fila, row in sorted(self._actualizaciones.items())]
+            self.llamar(self.worksheet.batch_update, datos, value_input_option='USER_ENTERED')
+            print(f"✅ {len(datos)} fila(s) actualizada(s) en '{self.worksheet.title}' (1 petición en lote).")
+            self._actualizaciones = {}
+
+        if self._nuevas:
+            claves, filas = list(self._nuevas), list(self._nuevas.values())
+            # append y borrado no son idempotentes: solo se reintentan si la API los rechazó (429)
+            respuesta = self.llamar(self.worksheet.append_rows, filas, value_input_option='USER_ENTERED',
+                                    idempotente=False)
+            print(f"✅ {len(filas)} fila(s) nueva(s) insertada(s) en '{self.worksheet.title}' (1 petición en lote).")
+            self._nuevas = {}
+            self._indexar_nuevas(claves, respuesta)
+
+        if self._borrar:
+            # Al final y de abajo hacia arriba: borrar corre las filas siguientes
+            pedidos = [{"deleteDimension": {"range": {
+                "sheetId": self.worksheet.id, "dimension": "ROWS",
+                "startIndex": numero_fila - 1, "endIndex": numero_fila,
+            }}} for numero_fila in sorted(self._borrar, reverse=True)]
+            self.llamar(self.worksheet.spreadsheet.batch_update, {"requests": pedidos}, idempotente=False)
+            print(f"✅ {len(pedidos)} fila(s) borrada(s) en '{self.worksheet.title}' (1 petición en lote).")
+            self._borrar = set()
+            self._indice = None  # Los números de fila cambiaron
+
+    def _indexar_nuevas(self, claves, respuesta):
+        """Agrega al índice las filas recién insertadas (según el rango que devuelve la API)."""
+        try:
+            rango = respuesta["updates"]["updatedRange"]
+            primera = a1_range_to_grid_range(rango.rsplit("!", 1)[-1])["startRowIndex"] + 1
+        except (KeyError, TypeError, ValueError):
+            # Sin rango en la respuesta: volver a leer la columna de claves en el próximo upsert
+            self._indice = None
+            return
+        for desplazamiento, clave in enumerate(claves):
+            self._indice.setdefault(clave, primera + desplazamiento)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_excepcion, excepcion, traza):
+        # Si hubo un error a mitad de camino no se envía un lote a medias
+        if tipo_excepcion is None:
+            self.flush()
+        return False
@@ -1,15 +1,28 @@
 # data/conexion_sqlite.py
 
+import functools
+import itertools
 import sqlite3
+import threading
+from contextlib import contextmanager
+
 import pandas as pd
 import streamlit as st
 from datetime import datetime
 
+from data.pool_sqlite import PoolSQLite
+
+# Filas por executemany en insertar_masivo
+TAMANO_LOTE_INSERCION = 50_000
+
 
 class ConexionSQLite:
     """
     Clase para manejar la conexión y operaciones CRUD con SQLite.
     Optimizada para Streamlit usando st.cache_resource y st.cache_data.
+
+    Las lecturas usan conexiones de solo lectura de un pool y las escrituras
+    pasan, en fila, por una única conexión de escritura (ver data/pool_sqlite.py).
     """
 
     def __init__(self, db_name: str = r"db/libreria.db"):
@@ -20,26 +33,127 @@ class ConexionSQLite:
             db_name (str): El nombre del archivo .db (ej. "mi_proyecto.db").
         """
         self.db_name = db_name
+        # Estado de la transacción en curso (uno por hilo: cada sesión de Streamlit corre en su hilo)
+        self._local = threading.local()
 
-    @st.cache_resource
-    def _get_connection(_self):
+    def _get_pool(self):
         """
-        Método interno para crear y cachear la conexión a la DB.
-
-        Usa @_self en lugar de @self por una particularidad de 
-        cómo st.cache_resource maneja los métodos de clase.
+        Devuelve el pool de conexiones cacheado (uno por archivo de DB y por proceso).
 
         Returns:
-            sqlite3.Connection: El objeto de conexión a la base de datos.
+            PoolSQLite: El pool, o None si no se pudo abrir la DB.
         """
-        print(f"[{datetime.now()}] 🔑 Creando nueva conexión cacheada a: {_self.db_name}")
-        try:
-            # check_same_thread=False es necesario para SQLite en Streamlit
-            conn = sqlite3.connect(_self.db_name, check_same_thread=False)
-            return conn
-        except sqlite3.Error as e:
-            st.error(f"Error fatal al conectar con SQLite: {e}")
-            return None
+        return _obtener_pool(self.db_name)
+
+    @contextmanager
+    def lectura(self):
+        """
+        Presta una conexión de SOLO LECTURA del pool. Con WAL, nunca espera a un escritor.
+
+        Yields:
+            sqlite3.Connection: Conexión de solo lectura.
+        """
+        pool = self._get_pool()
+        if pool is None:
+            raise sqlite3.OperationalError("No hay conexión a la base de datos.")
+        with pool.lector() as conn:
+            yield conn
+
+    @contextmanager
+    def escritura(self):
+        """
+        Entrega la conexión de escritura con el candado tomado: las escrituras de
+        todas las sesiones se ejecutan de a una. Si algo falla fuera de una
+        transaccion(), revierte lo escrito y relanza el error.
+
+        Yields:
+            sqlite3.Connection: La conexión de escritura.
+        """
+        pool = self._get_pool()
+        if pool is None:
+            raise sqlite3.OperationalError("No hay conexión a la base de datos.")
+        with pool.escritura() as conn:
+            try:
+                yield conn
+            except Exception:
+                if not self.en_transaccion:
+                    conn.rollback()
+                raise
+
+    # --- TRANSACCIONES (unidad de trabajo) ---
+    @property
+    def en_transaccion(self) -> bool:
+        """True si hay una transacción abierta con transaccion() en este hilo."""
+        return getattr(self._local, "activa", False)
+
+    @contextmanager
+    def transaccion(self, inmediata: bool = False):
+        """
+        Agrupa varias escrituras en UNA sola transacción: un único commit y, al
+        final, se invalida la caché SOLO de las tablas escritas. Si cualquier
+        escritura falla, se revierten TODAS (rollback) y se relanza el error.
+        El candado de escritura se mantiene durante toda la transacción.
+
+        Uso:
+            with conexion.transaccion():
+                conexion.actualizar_registros(...)
+                conexion.eliminar_registros(...)
+
+        Las transacciones anidadas se unen a la exterior.
+
+        Args:
+            inmediata (bool): True = BEGIN IMMEDIATE: la DB queda reservada para escribir
+                desde el inicio, así lo que se LEA con la conexión entregada no puede
+                cambiar (ni desde otro proceso) hasta el commit. Para "leer y luego
+                escribir según lo leído" (p. ej. cupos libres al agendar).
+
+        Yields:
+            sqlite3.Connection: La conexión usada por la transacción.
+        """
+        with self.escritura() as conn:
+            if self.en_transaccion:
+                yield conn
+                return
+
+            self._local.activa = True
+            self._local.tablas_tocadas = set()
+            try:
+                if inmediata and not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+                print(f"[{datetime.now()}] 💾 Transacción confirmada (commit).")
+            except Exception:
+                print(f"  > ¡ERROR! Revertiendo TODA la transacción (rollback).")
+                conn.rollback()
+                raise
+            finally:
+                self._local.activa = False
+                # Una sola invalidación por transacción, y solo de las tablas tocadas
+                # (tras un rollback también: por si otra lectura cacheó a mitad de camino)
+                self.invalidar_cache(*self._local.tablas_tocadas)
+
+    def _confirmar(self, conn: sqlite3.Connection, table_name: str):
+        """Commit + invalidar la caché de la tabla, salvo dentro de transaccion() (ahí se hace al final)."""
+        if not self.en_transaccion:
+            conn.commit()
+        self.registrar_escritura(table_name)
+
+    def registrar_escritura(self, table_name: str):
+        """
+        Anota que se escribió en la tabla: dentro de transaccion() se invalida al terminar;
+        fuera, de inmediato. Quien escriba con escritura() directamente debe llamarla.
+        """
+        if self.en_transaccion:
+            self._local.tablas_tocadas.add(table_name)
+        else:
+            self.invalidar_cache(table_name)
+
+    def invalidar_cache(self, *tablas: str):
+        """Sube la versión de las tablas: su próxima lectura va a la DB. El resto sigue cacheado."""
+        pool = self._get_pool()
+        if pool is not None and tablas:
+            pool.invalidar(tablas)
 
     # --- C: CREATE  ---
     def insertar_registro(self, table_name: str, data: dict) -> bool:
@@ -53,9 +167,6 @@ class ConexionSQLite:
         Returns:
             bool: True si fue exitoso, False si falló.
         """
-        conn = self._get_connection()
-        if conn is None: return False
-
         try:
             columnas = ', '.join(data.keys())
             placeholders = ', '.join(['?'] * len(data))
@@ -63,17 +174,17 @@ class ConexionSQLite:
 
             print(f"[{datetime.now()}] 💾 Ejecutando INSERCIÓN en DB: Tabla '{table_name}'")
 
-            cursor = conn.cursor()
-            cursor.execute(query, list(data.values()))
-            conn.commit()
+            with self.escritura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, list(data.values()))
+                self._confirmar(conn, table_name)
 
             print(f"  > ¡Éxito! Nuevo registro insertado en '{table_name}'.")
-            self.cargar_tabla_df.clear()  # Limpiar caché de lectura
             return True
 
         except Exception as e:
-            print(f"  > ¡ERROR! Revertiendo transacción (rollback) para '{table_name}'.")
-            conn.rollback()
+            if self.en_transaccion: raise  # transaccion() revierte todo el grupo
+            print(f"  > ¡ERROR! Transacción revertida (rollback) para '{table_name}'.")
             print(f"Error al insertar registro en {table_name}: {e}")
             return False
 
@@ -92,9 +203,6 @@ class ConexionSQLite:
         Returns:
             bool: True si fue exitoso, False si falló.
         """
-        conn = self._get_connection()
-        if conn is None: return False
-
         try:
             # Construye la parte SET de la consulta: "estado = ?, tipo = ?"
             set_clause = ', '.join([f"{key} = ?" for key in data.keys()])
@@ -106,27 +214,37 @@ class ConexionSQLite:
 
             print(f"[{datetime.now()}] 💾 Ejecutando ACTUALIZACIÓN en DB: Tabla '{table_name}'")
 
-            cursor = conn.cursor()
-            cursor.execute(query, valores)
-            conn.commit()
+            with self.escritura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, valores)
+                self._confirmar(conn, table_name)
 
             print(f"  > ¡Éxito! {cursor.rowcount} registros actualizados en '{table_name}'.")
-            self.cargar_tabla_df.clear()  # Limpiar caché
             return True
 
         except Exception as e:
-            print(f"  > ¡ERROR! Revertiendo transacción (rollback) para '{table_name}'.")
-            conn.rollback()
+            if self.en_transaccion: raise  # transaccion() revierte todo el grupo
+            print(f"  > ¡ERROR! Transacción revertida (rollback) para '{table_name}'.")
             print(f"Error al actualizar registros en {table_name}: {e}")
             return False
 
     # --- R: read  ---
-    @st.cache_data(ttl=3600)  # Cachea los datos por 1 hora
-    def cargar_tabla_df(_self, table_name: str) -> pd.DataFrame:
+    def version_tabla(self, table_name: str) -> tuple:
+        """
+        Versión actual de la tabla para la caché de lectura. Antes de responder,
+        comprueba con PRAGMA data_version si otro proceso cambió la DB.
+        """
+        pool = self._get_pool()
+        if pool is None:
+            return 0, 0
+        pool.validar_cambios_externos()
+        return pool.version(table_name)
+
+    def cargar_tabla_df(self, table_name: str) -> pd.DataFrame:
         """
         Carga una tabla completa de la DB en un DataFrame de Pandas.
-        Esta función está CACHEADA: Solo se re-ejecuta si la DB cambia
-        (o si el cache expira).
+        Está CACHEADA por (tabla, versión): solo se vuelve a leer si se escribió
+        en ESA tabla (o si el cache expira). Lee con una conexión de solo lectura del pool.
 
         Args:
             table_name (str): Nombre de la tabla (ej. 'usuarios').
@@ -134,18 +252,46 @@ class ConexionSQLite:
         Returns:
             pd.DataFrame: Un DataFrame con los datos, o uno vacío si falla.
         """
-        print(f"[{datetime.now()}] 🔄 Ejecutando LECTURA de DB: 'SELECT * FROM {table_name}'")
-        conn = _self._get_connection()
-        if conn is None:
-            return pd.DataFrame()
+        return _leer_consulta(self.db_name, table_name, f"SELECT * FROM {table_name}", (),
+                              self.version_tabla(table_name))
 
-        try:
-            query = f"SELECT * FROM {table_name}"
-            df = pd.read_sql_query(query, conn)
-            return df
-        except pd.errors.DatabaseError as e:
-            st.warning(f"No se pudo cargar la tabla {table_name}: {e}. ¿Existe?")
-            return pd.DataFrame()
+    def consultar(self, table_name: str, columnas: list = None, where_clause: str = None, where_args: tuple = (),
+                  order_by: str = None, limite: int = None, group_by: str = None,
+                  desplazamiento: int = None) -> pd.DataFrame:
+        """
+        [READ] Trae SOLO lo necesario de una tabla: las columnas pedidas y las filas que
+        cumplen la condición, filtradas, agrupadas, ordenadas y paginadas en SQLite (no en pandas).
+        Cada consulta distinta se cachea por separado hasta que se escriba en la tabla.
+
+        Args:
+            table_name (str): Nombre de la tabla (ej. 'recursos').
+            columnas (list): Columnas o expresiones (ej. ['id'] o ['COUNT(*) AS n']). None = todas.
+            where_clause (str): La condición SQL (ej. "estado = ?"). Opcional.
+            where_args (tuple): Los valores para la condición WHERE (ej. ('disponible',))
+            order_by (str): Orden (ej. "fecha_cita, id"). Opcional.
+            limite (int): Máximo de filas. Opcional.
+            group_by (str): Agrupación (ej. "fecha_cita", con columnas como 'COUNT(*) AS n'). Opcional.
+            desplazamiento (int): Filas a saltar antes de las devueltas (paginación; requiere limite).
+
+        Returns:
+            pd.DataFrame: Las filas pedidas, o un DataFrame vacío si falla.
+        """
+        con_desplazamiento = limite is not None and desplazamiento is not None
+        query = _sql_consulta(table_name, tuple(columnas) if columnas else None, where_clause, order_by,
+                              limite is not None, group_by, con_desplazamiento)
+        args = tuple(where_args) + ((int(limite),) if limite is not None else ()) \
+            + ((int(desplazamiento),) if con_desplazamiento else ())
+        return _leer_consulta(self.db_name, table_name, query, args, self.version_tabla(table_name))
+
+    def contar(self, table_name: str, where_clause: str = None, where_args: tuple = ()) -> int:
+        """
+        [READ] Cuenta las filas que cumplen la condición con un COUNT(*) en SQLite (cacheado).
+
+        Returns:
+            int: Cantidad de filas (0 si la consulta falla).
+        """
+        df = self.consultar(table_name, ["COUNT(*) AS n"], where_clause, where_args)
+        return int(df["n"].iat[0]) if not df.empty else 0
 
     # --- D: DELETE (Borrar) ---
     def eliminar_registros(self, table_name: str, where_clause: str, where_args: tuple) -> bool:
@@ -160,32 +306,30 @@ class ConexionSQLite:
         Returns:
             bool: True si fue exitoso, False si falló.
         """
-        conn = self._get_connection()
-        if conn is None: return False
-
         try:
             query = f"DELETE FROM {table_name} WHERE {where_clause}"
 
             print(f"[{datetime.now()}] 💾 Ejecutando ELIMINACIÓN en DB: Tabla '{table_name}'")
 
-            cursor = conn.cursor()
-            cursor.execute(query, where_args)
-            conn.commit()
+            with self.escritura() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, where_args)
+                self._confirmar(conn, table_name)
 
             print(f"  > ¡Éxito! {cursor.rowcount} registros eliminados de '{table_name}'.")
-            self.cargar_tabla_df.clear()  # Limpiar caché
             return True
 
         except Exception as e:
-            print(f"  > ¡ERROR! Revertiendo transacción (rollback) para '{table_name}'.")
-            conn.rollback()
+            if self.en_transaccion: raise  # transaccion() revierte todo el grupo
+            print(f"  > ¡ERROR! Transacción revertida (rollback) para '{table_name}'.")
             print(f"Error al eliminar registros en {table_name}: {e}")
             return False
 
     def insertar_dataframe(self, df: pd.DataFrame, table_name: str) -> bool:
         """
         [CREATE-BULK] Inserta un DataFrame completo en una tabla.
-        Usa 'append' para AÑADIR los registros, no reemplazar.
+        AÑADE los registros (no reemplaza) usando insertar_masivo,
+        sin pasar por DataFrame.to_sql. La tabla debe existir.
 
         Args:
             df (pd.DataFrame): El DataFrame con las nuevas filas.
@@ -194,30 +338,131 @@ class ConexionSQLite:
         Returns:
             bool: True si fue exitoso, False si falló.
         """
-        conn = self._get_connection()
-        if conn is None: return False
+        columnas = {col: _columna_a_sqlite(df[col]) for col in df.columns}
+        return self.insertar_masivo(table_name, columnas)
 
-        try:
-            print(f"[{datetime.now()}] 💾 Ejecutando INSERCIÓN MASIVA en DB: Tabla '{table_name}'")
-            df.to_sql(
-                name=table_name,
-                con=conn,
-                if_exists='append',  # ¡La clave! Añade las filas al final.
-                index=False  # No guardar el índice de Pandas
-            )
-
-            # Forzar la confirmación de la transacción
-            conn.commit()
-            print(f"  > ¡Éxito! {len(df)} nuevos registros insertados en '{table_name}'.")
+    def insertar_masivo(self, table_name: str, datos, columnas: list = None,
+                        tamano_lote: int = TAMANO_LOTE_INSERCION) -> bool:
+        """
+        [CREATE-BULK] Inserción masiva nativa: un INSERT preparado (y cacheado)
+        ejecutado con executemany, por lotes, dentro de UNA sola transacción.
 
-            # Limpiar la caché de lectura para Streamlit
-            self.cargar_tabla_df.clear()
+        Args:
+            table_name (str): Nombre de la tabla (ej. 'asignaciones').
+            datos: Columnas como {'columna': arreglo/lista, ...} o registros
+                (lista de tuplas en el orden de `columnas`, o lista de dicts).
+            columnas (list): Nombres de columna para registros en tuplas
+                (opcional para dicts: se toman las claves del primero).
+            tamano_lote (int): Filas por executemany (acota la memoria en lotes muy grandes).
 
+        Returns:
+            bool: True si fue exitoso, False si falló.
+        """
+        if isinstance(datos, dict):
+            columnas = list(datos.keys())
+            valores = [v.tolist() if hasattr(v, "tolist") else list(v) for v in datos.values()]
+            total = len(valores[0]) if valores else 0
+            filas = zip(*valores)
+        else:
+            datos = list(datos)
+            total = len(datos)
+            if datos and isinstance(datos[0], dict):
+                columnas = columnas or list(datos[0].keys())
+                filas = (tuple(registro.get(col) for col in columnas) for registro in datos)
+            else:
+                filas = iter(datos)
+
+        if not columnas or total == 0:
+            return True
+
+        query = _sql_insercion(table_name, tuple(columnas))
+        print(f"[{datetime.now()}] 💾 Ejecutando INSERCIÓN MASIVA en DB: Tabla '{table_name}' ({total} filas)")
+
+        try:
+            with self.transaccion() as conn:
+                self.registrar_escritura(table_name)
+                while True:
+                    lote = list(itertools.islice(filas, tamano_lote))
+                    if not lote:
+                        break
+                    conn.executemany(query, lote)
+
+            print(f"  > ¡Éxito! {total} nuevos registros insertados en '{table_name}'.")
             return True
 
         except Exception as e:
-            # Revertir si algo sale mal
-            print(f"  > ¡ERROR! Revertiendo transacción (rollback) para '{table_name}'.")
-            conn.rollback()
-            print(f"Error al insertar dataframe en {table_name}: {e}")
+            if self.en_transaccion: raise  # transaccion() exterior revierte todo el grupo
+            print(f"Error al insertar masivamente en {table_name}: {e}")
             return False
+
+
+@st.cache_resource
+def _obtener_pool(db_name: str):
+    """
+    Crea y cachea el pool de conexiones de un archivo de DB (uno por proceso,
+    compartido por todas las sesiones). Al crearlo se aplican las migraciones.
+
+    Returns:
+        PoolSQLite: El pool, o None si falló la conexión.
+    """
+    try:
+        return PoolSQLite(db_name)
+    except sqlite3.Error as e:
+        st.error(f"Error fatal al conectar con SQLite: {e}")
+        return None
+
+
+@st.cache_data(ttl=3600, max_entries=256)  # Cachea los datos por 1 hora
+def _leer_consulta(db_name: str, table_name: str, query: str, args: tuple, version: tuple) -> pd.DataFrame:
+    """
+    Lectura cacheada de una consulta sobre una tabla. `version` forma parte de la clave:
+    al escribir en la tabla cambia su versión y las entradas viejas dejan de usarse
+    (expiran solas), sin tocar lo cacheado de las demás tablas.
+    """
+    print(f"[{datetime.now()}] 🔄 Ejecutando LECTURA de DB: '{query}' {args if args else ''}")
+    try:
+        with ConexionSQLite(db_name).lectura() as conn:
+            df = pd.read_sql_query(query, conn, params=args)
+        return df
+    except (pd.errors.DatabaseError, sqlite3.Error) as e:
+        st.warning(f"No se pudo cargar la tabla {table_name}: {e}. ¿Existe?")
+        return pd.DataFrame()
+
+
+@functools.lru_cache(maxsize=128)
+def _sql_consulta(table_name: str, columnas: tuple, where_clause: str, order_by: str, con_limite: bool,
+                  group_by: str = None, con_desplazamiento: bool = False) -> str:
+    """Texto del SELECT para consultar(), cacheado (LIMIT y OFFSET van como parámetros)."""
+    query = f"SELECT {', '.join(columnas) if columnas else '*'} FROM {table_name}"
+    if where_clause:
+        query += f" WHERE {where_clause}"
+    if group_by:
+        query += f" GROUP BY {group_by}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    if con_limite:
+        query += " LIMIT ?"
+    if con_desplazamiento:
+        query += " OFFSET ?"
+    return query
+
+
+# --- AUXILIARES DE INSERCIÓN MASIVA ---
+
+@functools.lru_cache(maxsize=64)
+def _sql_insercion(table_name: str, columnas: tuple) -> str:
+    """
+    Texto del INSERT para (tabla, columnas), cacheado. Al repetirse el mismo texto,
+    sqlite3 reutiliza la sentencia ya preparada de su caché de sentencias.
+    """
+    placeholders = ', '.join(['?'] * len(columnas))
+    return f"INSERT INTO {table_name} ({', '.join(columnas)}) VALUES ({placeholders})"
+
+
+def _columna_a_sqlite(serie: pd.Series) -> list:
+    """Convierte una columna de pandas a valores nativos de Python que sqlite3 acepta (NaN/NaT -> None)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serie = serie.dt.strftime("%Y-%m-%d %H:%M:%S")
+    elif pd.api.types.is_numeric_dtype(serie) and not serie.hasnans:
+        return serie.tolist()  # Camino rápido: numpy -> escalares de Python
+    return serie.astype(object).where(serie.notna(), None).tolist()
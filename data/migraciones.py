@@ -0,0 +1,291 @@
+# data/migraciones.py
+
+import sqlite3
+from datetime import datetime
+
+
+# Tablas cuyas escrituras quedan anotadas en 'registro_cambios' (ver migración 3)
+TABLAS_CON_REGISTRO = ("usuarios", "recursos", "asignaciones")
+
+# Entradas de 'registro_cambios' que se conservan al podar la bitácora
+CAMBIOS_A_CONSERVAR = 100_000
+
+
+def _triggers_registro_cambios(tablas) -> list:
+    """
+    Sentencias CREATE TRIGGER que anotan en 'registro_cambios' cada INSERT, UPDATE
+    y DELETE (lápida 'D') sobre las tablas, con el id de la fila afectada.
+    """
+    sentencias = []
+    for tabla in tablas:
+        sentencias += [
+            f"""
+            CREATE TRIGGER trg_{tabla}_insert AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO registro_cambios (tabla, id_fila, operacion) VALUES ('{tabla}', NEW.id, 'I');
+            END
+            """,
+            f"""
+            CREATE TRIGGER trg_{tabla}_update AFTER UPDATE ON {tabla} BEGIN
+                INSERT INTO registro_cambios (tabla, id_fila, operacion) VALUES ('{tabla}', NEW.id, 'U');
+                INSERT INTO registro_cambios (tabla, id_fila, operacion)
+                    SELECT '{tabla}', OLD.id, 'D' WHERE OLD.id IS NOT NEW.id;
+            END
+            """,
+            f"""
+            CREATE TRIGGER trg_{tabla}_delete AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO registro_cambios (tabla, id_fila, operacion) VALUES ('{tabla}', OLD.id, 'D');
+            END
+            """,
+        ]
+    return sentencias
+
+
+# Esquema base de la app (el de db/libreria.db antes de las migraciones). La migración 1
+# lo crea si falta, para que una DB nueva o vacía llegue al esquema completo.
+ESQUEMA_BASE = [
+    """
+    CREATE TABLE IF NOT EXISTS "usuarios" (
+        "id"                 INTEGER UNIQUE,
+        "nombre"             TEXT,
+        "apellidos"          TEXT,
+        "edad"               INTEGER,
+        "sexo"               TEXT,
+        "direccion"          TEXT,
+        "telefono"           INTEGER,
+        "correo_electronico" TEXT,
+        "ocupacion"          TEXT,
+        "internet"           TEXT,
+        "dispositivo"        TEXT,
+        "fecha_registro"     TEXT,
+        PRIMARY KEY("id" AUTOINCREMENT)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "recursos" (
+        "id"            INTEGER,
+        "identificador" TEXT,
+        "tipo"          TEXT,
+        "estado"        TEXT,
+        "precio"        INTEGER,
+        "notas"         TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS "asignaciones" (
+        "id"                INTEGER UNIQUE,
+        "id_usuario"        TEXT,
+        "id_recurso"        TEXT,
+        "puntaje"           INTEGER,
+        "estado"            TEXT,
+        "fecha_cita"        TEXT,
+        "intentos_fallidos" BLOB,
+        "creado_ts"         INTEGER,
+        PRIMARY KEY("id" AUTOINCREMENT)
+    )
+    """,
+]
+
+
+# --- MIGRACIONES DEL ESQUEMA ---
+# Cada migración es (versión, descripción, lista de sentencias SQL).
+# La versión aplicada se guarda en PRAGMA user_version: solo se ejecutan
+# las migraciones con versión mayor, en orden, cada una en su propia transacción.
+# ¡Nunca editar una migración ya publicada! Agregar una nueva al final.
+
+MIGRACIONES = [
+    (
+        1,
+        "asignaciones: id_usuario, id_recurso e intentos_fallidos como INTEGER",
+        [
+            # DB nueva: crear primero las tablas base (no hace nada si ya existen)
+            *ESQUEMA_BASE,
+            """
+            CREATE TABLE asignaciones_nueva (
+                "id"                INTEGER UNIQUE,
+                "id_usuario"        INTEGER,
+                "id_recurso"        INTEGER,
+                "puntaje"           INTEGER,
+                "estado"            TEXT,
+                "fecha_cita"        TEXT,
+                "intentos_fallidos" INTEGER NOT NULL DEFAULT 0,
+                "creado_ts"         TEXT,
+                PRIMARY KEY("id" AUTOINCREMENT)
+            )
+            """,
+            """
+            INSERT INTO asignaciones_nueva
+                (id, id_usuario, id_recurso, puntaje, estado, fecha_cita, intentos_fallidos, creado_ts)
+            SELECT id,
+                   CAST(id_usuario AS INTEGER),
+                   CAST(id_recurso AS INTEGER),
+                   puntaje,
+                   estado,
+                   fecha_cita,
+                   COALESCE(CAST(intentos_fallidos AS INTEGER), 0),
+                   creado_ts
+            FROM asignaciones
+            """,
+            # Conservar el contador AUTOINCREMENT (no reutilizar ids de filas borradas), también
+            # cuando 'asignaciones_nueva' aún no tiene fila en sqlite_sequence (tabla vacía con
+            # contador). sqlite_sequence no tiene clave única, así que INSERT OR REPLACE duplicaría
+            # la fila: se inserta la fila con el máximo y se borra la que hubiera antes.
+            """
+            INSERT INTO sqlite_sequence (name, seq)
+            SELECT 'asignaciones_nueva', COALESCE(MAX(seq), 0) FROM sqlite_sequence
+            WHERE name IN ('asignaciones', 'asignaciones_nueva')
+            """,
+            """
+            DELETE FROM sqlite_sequence
+            WHERE name = 'asignaciones_nueva'
+              AND rowid < (SELECT MAX(rowid) FROM sqlite_sequence WHERE name = 'asignaciones_nueva')
+            """,
+            "DROP TABLE asignaciones",
+            "ALTER TABLE asignaciones_nueva RENAME TO asignaciones",
+        ],
+    ),
+    (
+        2,
+        "índices para citas activas por estado/fecha, por usuario y recursos por estado",
+        [
+            "CREATE INDEX IF NOT EXISTS idx_asignaciones_estado_fecha ON asignaciones (estado, fecha_cita)",
+            "CREATE INDEX IF NOT EXISTS idx_asignaciones_usuario ON asignaciones (id_usuario)",
+            "CREATE INDEX IF NOT EXISTS idx_recursos_estado ON recursos (estado)",
+        ],
+    ),
+    (
+        3,
+        "registro_cambios: bitácora de inserciones/cambios/borrados (con triggers) para la carga incremental",
+        [
+            """
+            CREATE TABLE registro_cambios (
+                "seq"       INTEGER PRIMARY KEY AUTOINCREMENT,
+                "tabla"     TEXT NOT NULL,
+                "id_fila"   INTEGER,
+                "operacion" TEXT NOT NULL,
+                "ts"        TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+            )
+            """,
+            "CREATE INDEX idx_registro_cambios_tabla_seq ON registro_cambios (tabla, seq)",
+            *_triggers_registro_cambios(TABLAS_CON_REGISTRO),
+        ],
+    ),
+    (
+        4,
+        "sincronizacion_sheets: marcas de agua de la sincronización con Google Sheets (una fila por hoja)",
+        [
+            """
+            CREATE TABLE sincronizacion_sheets (
+                "hoja"          TEXT PRIMARY KEY,
+                "tabla"         TEXT NOT NULL,
+                "marca_envio"   INTEGER NOT NULL DEFAULT 0,
+                "ts_recepcion"  TEXT,
+                "ultima_sync"   TEXT
+            )
+            """,
+        ],
+    ),
+    (
+        5,
+        "agenda_cupos: libro de cupos ocupados por día, reconstruido desde 'asignaciones'",
+        [
+            # Versiones anteriores la creaban al vuelo (mismo esquema): se conserva y se recalcula
+            """
+            CREATE TABLE IF NOT EXISTS agenda_cupos (
+                "fecha_cita" TEXT PRIMARY KEY,
+                "ocupados"   INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID
+            """,
+            "DELETE FROM agenda_cupos",
+            # Estados que ocupan cupo: ESTADOS_QUE_OCUPAN_CUPO de data/agenda_cupos.py (fijos en la migración)
+            """
+            INSERT INTO agenda_cupos (fecha_cita, ocupados)
+            SELECT fecha_cita, COUNT(*) FROM asignaciones
+            WHERE fecha_cita IS NOT NULL AND estado IN ('asignado', 'ausente_1', 'entregado')
+            GROUP BY fecha_cita
+            """,
+        ],
+    ),
+    (
+        6,
+        "sincronizacion_filas: huella de cada fila de la hoja en la última sincronización con Google Sheets",
+        [
+            """
+            CREATE TABLE sincronizacion_filas (
+                "hoja"   TEXT NOT NULL,
+                "clave"  TEXT NOT NULL,
+                "huella" TEXT NOT NULL,
+                PRIMARY KEY ("hoja", "clave")
+            ) WITHOUT ROWID
+            """,
+        ],
+    ),
+]
+
+
+def version_esquema(conn: sqlite3.Connection) -> int:
+    """Versión del esquema aplicada a la base de datos (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migraciones(conn: sqlite3.Connection) -> int:
+    """
+    Aplica, en orden, las migraciones pendientes. Cada migración corre en una
+    transacción: si falla, se revierte completa y se relanza el error (la app no
+    debe seguir con un esquema a medio migrar).
+
+    Args:
+        conn (sqlite3.Connection): Conexión abierta a la base de datos.
+
+    Returns:
+        int: La versión del esquema después de migrar.
+
+    Raises:
+        sqlite3.Error: Si una migración falla.
+    """
+    version_actual = version_esquema(conn)
+
+    for version, descripcion, sentencias in MIGRACIONES:
+        if version <= version_actual:
+            continue
+
+        print(f"[{datetime.now()}] 🛠️ Aplicando migración {version}: {descripcion}")
+        try:
+            conn.execute("BEGIN")
+            for sentencia in sentencias:
+                conn.execute(sentencia)
+            # PRAGMA no admite parámetros; la versión es un entero de la lista de arriba
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            version_actual = version
+            print(f"  > ¡Éxito! Esquema en versión {version}.")
+
+        except sqlite3.Error as e:
+            print(f"  > ¡ERROR! Revertiendo migración {version} (rollback).")
+            conn.rollback()
+            print(f"Error al aplicar la migración {version}: {e}")
+            raise
+
+    return version_actual
+
+
+def podar_registro_cambios(conn: sqlite3.Connection, conservar: int = CAMBIOS_A_CONSERVAR) -> int:
+    """
+    Borra las entradas más viejas de 'registro_cambios' y deja solo las últimas `conservar`.
+    Una sesión cuya marca quedó antes de lo podado hace una recarga completa.
+
+    Returns:
+        int: Cantidad de entradas borradas.
+    """
+    try:
+        cursor = conn.execute(
+            "DELETE FROM registro_cambios WHERE seq <= (SELECT MAX(seq) FROM registro_cambios) - ?",
+            (conservar,)
+        )
+        conn.commit()
+        if cursor.rowcount > 0:
+            print(f"[{datetime.now()}] 🧹 Bitácora de cambios podada: {cursor.rowcount} entradas viejas borradas.")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error al podar registro_cambios: {e}")
+        return 0
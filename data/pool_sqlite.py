@@ -0,0 +1,156 @@
+# data/pool_sqlite.py
+
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from data.migraciones import aplicar_migraciones, podar_registro_cambios
+
+# --- AJUSTES DE SQLITE (PRAGMAS) ---
+# WAL: los lectores leen la última versión confirmada mientras el escritor escribe (no se bloquean).
+# synchronous=NORMAL: en modo WAL es seguro ante caídas de la app y evita un fsync por commit.
+PRAGMAS_COMUNES = {
+    "cache_size": -32_000,  # ~32 MB de caché de páginas por conexión (negativo = KiB)
+    "mmap_size": 268_435_456,  # 256 MB de lectura mapeada en memoria
+    "temp_store": "MEMORY",  # Tablas/índices temporales (ORDER BY, GROUP BY) en RAM
+    "busy_timeout": 5_000,  # Esperar hasta 5 s si la DB está ocupada en vez de fallar
+}
+PRAGMAS_ESCRITOR = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+}
+PRAGMAS_LECTOR = {
+    "query_only": 1,  # Un lector nunca escribe
+}
+
+# Conexiones de solo lectura en el pool
+LECTORES_POR_DEFECTO = 4
+
+
+def _aplicar_pragmas(conn: sqlite3.Connection, pragmas: dict):
+    for nombre, valor in pragmas.items():
+        # PRAGMA no admite parámetros; los valores vienen de las constantes de arriba
+        conn.execute(f"PRAGMA {nombre} = {valor}")
+
+
+class PoolSQLite:
+    """
+    Pool de conexiones a SQLite para varias sesiones de Streamlit a la vez:
+
+    - UN escritor: todas las escrituras pasan por una sola conexión, serializadas con un candado.
+    - VARIOS lectores de solo lectura: cada lectura toma una conexión libre del pool.
+
+    Con WAL, las lecturas del dashboard nunca esperan a una escritura (p. ej. un agendamiento).
+    """
+
+    def __init__(self, db_name: str, lectores: int = LECTORES_POR_DEFECTO):
+        """
+        Abre la conexión de escritura (WAL + pragmas) y aplica las migraciones.
+        Los lectores se abren a demanda, hasta `lectores` conexiones.
+
+        Args:
+            db_name (str): Ruta del archivo .db.
+            lectores (int): Máximo de conexiones de solo lectura.
+        """
+        self.db_name = db_name
+        self.candado_escritura = threading.RLock()
+
+        print(f"[{datetime.now()}] 🔑 Abriendo conexión de escritura (WAL) a: {db_name}")
+        # check_same_thread=False: la usan varios hilos, pero siempre bajo candado_escritura
+        self.escritor = sqlite3.connect(db_name, check_same_thread=False)
+        _aplicar_pragmas(self.escritor, PRAGMAS_ESCRITOR)
+        _aplicar_pragmas(self.escritor, PRAGMAS_COMUNES)
+
+        # Al arrancar, llevar el esquema a la última versión (tipos e índices)
+        aplicar_migraciones(self.escritor)
+        # ...y acotar la bitácora de cambios de la carga incremental
+        podar_registro_cambios(self.escritor)
+
+        self._libres = queue.LifoQueue()
+        self._cupos_lectores = threading.Semaphore(lectores)
+
+        # Versión de cada tabla para la caché de lectura: una escritura solo invalida SU tabla
+        self._versiones = {}
+        self._epoca_externa = 0  # Sube cuando OTRO proceso cambia la DB (invalida todas las tablas)
+        self._candado_versiones = threading.Lock()
+        self._data_version = self.escritor.execute("PRAGMA data_version").fetchone()[0]
+
+    def _abrir_lector(self) -> sqlite3.Connection:
+        """Nueva conexión de solo lectura (mode=ro) con los pragmas de lectura."""
+        uri = f"file:{os.path.abspath(self.db_name)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        _aplicar_pragmas(conn, PRAGMAS_COMUNES)
+        _aplicar_pragmas(conn, PRAGMAS_LECTOR)
+        return conn
+
+    @contextmanager
+    def lector(self):
+        """
+        Presta una conexión de solo lectura del pool y la devuelve al terminar.
+        Si todas están en uso, espera a que se libere una.
+
+        Yields:
+            sqlite3.Connection: Conexión de solo lectura.
+        """
+        with self._cupos_lectores:
+            try:
+                conn = self._libres.get_nowait()
+            except queue.Empty:
+                conn = self._abrir_lector()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()  # Soltar la instantánea de lectura
+                self._libres.put(conn)
+
+    @contextmanager
+    def escritura(self):
+        """
+        Toma el candado de escritura (reentrante) y entrega la conexión del escritor.
+        Las escrituras de distintas sesiones quedan en fila, nunca a la vez.
+
+        Yields:
+            sqlite3.Connection: La conexión de escritura.
+        """
+        with self.candado_escritura:
+            yield self.escritor
+
+    # --- VERSIONES POR TABLA (para la caché de lectura) ---
+    def version(self, tabla: str) -> tuple:
+        """Versión actual de la tabla; cambia cada vez que se escribe en ella."""
+        return self._epoca_externa, self._versiones.get(tabla, 0)
+
+    def invalidar(self, tablas):
+        """Sube la versión de las tablas escritas: sus lecturas cacheadas dejan de valer."""
+        with self._candado_versiones:
+            for tabla in tablas:
+                self._versiones[tabla] = self._versiones.get(tabla, 0) + 1
+
+    def validar_cambios_externos(self) -> bool:
+        """
+        Detecta commits hechos por OTRA conexión/proceso (PRAGMA data_version no cambia
+        con los commits propios del escritor). Si los hay, invalida todas las tablas.
+        Si el escritor está ocupado no espera: esa escritura ya invalidará lo suyo.
+
+        Returns:
+            bool: True si se detectaron cambios externos.
+        """
+        if not self.candado_escritura.acquire(blocking=False):
+            return False
+        try:
+            data_version = self.escritor.execute("PRAGMA data_version").fetchone()[0]
+        finally:
+            self.candado_escritura.release()
+
+        if data_version == self._data_version:
+            return False
+
+        print(f"[{datetime.now()}] 🔁 Cambios externos en la DB: invalidando la caché de todas las tablas")
+        with self._candado_versiones:
+            self._data_version = data_version
+            self._epoca_externa += 1
+        return True
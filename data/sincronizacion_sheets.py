@@ -0,0 +1,527 @@
+# data/sincronizacion_sheets.py
+
+import hashlib
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import gspread
+import pandas as pd
+import requests
+from gspread.utils import numericise
+
+from data.agenda_cupos import AgendaCupos
+from data.conexion_sheets import ConexionSheets, EscritorLotes
+from data.conexion_sqlite import ConexionSQLite
+
+# Hoja de Google Sheets que corresponde a cada tabla de SQLite
+HOJAS_POR_TABLA = {"usuarios": "Usuarios", "recursos": "Recursos", "asignaciones": "Asignaciones"}
+
+# Columna clave (la misma en la tabla y en la hoja)
+COLUMNA_CLAVE = "id"
+# Columna de la hoja con la fecha/hora de la última modificación de la fila. La app la
+# escribe en UTC con sufijo 'Z'; un valor sin zona (p. ej. de un script onEdit) se toma en
+# la zona horaria de la planilla. Solo decide los conflictos: las ediciones se detectan
+# por la huella de la fila aunque nadie actualice esta columna.
+COLUMNA_TS = "actualizado_ts"
+
+# Zona horaria si la planilla no informa la suya
+ZONA_HORARIA_POR_DEFECTO = "UTC"
+
+# Días de 'agenda_cupos' que dependen de cada fila de 'asignaciones'
+COLUMNA_DIA_CUPO = "fecha_cita"
+
+# Filas por consulta "WHERE id IN (...)" (límite de parámetros de SQLite)
+TAMANO_LOTE_IDS = 900
+
+# Una fila leída de la hoja: número de fila (desde 1, el encabezado es la 1), celdas y ts normalizado
+FilaHoja = namedtuple("FilaHoja", ["numero", "valores", "ts"])
+# Marcas de agua de una hoja: último seq de registro_cambios enviado y mayor ts visto en la hoja
+EstadoSync = namedtuple("EstadoSync", ["marca_envio", "ts_recepcion"])
+
+
+def normalizar_ts(valores, zona: str = "UTC") -> list:
+    """
+    Lleva fechas/horas (de la hoja o de registro_cambios) al formato de registro_cambios.ts
+    ('YYYY-MM-DDTHH:MM:SS.fff', UTC), para poder compararlas como texto.
+    Las fechas con zona ('Z', '+02:00'...) se convierten a UTC; las que no la tienen se toman
+    en `zona` (la de la planilla, o UTC para registro_cambios). None si el valor no es una fecha.
+    """
+    serie = pd.Series([None if v is None or str(v).strip() == "" else str(v).strip() for v in valores],
+                      dtype=object)
+    con_zona = serie.str.contains(r"(?:Z|[+-]\d{2}:?\d{2})$", na=False)
+    sin_zona = serie.notna() & ~con_zona
+
+    fechas = pd.Series(pd.NaT, index=serie.index, dtype="datetime64[ns, UTC]")
+    if con_zona.any():
+        fechas[con_zona] = pd.to_datetime(serie[con_zona], errors="coerce", utc=True, format="mixed")
+    if sin_zona.any():
+        locales = pd.to_datetime(serie[sin_zona], errors="coerce", format="mixed")
+        fechas[sin_zona] = locales.dt.tz_localize(zona, ambiguous="NaT", nonexistent="shift_forward") \
+            .dt.tz_convert("UTC")
+    texto = fechas.dt.strftime("%Y-%m-%dT%H:%M:%S.%f").str[:-3]
+    return [None if pd.isna(t) else t for t in texto]
+
+
+def ahora_ts() -> str:
+    """Fecha/hora actual (UTC) con el formato de registro_cambios.ts."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+
+
+def ts_para_hoja(ts) -> str:
+    """ts normalizado (UTC) tal como se escribe en la hoja: con sufijo 'Z' para que no sea ambiguo."""
+    return f"{ts}Z" if ts else ""
+
+
+def zona_horaria(libro) -> str:
+    """Zona horaria de la planilla (la que usa Sheets para las fechas sin zona); UTC si no se conoce."""
+    try:
+        zona = libro.timezone
+        ZoneInfo(zona)
+        return zona
+    except (AttributeError, KeyError, TypeError, ValueError, ZoneInfoNotFoundError):
+        return ZONA_HORARIA_POR_DEFECTO
+
+
+def clave_fila(valor):
+    """Clave como texto ('12' para 12, 12.0, '12' o ' 12 '); None si está vacía."""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    texto = str(valor).strip()
+    if texto == "":
+        return None
+    try:
+        numero = float(texto)
+        return str(int(numero)) if numero.is_integer() else texto
+    except ValueError:
+        return texto
+
+
+def _texto(valor) -> str:
+    """Valor de SQLite tal como se escribe en la hoja (NULL = celda vacía)."""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return ""
+    return str(valor)
+
+
+def _valor_hoja(texto):
+    """Valor de una celda de la hoja tal como se guarda en SQLite (números convertidos, vacía = NULL)."""
+    return numericise(texto, default_blank=None)
+
+
+def huella(valores) -> str:
+    """
+    Huella de los valores de una fila (ya pasados por _valor_hoja), para saber si cambió
+    desde la última sincronización. 30 y 30.0 dan la misma huella.
+    """
+    comparables = [float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v for v in valores]
+    return hashlib.sha1(repr(comparables).encode("utf-8")).hexdigest()
+
+
+class SincronizadorSheets:
+    """
+    Sincronización incremental y bidireccional entre las tablas de SQLite y sus hojas de Google Sheets.
+
+    - ENVÍO (SQLite -> Sheets): solo las filas anotadas en 'registro_cambios' después de la
+      marca de envío de la hoja (insertadas/modificadas se escriben, borradas se borran),
+      en lote: 1 batch_update + 1 append_rows + 1 borrado.
+    - RECEPCIÓN (Sheets -> SQLite): solo las filas cuya huella cambió desde la última
+      sincronización (aunque nadie haya tocado COLUMNA_TS), las filas nuevas sin id (se insertan
+      y se les escribe el id) y los borrados: una clave que estaba en la hoja y ya no está se
+      borra de SQLite. Todo en UNA transacción; en 'asignaciones' se recuentan además los días
+      afectados de 'agenda_cupos'.
+    - CONFLICTOS (la fila cambió en los dos lados): gana el cambio más reciente
+      (registro_cambios.ts contra COLUMNA_TS); a igual hora, o si la hoja no trae una hora
+      posterior, gana SQLite. Una fila borrada en la hoja pero modificada en la app se vuelve a enviar.
+
+    Las marcas de agua se guardan por hoja en 'sincronizacion_sheets' y las huellas de sus filas en
+    'sincronizacion_filas' (ver data/migraciones.py). La primera vez (o si la bitácora ya se podó)
+    se reconcilian las tablas completas. Si la hoja se lee vacía no se borra nada en SQLite.
+    """
+
+    def __init__(self, conexion: ConexionSQLite, sheets: ConexionSheets):
+        """
+        Args:
+            conexion (ConexionSQLite): Conexión a la base de datos de la app.
+            sheets (ConexionSheets): Conexión a la planilla de Google Sheets.
+        """
+        self.conexion = conexion
+        self.sheets = sheets
+
+    def sincronizar_todo(self, tablas=None) -> dict:
+        """
+        Sincroniza varias tablas con sus hojas (por defecto, todas las de HOJAS_POR_TABLA).
+
+        Returns:
+            dict: {tabla: resumen de sincronizar() (None si falló)}
+        """
+        return {tabla: self.sincronizar(tabla, HOJAS_POR_TABLA[tabla]) for tabla in (tablas or HOJAS_POR_TABLA)}
+
+    def sincronizar(self, tabla: str, hoja: str):
+        """
+        Una pasada de sincronización de la tabla con su hoja (envía y recibe solo los cambios).
+
+        Args:
+            tabla (str): Nombre de la tabla de SQLite (ej. 'usuarios').
+            hoja (str): Nombre de la hoja en la planilla (ej. 'Usuarios').
+
+        Returns:
+            dict: Cantidades {'enviadas', 'borradas', 'recibidas', 'eliminadas', 'conflictos'}
+                ('borradas' de la hoja, 'eliminadas' de SQLite), o None si falló.
+        """
+        print(f"[{datetime.now()}] 🔃 Sincronizando tabla '{tabla}' <-> hoja '{hoja}'...")
+        try:
+            estado, huellas = self._leer_estado(hoja)
+            libro = self.sheets.connect()
+            worksheet = self.sheets.llamar(libro.worksheet, hoja)
+            valores = self.sheets.llamar(worksheet.get_all_values)
+
+            columnas = self._columnas_tabla(tabla)
+            encabezado = self._preparar_encabezado(worksheet, valores, columnas)
+            if encabezado is None:
+                return None
+            filas_hoja, sin_clave = self._leer_hoja(valores, encabezado, zona_horaria(libro))
+            # Columnas que cuentan para la huella: las de la tabla (sin la clave ni COLUMNA_TS)
+            columnas_huella = [col for col in encabezado if col in columnas and col not in (COLUMNA_CLAVE, COLUMNA_TS)]
+
+            locales, ts_locales, borrados_locales, marca_actual = self._cambios_locales(tabla, estado)
+
+            # Cambios de la hoja: filas cuya huella no es la de la última sincronización (la primera vez, todas)
+            huellas_hoja = {clave: self._huella_hoja(encabezado, columnas_huella, fila)
+                            for clave, fila in filas_hoja.items()}
+            remotos = {clave: filas_hoja[clave] for clave, h in huellas_hoja.items() if huellas.get(clave) != h}
+            borrados_remotos = set(huellas) - set(filas_hoja)
+            if borrados_remotos and not filas_hoja:
+                print(f"  > ⚠️ La hoja '{hoja}' se leyó sin filas: no se borra nada en SQLite.")
+                borrados_remotos = set()
+
+            enviar, borrar, recibir, eliminar, conflictos = self._resolver(
+                encabezado, filas_hoja, remotos, borrados_remotos, locales, ts_locales, borrados_locales)
+
+            # --- RECEPCIÓN: la hoja -> SQLite (una transacción) ---
+            recibidas, nuevas_con_id, marca_envio = self._recibir(
+                tabla, encabezado, recibir, sin_clave, eliminar, marca_actual)
+
+            # --- ENVÍO: SQLite -> la hoja (en lote) ---
+            escritor = EscritorLotes(worksheet, columna_clave=encabezado.index(COLUMNA_CLAVE) + 1,
+                                     indice={clave: fila.numero for clave, fila in filas_hoja.items()},
+                                     llamar=self.sheets.llamar)
+            for clave in enviar:
+                escritor.upsert(self._fila_para_hoja(encabezado, locales[clave], ts_locales.get(clave),
+                                                     filas_hoja.get(clave)))
+                huellas_hoja[clave] = self._huella_datos(columnas_huella, locales[clave])
+            for numero_fila, datos, fila in nuevas_con_id:
+                # Filas nuevas del personal: se les escribe el id que les dio SQLite
+                escritor.actualizar_fila(numero_fila,
+                                         self._fila_para_hoja(encabezado, datos, fila.ts or ahora_ts(), fila))
+                huellas_hoja[clave_fila(datos[COLUMNA_CLAVE])] = self._huella_datos(columnas_huella, datos)
+            for clave in borrar:
+                escritor.eliminar(clave)
+                huellas_hoja.pop(clave, None)
+            escritor.flush()
+
+            ts_leidos = [fila.ts for fila in filas_hoja.values() if fila.ts is not None]
+            ts_recepcion = max([t for t in ts_leidos + [estado.ts_recepcion if estado else None] if t], default=None)
+            self._guardar_estado(hoja, tabla, marca_envio, ts_recepcion, huellas, huellas_hoja)
+
+        except (gspread.exceptions.GSpreadException, requests.exceptions.RequestException, sqlite3.Error,
+                pd.errors.DatabaseError) as e:
+            print(f"Error al sincronizar '{tabla}' con la hoja '{hoja}': {e}")
+            return None
+
+        resumen = {"enviadas": len(enviar), "borradas": len(borrar),
+                   "recibidas": recibidas + len(nuevas_con_id), "eliminadas": len(eliminar),
+                   "conflictos": conflictos}
+        print(f"[{datetime.now()}] ✅ '{tabla}' <-> '{hoja}': {resumen['enviadas']} enviada(s), "
+              f"{resumen['borradas']} borrada(s), {resumen['recibidas']} recibida(s), "
+              f"{resumen['eliminadas']} eliminada(s), {conflictos} conflicto(s)")
+        return resumen
+
+    # --- LECTURA DE LOS DOS LADOS ---
+    def _leer_estado(self, hoja: str):
+        """Marcas de agua de la hoja (None la primera vez) y huellas de sus filas {clave: huella}."""
+        with self.conexion.lectura() as conn:
+            fila = conn.execute(
+                "SELECT marca_envio, ts_recepcion FROM sincronizacion_sheets WHERE hoja = ?", (hoja,)
+            ).fetchone()
+            huellas = dict(conn.execute(
+                "SELECT clave, huella FROM sincronizacion_filas WHERE hoja = ?", (hoja,)).fetchall())
+        return (EstadoSync(*fila) if fila else None), huellas
+
+    def _guardar_estado(self, hoja: str, tabla: str, marca_envio: int, ts_recepcion, huellas: dict,
+                        huellas_nuevas: dict):
+        """Guarda las marcas de agua y, solo lo que cambió, las huellas de las filas (una transacción)."""
+        with self.conexion.transaccion() as conn:
+            conn.execute(
+                """
+                INSERT INTO sincronizacion_sheets (hoja, tabla, marca_envio, ts_recepcion, ultima_sync)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(hoja) DO UPDATE SET tabla = excluded.tabla, marca_envio = excluded.marca_envio,
+                    ts_recepcion = excluded.ts_recepcion, ultima_sync = excluded.ultima_sync
+                """,
+                (hoja, tabla, int(marca_envio), ts_recepcion, ahora_ts())
+            )
+            conn.executemany("DELETE FROM sincronizacion_filas WHERE hoja = ? AND clave = ?",
+                             [(hoja, clave) for clave in set(huellas) - set(huellas_nuevas)])
+            conn.executemany(
+                "INSERT INTO sincronizacion_filas (hoja, clave, huella) VALUES (?, ?, ?) "
+                "ON CONFLICT(hoja, clave) DO UPDATE SET huella = excluded.huella",
+                [(hoja, clave, h) for clave, h in huellas_nuevas.items() if huellas.get(clave) != h]
+            )
+
+    def _columnas_tabla(self, tabla: str) -> list:
+        with self.conexion.lectura() as conn:
+            return [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")]
+
+    def _preparar_encabezado(self, worksheet, valores, columnas: list):
+        """
+        Encabezado de la hoja. Si la hoja está vacía se escribe con las columnas de la tabla;
+        si le falta COLUMNA_TS, se agrega al final. None si la hoja no tiene la columna clave.
+        """
+        encabezado = [str(celda).strip() for celda in (valores[0] if valores else [])]
+        while encabezado and encabezado[-1] == "":
+            encabezado.pop()
+
+        original = list(encabezado)
+        if not encabezado:
+            encabezado = list(columnas)
+        if COLUMNA_CLAVE not in encabezado:
+            print(f"Error: La hoja '{worksheet.title}' no tiene la columna clave '{COLUMNA_CLAVE}'.")
+            return None
+        if COLUMNA_TS not in encabezado:
+            encabezado.append(COLUMNA_TS)
+        if encabezado != original:
+            self.sheets.llamar(worksheet.update, [encabezado], "A1")
+        return encabezado
+
+    @staticmethod
+    def _leer_hoja(valores, encabezado: list, zona: str = ZONA_HORARIA_POR_DEFECTO):
+        """
+        Filas de la hoja por clave (la primera aparición gana) y filas sin clave (nuevas del
+        personal). Los COLUMNA_TS sin zona horaria se toman en `zona` (la de la planilla).
+        """
+        pos_clave, pos_ts = encabezado.index(COLUMNA_CLAVE), encabezado.index(COLUMNA_TS)
+        filas = [fila + [""] * (len(encabezado) - len(fila)) for fila in valores[1:]]
+        tss = normalizar_ts([fila[pos_ts] for fila in filas], zona)
+
+        por_clave, sin_clave = {}, []
+        for numero_fila, (fila, ts) in enumerate(zip(filas, tss), start=2):
+            if not any(str(celda).strip() for celda in fila):
+                continue
+            clave = clave_fila(fila[pos_clave])
+            if clave is None:
+                sin_clave.append(FilaHoja(numero_fila, fila, ts))
+            else:
+                por_clave.setdefault(clave, FilaHoja(numero_fila, fila, ts))
+        return por_clave, sin_clave
+
+    def _cambios_locales(self, tabla: str, estado):
+        """
+        Filas de la tabla que cambiaron después de la marca de envío (todas si es la primera
+        vez o si la bitácora ya se podó), leídas en la MISMA instantánea que la marca.
+
+        Returns:
+            tuple: (filas {clave: dict}, ts del último cambio {clave: ts}, claves borradas, marca actual)
+        """
+        with self.conexion.lectura() as conn:
+            conn.execute("BEGIN")
+            marca_actual, seq_min = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM registro_cambios").fetchone()
+            completa = estado is None or (seq_min is not None and seq_min > estado.marca_envio + 1)
+
+            if completa:
+                filas = pd.read_sql_query(f"SELECT * FROM {tabla}", conn)
+                ts = conn.execute(
+                    "SELECT id_fila, MAX(ts) FROM registro_cambios WHERE tabla = ? GROUP BY id_fila", (tabla,)
+                ).fetchall()
+            else:
+                rango = (tabla, estado.marca_envio, marca_actual)
+                ts = conn.execute(
+                    "SELECT id_fila, MAX(ts) FROM registro_cambios WHERE tabla = ? AND seq > ? AND seq <= ? "
+                    "GROUP BY id_fila", rango
+                ).fetchall()
+                filas = pd.read_sql_query(
+                    f"SELECT * FROM {tabla} WHERE id IN "
+                    "(SELECT id_fila FROM registro_cambios WHERE tabla = ? AND seq > ? AND seq <= ?)",
+                    conn, params=rango
+                )
+
+        registros = filas.astype(object).where(filas.notna(), None).to_dict("records")
+        locales = {clave_fila(registro[COLUMNA_CLAVE]): registro for registro in registros}
+        ts_locales = dict(zip([clave_fila(id_fila) for id_fila, _ in ts], normalizar_ts([t for _, t in ts])))
+        borrados = set() if completa else set(ts_locales) - set(locales)
+        if completa:
+            ts_locales = {clave: t for clave, t in ts_locales.items() if clave in locales}
+        print(f"  > Cambios en SQLite: {len(locales)} fila(s) nuevas/modificadas, {len(borrados)} borrada(s)"
+              f"{' (reconciliación completa)' if completa else ''}")
+        return locales, ts_locales, borrados, marca_actual
+
+    # --- RESOLUCIÓN ---
+    @staticmethod
+    def _misma_fila(encabezado: list, datos: dict, fila: FilaHoja) -> bool:
+        """True si la fila de la hoja ya tiene los valores de SQLite (en las columnas comunes)."""
+        return all(_valor_hoja(_texto(datos[col])) == _valor_hoja(fila.valores[i])
+                   for i, col in enumerate(encabezado) if col in datos)
+
+    @staticmethod
+    def _huella_hoja(encabezado: list, columnas: list, fila: FilaHoja) -> str:
+        """Huella de una fila de la hoja en esas columnas."""
+        return huella([_valor_hoja(fila.valores[encabezado.index(col)]) for col in columnas])
+
+    @staticmethod
+    def _huella_datos(columnas: list, datos: dict) -> str:
+        """Huella que tendrá en la hoja una fila de SQLite (misma que _huella_hoja al leerla)."""
+        return huella([_valor_hoja(_texto(datos.get(col))) for col in columnas])
+
+    def _resolver(self, encabezado, filas_hoja, remotos, borrados_remotos, locales, ts_locales, borrados_locales):
+        """
+        Decide qué va a cada lado. Si la fila cambió en los dos lados gana el cambio más
+        reciente (a igual hora, o sin hora posterior en la hoja, gana SQLite). Una fila
+        borrada en la hoja se borra de SQLite, salvo que también haya cambiado en la app.
+
+        Returns:
+            tuple: (claves a enviar, claves a borrar de la hoja, filas de la hoja a recibir,
+                claves a borrar de SQLite, conflictos)
+        """
+        enviar, borrar, recibir, eliminar, conflictos = [], [], {}, [], 0
+        for clave in set(locales) | borrados_locales | set(remotos) | borrados_remotos:
+            remoto = remotos.get(clave)
+            cambio_local = clave in locales or clave in borrados_locales
+
+            if clave in borrados_remotos:
+                if clave in locales:
+                    conflictos += 1
+                    enviar.append(clave)  # Se modificó en la app: vuelve a la hoja
+                elif clave not in borrados_locales:
+                    eliminar.append(clave)
+                continue
+
+            if cambio_local and remoto is not None:
+                if clave in locales and self._misma_fila(encabezado, locales[clave], remoto):
+                    continue  # Los dos lados ya coinciden
+                conflictos += 1
+                ts_local = ts_locales.get(clave)
+                if remoto.ts is not None and (ts_local is None or remoto.ts > ts_local):
+                    recibir[clave] = remoto
+                    continue
+
+            if cambio_local:
+                if clave in locales:
+                    fila = filas_hoja.get(clave)
+                    if fila is None or not self._misma_fila(encabezado, locales[clave], fila):
+                        enviar.append(clave)
+                elif clave in filas_hoja:
+                    borrar.append(clave)
+            else:
+                recibir[clave] = remoto
+        return enviar, borrar, recibir, eliminar, conflictos
+
+    # --- ESCRITURA EN CADA LADO ---
+    def _recibir(self, tabla, encabezado, recibir: dict, sin_clave: list, eliminar: list, marca_actual: int):
+        """
+        Escribe en SQLite (UNA transacción) las filas recibidas de la hoja: UPDATE por id o
+        INSERT si no existe; las filas sin clave se insertan con un id nuevo y las borradas
+        en la hoja se borran. Las filas que ya tienen los mismos valores no se tocan.
+        En 'asignaciones' recuenta, en la misma transacción, los días de 'agenda_cupos'
+        que tenían o tienen ahora alguna de esas filas.
+
+        Returns:
+            tuple: (filas escritas, [(número de fila, fila de SQLite, FilaHoja)] de las nuevas sin id,
+                nueva marca de envío)
+        """
+        if not recibir and not sin_clave and not eliminar:
+            return 0, [], marca_actual
+
+        columnas = set(self._columnas_tabla(tabla))
+        comunes = [col for col in encabezado if col in columnas]
+        posiciones = {col: encabezado.index(col) for col in comunes}
+
+        def datos_de(fila: FilaHoja) -> dict:
+            return {col: _valor_hoja(fila.valores[pos]) for col, pos in posiciones.items()}
+
+        escritas, nuevas_con_id, dias = 0, [], set()
+        with self.conexion.transaccion() as conn:
+            seq_antes = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM registro_cambios").fetchone()[0]
+
+            actuales = self._filas_por_id(conn, tabla, list(recibir) + list(eliminar))
+            for clave, fila in recibir.items():
+                datos = datos_de(fila)
+                datos[COLUMNA_CLAVE] = _valor_hoja(clave)
+                actual = actuales.get(clave)
+                if actual is not None and all(_valor_hoja(_texto(actual[col])) == datos[col] for col in datos):
+                    continue
+                dias.update([(actual or {}).get(COLUMNA_DIA_CUPO), datos.get(COLUMNA_DIA_CUPO)])
+                sin_id = [col for col in datos if col != COLUMNA_CLAVE]
+                cursor = conn.execute(
+                    f"UPDATE {tabla} SET {', '.join(f'{col} = ?' for col in sin_id)} WHERE {COLUMNA_CLAVE} = ?",
+                    [datos[col] for col in sin_id] + [datos[COLUMNA_CLAVE]]
+                ) if sin_id else None
+                if cursor is None or cursor.rowcount == 0:
+                    conn.execute(f"INSERT INTO {tabla} ({', '.join(datos)}) VALUES ({', '.join('?' * len(datos))})",
+                                 list(datos.values()))
+                escritas += 1
+
+            for fila in sin_clave:
+                # Las celdas vacías toman el DEFAULT de la columna (no un NULL explícito)
+                datos = {col: valor for col, valor in datos_de(fila).items()
+                         if col != COLUMNA_CLAVE and valor is not None}
+                if not datos:
+                    continue
+                cursor = conn.execute(
+                    f"INSERT INTO {tabla} ({', '.join(datos)}) VALUES ({', '.join('?' * len(datos))})",
+                    list(datos.values())
+                )
+                # La fila tal como quedó (con su id y los valores por defecto), para escribirla en la hoja
+                datos = self._filas_por_id(conn, tabla, [clave_fila(cursor.lastrowid)])[clave_fila(cursor.lastrowid)]
+                nuevas_con_id.append((fila.numero, datos, fila))
+                dias.add(datos.get(COLUMNA_DIA_CUPO))
+
+            eliminadas = [clave for clave in eliminar if clave in actuales]
+            conn.executemany(f"DELETE FROM {tabla} WHERE {COLUMNA_CLAVE} = ?",
+                             [(_valor_hoja(clave),) for clave in eliminadas])
+            dias.update(actuales[clave].get(COLUMNA_DIA_CUPO) for clave in eliminadas)
+
+            if escritas or nuevas_con_id or eliminadas:
+                self.conexion.registrar_escritura(tabla)
+            if tabla == "asignaciones":
+                # Estas escrituras no pasan por AgendaCupos.registrar/mover/liberar: se recuentan los días
+                AgendaCupos(self.conexion).reconstruir(dias)
+            seq_despues = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM registro_cambios").fetchone()[0]
+
+        # Lo que acabamos de escribir no se reenvía a la hoja; si otra escritura se coló
+        # entre la lectura y la transacción, la marca no avanza (se reenvía, sin efecto).
+        marca_envio = seq_despues if seq_antes == marca_actual else marca_actual
+        return escritas, nuevas_con_id, marca_envio
+
+    @staticmethod
+    def _filas_por_id(conn, tabla: str, claves: list) -> dict:
+        """Filas actuales de SQLite para esas claves ({clave: dict})."""
+        filas = {}
+        for inicio in range(0, len(claves), TAMANO_LOTE_IDS):
+            lote = [_valor_hoja(clave) for clave in claves[inicio:inicio + TAMANO_LOTE_IDS]]
+            cursor = conn.execute(
+                f"SELECT * FROM {tabla} WHERE {COLUMNA_CLAVE} IN ({', '.join('?' * len(lote))})", lote)
+            nombres = [d[0] for d in cursor.description]
+            for valores in cursor:
+                registro = dict(zip(nombres, valores))
+                filas.setdefault(clave_fila(registro[COLUMNA_CLAVE]), registro)
+        return filas
+
+    @staticmethod
+    def _fila_para_hoja(encabezado: list, datos: dict, ts, fila_actual) -> list:
+        """
+        Fila en el orden del encabezado: columnas de SQLite, COLUMNA_TS (ts normalizado, se
+        escribe en UTC con 'Z') y, el resto, lo que ya tenía la hoja.
+        """
+        fila = []
+        for i, col in enumerate(encabezado):
+            if col == COLUMNA_TS:
+                fila.append(ts_para_hoja(ts) if ts else (fila_actual.valores[i] if fila_actual else ""))
+            elif col == COLUMNA_CLAVE:
+                fila.append(clave_fila(datos[col]) or "")
+            elif col in datos:
+                fila.append(_texto(datos[col]))
+            else:
+                fila.append(fila_actual.valores[i] if fila_actual else "")
+        return fila
@@ -0,0 +1,25 @@
+# tests/conftest.py
+"""
+Fixtures comunes: una DB SQLite temporal (las migraciones crean el esquema al abrir
+el pool) y un st.session_state limpio para cada prueba (Streamlit en modo "bare").
+"""
+import pytest
+import streamlit as st
+
+from data.conexion_sqlite import ConexionSQLite
+
+
+@pytest.fixture
+def conexion(tmp_path):
+    """ConexionSQLite sobre una DB nueva en una carpeta temporal."""
+    return ConexionSQLite(str(tmp_path / "prueba.db"))
+
+
+@pytest.fixture(autouse=True)
+def sesion_limpia():
+    """Cada prueba arranca con st.session_state vacío."""
+    for clave in list(st.session_state.keys()):
+        del st.session_state[clave]
+    yield
+    for clave in list(st.session_state.keys()):
+        del st.session_state[clave]
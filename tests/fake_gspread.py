@@ -0,0 +1,240 @@
+# tests/fake_gspread.py
+"""
+Cliente de Google Sheets FALSO y en memoria, con la misma interfaz que usa
+data/conexion_sheets.py (spreadsheet.worksheet, values_batch_get, get_all_records,
+find, update, append_rows, batch_update, borrado de filas...).
+
+Cuenta cada petición que en gspread sería un viaje de red (y opcionalmente
+simula su latencia y errores temporales 429/5xx de la API), para verificar
+(tests/) y medir (benchmarks/) los cambios sin red ni credenciales.
+
+Uso:
+    libro = LibroFalso({"Usuarios": [["id", "nombre"], ["1", "Ana"]]})
+    conexion = conectar(libro)  # ConexionSheets con el libro ya "abierto"
+"""
+import random
+import threading
+import time
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, fill_gaps, rowcol_to_a1
+
+from data.conexion_sheets import ConexionSheets
+
+# Peticiones por minuto "infinitas" para conectar()
+SIN_LIMITE_DE_TASA = 1e9
+
+
+def _recortar(filas):
+    """Como la API de Sheets: sin celdas vacías al final de cada fila ni filas vacías al final."""
+    filas = [list(fila) for fila in filas]
+    for fila in filas:
+        while fila and fila[-1] == "":
+            fila.pop()
+    while filas and not filas[-1]:
+        filas.pop()
+    return filas
+
+
+def _nombre_hoja(rango: str) -> str:
+    """Nombre de la hoja de un rango A1 ("'Hoja'!A1:B2" o "'Hoja'")."""
+    hoja = rango.rsplit("!", 1)[0] if "!" in rango else rango
+    if hoja.startswith("'") and hoja.endswith("'"):
+        hoja = hoja[1:-1].replace("''", "'")
+    return hoja
+
+
+def _rango_celdas(rango: str) -> str:
+    """Parte de celdas de un rango A1 ("'Hoja'!A2:C2" -> "A2:C2")."""
+    return rango.rsplit("!", 1)[1] if "!" in rango else rango
+
+
+MENSAJES_ERROR = {
+    429: ("RESOURCE_EXHAUSTED", "Quota exceeded for quota metric 'Read requests' per minute per user."),
+    500: ("INTERNAL", "Internal error encountered."),
+    503: ("UNAVAILABLE", "The service is currently unavailable."),
+}
+
+
+class RespuestaFalsa:
+    """Respuesta HTTP de error con la forma que espera gspread.exceptions.APIError."""
+
+    def __init__(self, codigo: int):
+        estado, mensaje = MENSAJES_ERROR.get(codigo, ("UNKNOWN", "Error"))
+        self.status_code = codigo
+        self._cuerpo = {"error": {"code": codigo, "message": mensaje, "status": estado}}
+        self.text = str(self._cuerpo)
+
+    def json(self):
+        return self._cuerpo
+
+
+class HojaFalsa:
+    """Una pestaña del libro: sus celdas son una lista de filas de textos (valores formateados)."""
+
+    def __init__(self, libro: "LibroFalso", titulo: str, filas, id_hoja: int = 0):
+        self.libro = libro
+        self.spreadsheet = libro
+        self.id = id_hoja
+        self.title = titulo
+        self.filas = [[str(valor) for valor in fila] for fila in filas]
+
+    # --- Lecturas (1 petición cada una) ---
+    def get(self, *args, pad_values: bool = False, **kwargs):
+        self.libro._peticion("values.get", self.title)
+        filas = _recortar(self.filas)
+        if not filas:
+            return [[]]
+        return fill_gaps(filas) if pad_values else filas
+
+    def get_all_values(self, *args, **kwargs):
+        return self.get(pad_values=True)
+
+    # La lógica real de gspread (encabezado, números, registros) sobre el get() falso
+    get_all_records = gspread.Worksheet.get_all_records
+
+    def col_values(self, col: int, *args, **kwargs):
+        self.libro._peticion("values.get", self.title)
+        return [fila[col - 1] if len(fila) >= col else "" for fila in _recortar(self.filas)]
+
+    def find(self, query, in_column: int = None, **kwargs):
+        self.libro._peticion("values.get", self.title)
+        for i, fila in enumerate(self.filas, start=1):
+            for j, valor in enumerate(fila, start=1):
+                if valor == str(query) and (in_column is None or j == in_column):
+                    return gspread.Cell(i, j, valor)
+        return None
+
+    # --- Escrituras (1 petición cada una) ---
+    def _escribir(self, fila_inicio: int, col_inicio: int, valores):
+        for i, fila in enumerate(valores):
+            destino = fila_inicio - 1 + i
+            while len(self.filas) <= destino:
+                self.filas.append([])
+            actual = self.filas[destino]
+            for j, valor in enumerate(fila):
+                col = col_inicio - 1 + j
+                while len(actual) <= col:
+                    actual.append("")
+                actual[col] = "" if valor is None else str(valor)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self.libro._peticion("values.update", self.title)
+        if isinstance(values, str):  # Orden antiguo de gspread: update(rango, valores)
+            values, range_name = range_name, values
+        rango = a1_range_to_grid_range(_rango_celdas(range_name))
+        self._escribir(rango.get("startRowIndex", 0) + 1, rango.get("startColumnIndex", 0) + 1, values)
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        self.libro._peticion("values.append", self.title)
+        self.filas = _recortar(self.filas)
+        inicio = len(self.filas) + 1
+        self._escribir(inicio, 1, values)
+        # Misma forma que la respuesta de la API: el rango que quedó escrito
+        fin = rowcol_to_a1(inicio + len(values) - 1, max(len(fila) for fila in values))
+        return {"updates": {"updatedRange": f"'{self.title}'!A{inicio}:{fin}", "updatedRows": len(values)}}
+
+    def batch_update(self, data, **kwargs):
+        self.libro._peticion("values.batchUpdate", self.title)
+        for bloque in data:
+            rango = a1_range_to_grid_range(_rango_celdas(bloque["range"]))
+            self._escribir(rango.get("startRowIndex", 0) + 1, rango.get("startColumnIndex", 0) + 1, bloque["values"])
+
+
+class LibroFalso:
+    """
+    Libro (spreadsheet) falso. `peticiones` registra cada llamada que en gspread
+    sería una petición HTTP: (tipo, hoja).
+
+    Args:
+        hojas (dict): {nombre_hoja: filas}, la primera fila es el encabezado.
+        latencia (float): Segundos que "tarda" cada petición (0 = sin espera).
+        probabilidad_error (float): Probabilidad de que una petición falle con un error
+            temporal de la API (sin aplicarse), como cuando se agota la cuota.
+        codigos_error (tuple): Códigos HTTP que se sortean para esos errores.
+        semilla (int): Semilla del sorteo (errores reproducibles).
+        zona_horaria (str): Zona horaria de la planilla (Spreadsheet.timezone).
+    """
+
+    def __init__(self, hojas: dict, latencia: float = 0.0, probabilidad_error: float = 0.0,
+                 codigos_error: tuple = (429, 503), semilla: int = 42, zona_horaria: str = "UTC"):
+        self.timezone = zona_horaria
+        self.latencia = latencia
+        self.probabilidad_error = probabilidad_error
+        self.codigos_error = codigos_error
+        self.peticiones = []
+        self.errores = []  # (tipo, hoja, código) de cada petición que falló
+        self._forzados = {}  # {tipo: [códigos]}: errores de las próximas peticiones de ese tipo
+        self._azar = random.Random(semilla)
+        self._candado = threading.Lock()
+        self._hojas = {nombre: HojaFalsa(self, nombre, filas, id_hoja=i)
+                       for i, (nombre, filas) in enumerate(hojas.items())}
+
+    def _peticion(self, tipo: str, hoja: str = None):
+        with self._candado:
+            self.peticiones.append((tipo, hoja))
+            codigo = None
+            if self._forzados.get(tipo):
+                codigo = self._forzados[tipo].pop(0)
+            elif self.probabilidad_error and self._azar.random() < self.probabilidad_error:
+                codigo = self._azar.choice(self.codigos_error)
+            if codigo is not None:
+                self.errores.append((tipo, hoja, codigo))
+        if self.latencia:
+            time.sleep(self.latencia)
+        if codigo is not None:
+            # La API rechaza la petición antes de aplicarla
+            raise gspread.exceptions.APIError(RespuestaFalsa(codigo))
+
+    def forzar_errores(self, tipo: str, *codigos: int):
+        """Las próximas peticiones de ese tipo (ej. 'values.append') fallan con esos códigos, en orden."""
+        with self._candado:
+            self._forzados.setdefault(tipo, []).extend(codigos)
+
+    def reiniciar_conteo(self):
+        with self._candado:
+            self.peticiones = []
+            self.errores = []
+
+    def worksheet(self, title: str) -> HojaFalsa:
+        # En gspread, abrir una pestaña por nombre consulta los metadatos del libro
+        self._peticion("spreadsheets.get", title)
+        try:
+            return self._hojas[title]
+        except KeyError:
+            raise gspread.WorksheetNotFound(title)
+
+    def values_batch_get(self, ranges, params=None):
+        self._peticion("values.batchGet")
+        rangos = []
+        for rango in ranges:
+            hoja = self._hojas.get(_nombre_hoja(rango))
+            if hoja is None:
+                raise gspread.WorksheetNotFound(_nombre_hoja(rango))
+            filas = _recortar(hoja.filas)
+            rangos.append({"range": rango, "majorDimension": "ROWS", **({"values": filas} if filas else {})})
+        return {"spreadsheetId": "falso", "valueRanges": rangos}
+
+    def batch_update(self, body):
+        # Solo los pedidos que usa la app: borrar filas (deleteDimension), en el orden recibido
+        self._peticion("spreadsheets.batchUpdate")
+        hojas_por_id = {hoja.id: hoja for hoja in self._hojas.values()}
+        for pedido in body["requests"]:
+            rango = pedido["deleteDimension"]["range"]
+            hoja = hojas_por_id[rango["sheetId"]]
+            del hoja.filas[rango["startIndex"]:rango["endIndex"]]
+        return {"spreadsheetId": "falso", "replies": [{} for _ in body["requests"]]}
+
+
+def conectar(libro: LibroFalso, **kwargs) -> ConexionSheets:
+    """
+    ConexionSheets cuyo connect() devuelve el libro falso. Sin límite de tasa salvo
+    que se pida con `por_minuto` (las pruebas cuentan peticiones, no esperan la cuota).
+    """
+    kwargs.setdefault("por_minuto", SIN_LIMITE_DE_TASA)
+    conexion = ConexionSheets(creds_json=None, spreadsheet_name="falso", **kwargs)
+    conexion.spreadsheet = libro
+    return conexion
@@ -0,0 +1,182 @@
+# tests/test_conexion_sheets.py
+"""ConexionSheets contra el cliente falso de tests/fake_gspread.py (sin red ni credenciales)."""
+import gspread
+import pandas as pd
+import pytest
+
+from data import conexion_sheets
+from data.conexion_sheets import ASIGNACIONES_COLUMNS, ConexionSheets, LimitadorTasa
+from tests.fake_gspread import LibroFalso, conectar
+
+HOJAS = ["Usuarios", "Recursos", "Asignaciones"]
+
+
+@pytest.fixture
+def libro():
+    """Usuarios con filas cortas (la API no devuelve celdas vacías al final), recursos y asignaciones vacía."""
+    usuarios = [["id", "nombre", "edad", "ocupacion", "internet"]]
+    usuarios += [[i, f"Usuario {i}", 20 + i, "hogar", 1] if i % 3 else [i, f"Usuario {i}"] for i in range(1, 11)]
+    recursos = [["id", "identificador", "estado", "precio"], [1, "TAB-1", "disponible", "960.5"]]
+    return LibroFalso({"Usuarios": usuarios, "Recursos": recursos, "Asignaciones": []})
+
+
+# --- LECTURA EN LOTE (load_data) ---
+
+def test_carga_en_lote_igual_a_hoja_por_hoja(libro):
+    hoja_por_hoja = conectar(libro).load_data(HOJAS, batch=False)
+    en_lote = conectar(libro).load_data(HOJAS, batch=True)
+
+    for hoja in HOJAS:
+        pd.testing.assert_frame_equal(hoja_por_hoja[hoja], en_lote[hoja])
+    assert list(en_lote["Asignaciones"].columns) == ASIGNACIONES_COLUMNS
+    assert en_lote["Usuarios"].loc[2, "edad"] == "" and en_lote["Recursos"].loc[0, "precio"] == 960.5
+
+
+def test_carga_en_lote_es_una_peticion(libro):
+    conexion = conectar(libro)
+    conexion.load_data(HOJAS, batch=False)
+    assert len(libro.peticiones) == 2 * len(HOJAS)  # worksheet() + get_all_records() por hoja
+
+    libro.reiniciar_conteo()
+    conexion.load_data(HOJAS, batch=True)
+    assert [tipo for tipo, _ in libro.peticiones] == ["values.batchGet"]
+
+
+@pytest.mark.parametrize("batch", [True, False])
+def test_encabezado_repetido_lanza_error(batch):
+    libro = LibroFalso({"Usuarios": [["id", "nombre", "nombre"], [1, "Ana", "María"]]})
+    with pytest.raises(gspread.exceptions.GSpreadException, match="duplicates"):
+        conectar(libro).load_data(["Usuarios"], batch=batch)
+
+
+# --- UPSERTS CON BUFFER (EscritorLotes / save_or_update_many) ---
+
+def libro_usuarios(n: int = 10) -> LibroFalso:
+    filas = [["id", "nombre", "edad"]] + [[i, f"Usuario {i}", 30] for i in range(1, n + 1)]
+    return LibroFalso({"Usuarios": filas})
+
+
+def test_upserts_en_lote_igual_a_fila_por_fila():
+    # Actualizaciones, filas nuevas y una clave repetida (gana la última)
+    filas = [[3, "Tres", 33], [11, "Once", 11], [7, "Siete", 77], [12, "Doce", 12], [11, "Once bis", 110]]
+
+    libro_filas, libro_lote = libro_usuarios(), libro_usuarios()
+    conexion_filas = conectar(libro_filas)
+    for fila in filas:
+        conexion_filas.save_or_update("Usuarios", fila)
+    libro_lote.reiniciar_conteo()
+    conectar(libro_lote).save_or_update_many("Usuarios", filas)
+
+    # worksheet() + col_values() + batch_update() + append_rows()
+    assert [tipo for tipo, _ in libro_lote.peticiones] == [
+        "spreadsheets.get", "values.get", "values.batchUpdate", "values.append"]
+    assert libro_lote._hojas["Usuarios"].get_all_values() == libro_filas._hojas["Usuarios"].get_all_values()
+
+
+def test_escritor_indexa_filas_nuevas_y_borra_de_abajo_hacia_arriba():
+    libro = libro_usuarios(5)
+    with conectar(libro).escritor_lotes("Usuarios") as escritor:
+        escritor.upsert([6, "Seis", 60])
+    with conectar(libro).escritor_lotes("Usuarios") as escritor:
+        escritor.eliminar(2)
+        escritor.eliminar(6)
+        assert not escritor.eliminar(99)
+        escritor.upsert([4, "Cuatro", 44])
+
+    assert libro._hojas["Usuarios"].get_all_values() == [
+        ["id", "nombre", "edad"], ["1", "Usuario 1", "30"], ["3", "Usuario 3", "30"],
+        ["4", "Cuatro", "44"], ["5", "Usuario 5", "30"]]
+
+
+def test_escritor_no_envia_nada_si_hubo_un_error():
+    libro = libro_usuarios(3)
+    with pytest.raises(RuntimeError):
+        with conectar(libro).escritor_lotes("Usuarios") as escritor:
+            escritor.upsert([1, "Cambiada", 1])
+            raise RuntimeError("falla a mitad de camino")
+
+    assert libro._hojas["Usuarios"].get_all_values()[1] == ["1", "Usuario 1", "30"]
+    assert "values.batchUpdate" not in [tipo for tipo, _ in libro.peticiones]
+
+
+# --- REINTENTOS Y LÍMITE DE TASA ---
+
+def conectar_rapido(libro: LibroFalso, **kwargs) -> ConexionSheets:
+    """Como conectar(), con esperas mínimas entre reintentos (en producción: 1 s a 64 s)."""
+    conexion = conectar(libro, **kwargs)
+    conexion.espera_base, conexion.espera_maxima = 0.001, 0.01
+    return conexion
+
+
+def test_errores_temporales_se_reintentan_y_recuperan_todo(libro):
+    referencia = conectar(libro).load_data(HOJAS, batch=False)
+    libro_errores = LibroFalso({hoja: libro._hojas[hoja].filas for hoja in HOJAS},
+                               probabilidad_error=0.3, codigos_error=(429, 500, 503))
+
+    datos = conectar_rapido(libro_errores, hilos=4).load_data(HOJAS, batch=False)
+
+    assert libro_errores.errores, "no se inyectó ningún error"
+    for hoja in HOJAS:
+        pd.testing.assert_frame_equal(referencia[hoja], datos[hoja])
+
+
+@pytest.mark.parametrize("codigo", [429, 503])
+def test_lectura_se_reintenta_hasta_agotar_los_intentos(codigo):
+    libro = libro_usuarios(3)
+    conexion = conectar_rapido(libro)
+    libro.forzar_errores("values.get", *[codigo] * conexion.intentos_maximos)
+    hoja = libro._hojas["Usuarios"]
+
+    with pytest.raises(gspread.exceptions.APIError):
+        conexion.llamar(hoja.get_all_values)
+    assert len(libro.peticiones) == conexion.intentos_maximos
+
+    libro.forzar_errores("values.get", codigo)
+    assert conexion.llamar(hoja.get_all_values)[1] == ["1", "Usuario 1", "30"]
+
+
+def test_append_no_se_reintenta_con_5xx():
+    # Un 5xx no dice si la fila se agregó: reintentar podría duplicarla
+    libro = libro_usuarios(3)
+    libro.forzar_errores("values.append", 503)
+
+    with pytest.raises(gspread.exceptions.APIError):
+        conectar_rapido(libro).save_or_update("Usuarios", [4, "Cuatro", 40])
+    assert [tipo for tipo, _ in libro.peticiones].count("values.append") == 1
+
+
+def test_append_se_reintenta_con_429():
+    # 429: la API rechazó la petición sin aplicarla, es seguro repetirla
+    libro = libro_usuarios(3)
+    libro.forzar_errores("values.append", 429, 429)
+
+    with conectar_rapido(libro).escritor_lotes("Usuarios") as escritor:
+        escritor.upsert([4, "Cuatro", 40])
+
+    assert [tipo for tipo, _ in libro.peticiones].count("values.append") == 3
+    assert libro._hojas["Usuarios"].get_all_values()[-2:] == [["3", "Usuario 3", "30"], ["4", "Cuatro", "40"]]
+
+
+def test_limitador_no_supera_la_cuota_en_ninguna_ventana_de_60_s(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(conexion_sheets.time, "monotonic", lambda: reloj[0])
+    monkeypatch.setattr(conexion_sheets.time, "sleep", lambda segundos: reloj.__setitem__(0, reloj[0] + segundos))
+    limitador = LimitadorTasa(60)
+
+    tiempos = []
+    for _ in range(200):
+        limitador.tomar()
+        tiempos.append(reloj[0])
+
+    assert tiempos[:limitador.capacidad] == [1000.0] * limitador.capacidad  # La ráfaga sale sin esperar
+    for inicio in tiempos:
+        assert sum(inicio <= t < inicio + 60 for t in tiempos) <= 60
+
+
+def test_limitador_compartido_por_las_conexiones_del_proceso():
+    primera, segunda = ConexionSheets(None, "libro"), ConexionSheets(None, "otro libro")
+    propio = LimitadorTasa(30)
+
+    assert primera.limitador is segunda.limitador
+    assert ConexionSheets(None, "libro", por_minuto=30).limitador is not primera.limitador
+    assert ConexionSheets(None, "libro", limitador=propio).limitador is propio
@@ -0,0 +1,35 @@
+# tests/test_kpis.py
+"""KPIs del dashboard (core.kpis.obtener_kpis)."""
+import sqlite3
+
+import core.kpis as kpis_mod
+
+
+def test_kpis_desde_la_db(conexion):
+    conexion.insertar_masivo("usuarios", {"id": [1, 2, 3]})
+    conexion.insertar_masivo("recursos", {"id": [1, 2], "estado": ["disponible", "asignado"], "precio": [100, 300]})
+    conexion.insertar_masivo("asignaciones", {"id": [1], "id_usuario": [1], "id_recurso": [2], "estado": ["asignado"]})
+
+    kpis = kpis_mod.obtener_kpis(conexion)
+
+    assert (kpis["total_usuarios"], kpis["pendientes"], kpis["disponibles"], kpis["asignados"]) == (3, 2, 1, 1)
+    assert kpis["deficit"] == 1 and kpis["presupuesto_total"] == 200.0
+
+
+def test_error_pasajero_no_queda_en_cache(conexion, monkeypatch):
+    conexion.insertar_masivo("usuarios", {"id": [1, 2]})
+    leer_sql = kpis_mod.pd.read_sql_query
+    fallas = []
+
+    def leer_con_una_falla(*args, **kwargs):
+        if not fallas:
+            fallas.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return leer_sql(*args, **kwargs)
+
+    # La falla ocurre DENTRO de la función cacheada _leer_kpis
+    monkeypatch.setattr(kpis_mod.pd, "read_sql_query", leer_con_una_falla)
+
+    assert kpis_mod.obtener_kpis(conexion)["total_usuarios"] == 0
+    # Sin escribir en las tablas (mismas versiones): el siguiente intento vuelve a consultar
+    assert kpis_mod.obtener_kpis(conexion)["total_usuarios"] == 2
@@ -0,0 +1,60 @@
+# tests/test_session_manager.py
+"""Escritura write-through de una fila (ui.session_manager.escribir_fila)."""
+import pytest
+import streamlit as st
+
+import ui.session_manager as session_manager
+
+
+@pytest.fixture
+def sesion(conexion, monkeypatch):
+    """Sesión inicializada sobre una DB temporal con 3 usuarios, 3 recursos y 3 citas."""
+    conexion.insertar_masivo("usuarios", {
+        "id": [1, 2, 3], "nombre": ["Ana", "Luis", "Eva"], "edad": [8, 40, 70],
+        "ocupacion": ["estudiante", "hogar", "jubilado"], "internet": ["no", "si", "no"],
+        "dispositivo": ["no", "no", "si"], "fecha_registro": ["2025-01-01"] * 3,
+    })
+    conexion.insertar_masivo("recursos", {"id": [1, 2, 3], "estado": ["asignado"] * 3})
+    conexion.insertar_masivo("asignaciones", {
+        "id": [1, 2, 3], "id_usuario": [1, 2, 3], "id_recurso": [1, 2, 3],
+        "estado": ["asignado"] * 3, "fecha_cita": ["2025-11-21"] * 3,
+    })
+    monkeypatch.setattr(session_manager, "conexion_activa", conexion)
+    session_manager.init_session()
+
+    # Contar las sincronizaciones que haga escribir_fila (las que evita el write-through)
+    llamadas = []
+    sincronizar = session_manager.sincronizar_tablas
+    monkeypatch.setattr(session_manager, "sincronizar_tablas", lambda: (llamadas.append(1), sincronizar()))
+    return llamadas
+
+
+def estado_en_sesion(id_asignacion: int) -> str:
+    asignaciones = st.session_state["asignaciones"]
+    return asignaciones.loc[asignaciones["id"] == id_asignacion, "estado"].item()
+
+
+def test_escrituras_seguidas_no_resincronizan(sesion, conexion):
+    assert session_manager.escribir_fila("asignaciones", 1, {"estado": "entregado"})
+    assert session_manager.escribir_fila("asignaciones", 2, {"estado": "entregado"})
+
+    assert sesion == []
+    assert estado_en_sesion(1) == "entregado" and estado_en_sesion(2) == "entregado"
+    assert st.session_state["versiones_sesion"]["asignaciones"] == conexion.version_tabla("asignaciones")
+
+
+def test_escritura_de_otra_sesion_obliga_a_resincronizar(sesion, conexion):
+    assert session_manager.escribir_fila("asignaciones", 1, {"estado": "entregado"})
+    # Otra sesión escribe en la tabla: la sesión ya no está al día
+    conexion.actualizar_registros("asignaciones", {"estado": "ausente_1"}, "id = ?", (3,))
+
+    assert session_manager.escribir_fila("asignaciones", 2, {"estado": "entregado"})
+
+    assert sesion == [1]
+    assert estado_en_sesion(2) == "entregado" and estado_en_sesion(3) == "ausente_1"
+
+
+def test_escritura_fallida_resincroniza_y_devuelve_false(sesion):
+    assert not session_manager.escribir_fila("asignaciones", 1, {"no_existe": 1})
+    assert sesion == [1]
+    assert estado_en_sesion(1) == "asignado"
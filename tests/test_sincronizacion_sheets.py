@@ -0,0 +1,214 @@
+# tests/test_sincronizacion_sheets.py
+"""
+Sincronización SQLite <-> Google Sheets (data/sincronizacion_sheets.py) contra el cliente
+falso: ida y vuelta, conflictos, ediciones sin actualizado_ts, borrados en la hoja, zona
+horaria y el recuento de 'agenda_cupos' al recibir asignaciones.
+"""
+import time
+
+import pytest
+
+from data.sincronizacion_sheets import (COLUMNA_TS, SincronizadorSheets, _texto, _valor_hoja, ahora_ts,
+                                        clave_fila, normalizar_ts)
+from tests.fake_gspread import LibroFalso, conectar
+
+USUARIOS = 20
+
+
+@pytest.fixture
+def libro():
+    return LibroFalso({"Usuarios": [], "Asignaciones": []})
+
+
+@pytest.fixture
+def sincronizador(conexion, libro):
+    """Sincronizador con la tabla usuarios cargada y una primera pasada ya hecha."""
+    with conexion.escritura() as conn:
+        conn.executemany("INSERT INTO usuarios (nombre, edad, ocupacion) VALUES (?, ?, ?)",
+                         [(f"Usuario {i}", 18 + i, "hogar") for i in range(1, USUARIOS + 1)])
+        conn.commit()
+    sincronizador = SincronizadorSheets(conexion, conectar(libro))
+    assert sincronizador.sincronizar("usuarios", "Usuarios")["enviadas"] == USUARIOS
+    libro.reiniciar_conteo()
+    return sincronizador
+
+
+def filas_tabla(conexion, tabla: str) -> dict:
+    with conexion.lectura() as conn:
+        cursor = conn.execute(f"SELECT * FROM {tabla}")
+        columnas = [d[0] for d in cursor.description]
+        return {clave_fila(fila[0]): dict(zip(columnas, fila)) for fila in cursor}
+
+
+def comprobar_iguales(conexion, libro, tabla: str = "usuarios", hoja: str = "Usuarios"):
+    """La hoja y la tabla tienen las mismas filas y valores."""
+    registros = filas_tabla(conexion, tabla)
+    valores = libro._hojas[hoja].get_all_values()
+    encabezado = valores[0]
+    en_hoja = {clave_fila(fila[0]): dict(zip(encabezado, fila)) for fila in valores[1:]}
+
+    assert set(registros) == set(en_hoja)
+    for clave, registro in registros.items():
+        for col, valor in registro.items():
+            assert _valor_hoja(_texto(valor)) == _valor_hoja(en_hoja[clave][col]), (clave, col)
+
+
+def fila_hoja(libro, clave: str, hoja: str = "Usuarios") -> list:
+    return next(fila for fila in libro._hojas[hoja].filas[1:] if fila[0] == clave)
+
+
+def editar(libro, clave: str, columna: str, valor: str, ts: str = None, hoja: str = "Usuarios"):
+    """Edita una celda como haría el personal (y, si se da, su actualizado_ts)."""
+    encabezado = libro._hojas[hoja].filas[0]
+    fila = fila_hoja(libro, clave, hoja)
+    fila += [""] * (len(encabezado) - len(fila))
+    fila[encabezado.index(columna)] = valor
+    if ts is not None:
+        fila[encabezado.index(COLUMNA_TS)] = ts
+
+
+def test_primera_sincronizacion_envia_toda_la_tabla(conexion, libro):
+    with conexion.escritura() as conn:
+        conn.executemany("INSERT INTO usuarios (nombre) VALUES (?)", [(f"Usuario {i}",) for i in range(5)])
+        conn.commit()
+
+    resumen = SincronizadorSheets(conexion, conectar(libro)).sincronizar("usuarios", "Usuarios")
+
+    assert resumen["enviadas"] == 5
+    # worksheet + lectura + encabezado + append
+    assert len(libro.peticiones) == 4
+    comprobar_iguales(conexion, libro)
+
+
+def test_sin_cambios_solo_lee_la_hoja(sincronizador, libro):
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert resumen == {"enviadas": 0, "borradas": 0, "recibidas": 0, "eliminadas": 0, "conflictos": 0}
+    assert len(libro.peticiones) == 2
+
+
+def test_cambios_en_la_app_se_envian(sincronizador, conexion, libro):
+    conexion.actualizar_registros("usuarios", {"ocupacion": "docente"}, "id IN (?, ?)", (1, 2))
+    conexion.eliminar_registros("usuarios", "id = ?", (3,))
+    conexion.insertar_registro("usuarios", {"nombre": "Nuevo", "edad": 30})
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert (resumen["enviadas"], resumen["borradas"], resumen["recibidas"]) == (3, 1, 0)
+    assert len(libro.peticiones) == 5  # + batch_update + append_rows + borrado
+    comprobar_iguales(conexion, libro)
+    assert fila_hoja(libro, "1")[-1].endswith("Z")  # actualizado_ts en UTC explícito
+
+
+def test_cambios_en_la_hoja_se_reciben_y_no_se_reenvian(sincronizador, conexion, libro):
+    editar(libro, "4", "edad", "99", ts=ahora_ts())
+    libro._hojas["Usuarios"].filas.append(["", "Personal"])
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert (resumen["enviadas"], resumen["recibidas"]) == (0, 2)
+    assert len(libro.peticiones) == 3  # + batch_update (id de la fila nueva)
+    comprobar_iguales(conexion, libro)
+    libro.reiniciar_conteo()
+    assert sincronizador.sincronizar("usuarios", "Usuarios")["enviadas"] == 0
+    assert len(libro.peticiones) == 2
+
+
+def test_edicion_sin_actualizado_ts_se_recibe(sincronizador, conexion, libro):
+    editar(libro, "5", "ocupacion", "jubilado")
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert resumen["recibidas"] == 1
+    assert filas_tabla(conexion, "usuarios")["5"]["ocupacion"] == "jubilado"
+
+
+def test_fila_borrada_en_la_hoja_se_borra_en_sqlite(sincronizador, conexion, libro):
+    hoja = libro._hojas["Usuarios"]
+    hoja.filas.remove(fila_hoja(libro, "6"))
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert resumen["eliminadas"] == 1
+    assert "6" not in filas_tabla(conexion, "usuarios")
+    comprobar_iguales(conexion, libro)
+
+
+def test_fila_borrada_en_la_hoja_y_modificada_en_la_app_vuelve_a_la_hoja(sincronizador, conexion, libro):
+    libro._hojas["Usuarios"].filas.remove(fila_hoja(libro, "7"))
+    conexion.actualizar_registros("usuarios", {"edad": 77}, "id = ?", (7,))
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert (resumen["eliminadas"], resumen["enviadas"], resumen["conflictos"]) == (0, 1, 1)
+    comprobar_iguales(conexion, libro)
+
+
+def test_hoja_leida_vacia_no_borra_nada(sincronizador, conexion, libro):
+    del libro._hojas["Usuarios"].filas[1:]
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert resumen["eliminadas"] == 0
+    assert len(filas_tabla(conexion, "usuarios")) == USUARIOS
+
+
+def test_conflicto_gana_el_cambio_mas_reciente(sincronizador, conexion, libro):
+    # Fila 8: la hoja cambia antes que la app (gana la app); fila 9: después (gana la hoja)
+    editar(libro, "8", "edad", "70", ts=ahora_ts())
+    time.sleep(0.01)
+    conexion.actualizar_registros("usuarios", {"edad": 50}, "id IN (?, ?)", (8, 9))
+    time.sleep(0.01)
+    editar(libro, "9", "edad", "71", ts=ahora_ts())
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert (resumen["enviadas"], resumen["recibidas"], resumen["conflictos"]) == (1, 1, 2)
+    registros = filas_tabla(conexion, "usuarios")
+    assert (registros["8"]["edad"], registros["9"]["edad"]) == (50, 71)
+    comprobar_iguales(conexion, libro)
+
+
+def test_conflicto_sin_actualizado_ts_gana_sqlite(sincronizador, conexion, libro):
+    conexion.actualizar_registros("usuarios", {"edad": 50}, "id = ?", (10,))
+    editar(libro, "10", "edad", "71")
+
+    resumen = sincronizador.sincronizar("usuarios", "Usuarios")
+
+    assert (resumen["enviadas"], resumen["recibidas"], resumen["conflictos"]) == (1, 0, 1)
+    assert filas_tabla(conexion, "usuarios")["10"]["edad"] == 50
+
+
+def test_ts_sin_zona_se_toma_en_la_zona_de_la_planilla():
+    assert normalizar_ts(["2026-01-15 10:00:00", "2026-01-15T15:00:00.000Z", "2026-01-15T10:00:00-05:00", ""],
+                         "America/Lima") == ["2026-01-15T15:00:00.000"] * 3 + [None]
+    # registro_cambios.ts (sin zona) está en UTC
+    assert normalizar_ts(["2026-01-15T15:00:00.000"]) == ["2026-01-15T15:00:00.000"]
+
+
+def test_recibir_asignaciones_recuenta_agenda_cupos(conexion, libro):
+    with conexion.escritura() as conn:
+        conn.executemany(
+            "INSERT INTO asignaciones (id_usuario, id_recurso, estado, fecha_cita) VALUES (?, ?, ?, ?)",
+            [(1, 1, "asignado", "2026-11-02"), (2, 2, "asignado", "2026-11-02"), (3, 3, "asignado", "2026-11-03")]
+        )
+        conn.execute("INSERT INTO agenda_cupos (fecha_cita, ocupados) VALUES ('2026-11-02', 2), ('2026-11-03', 1)")
+        conn.commit()
+    sincronizador = SincronizadorSheets(conexion, conectar(libro))
+    assert sincronizador.sincronizar("asignaciones", "Asignaciones") is not None
+
+    # El personal mueve una cita de día, cancela otra y agrega una nueva (sin id)
+    editar(libro, "1", "fecha_cita", "2026-11-04", hoja="Asignaciones")
+    editar(libro, "3", "estado", "cancelado", hoja="Asignaciones")
+    encabezado = libro._hojas["Asignaciones"].filas[0]
+    nueva = [""] * len(encabezado)
+    nueva[encabezado.index("estado")], nueva[encabezado.index("fecha_cita")] = "asignado", "2026-11-04"
+    libro._hojas["Asignaciones"].filas.append(nueva)
+
+    resumen = sincronizador.sincronizar("asignaciones", "Asignaciones")
+
+    assert resumen["recibidas"] == 3
+    comprobar_iguales(conexion, libro, "asignaciones", "Asignaciones")
+    with conexion.lectura() as conn:
+        cupos = dict(conn.execute("SELECT fecha_cita, ocupados FROM agenda_cupos WHERE ocupados > 0"))
+    assert cupos == {"2026-11-02": 1, "2026-11-04": 2}
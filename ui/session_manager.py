@@ -1,26 +1,134 @@
 from datetime import datetime
 
+import pandas as pd
 import streamlit as st
 import  core.priorizacion
 from data.conexion_sqlite import ConexionSQLite
+from data.almacen_compartido import copia_compartida, obtener_almacen
 from core.priorizacion import recalcular_puntajes_asignaciones
 
 conexion_activa = ConexionSQLite()
 
 
+def _cargar_tabla(tabla: str):
+    """
+    Toma la instantánea compartida de la tabla (ver data/almacen_compartido.py).
+    Con copy-on-write es una copia superficial: no duplica la memoria de la tabla.
+    """
+    instantanea = obtener_almacen(conexion_activa.db_name).instantanea(tabla)
+    st.session_state[tabla] = copia_compartida(instantanea.df)
+    st.session_state.setdefault("marcas_delta", {})[tabla] = instantanea.marca
+    st.session_state.setdefault("versiones_sesion", {})[tabla] = instantanea.version
+
+
+def _sincronizar_tabla(tabla: str):
+    """
+    Pasa la sesión a la instantánea vigente de la tabla. Solo lo que cambió
+    necesita trabajo extra (puntajes, índice de pendientes); las columnas propias
+    de la sesión (p. ej. 'puntaje') se conservan.
+
+    Returns:
+        tuple: (etiquetas de filas nuevas/modificadas, filas anteriores tocadas, set de ids borrados),
+            None si no hubo cambios, o "completa" si hubo que tomar la tabla entera.
+    """
+    almacen = obtener_almacen(conexion_activa.db_name)
+    instantanea = almacen.instantanea(tabla)
+    marca = st.session_state["marcas_delta"][tabla]
+    if instantanea.marca == marca:
+        return None
+
+    tocados = almacen.tocados_desde(instantanea, marca)
+    if tocados is None:
+        _cargar_tabla(tabla)
+        return "completa"
+
+    anterior = st.session_state[tabla]
+    nuevo = copia_compartida(instantanea.df)
+    for col in anterior.columns.difference(nuevo.columns):
+        nuevo[col] = anterior[col].reindex(nuevo.index)
+    st.session_state[tabla] = nuevo
+    st.session_state["marcas_delta"][tabla] = instantanea.marca
+    st.session_state["versiones_sesion"][tabla] = instantanea.version
+
+    presentes = nuevo["id"].isin(tocados)
+    borrados = tocados - set(nuevo.loc[presentes, "id"].tolist())
+    return nuevo.index[presentes], anterior[anterior["id"].isin(tocados)], borrados
+
+
+def _etiquetas_por_id(tabla: str) -> pd.Series:
+    """
+    Índice id -> etiqueta de fila de la tabla en sesión. Se construye una vez por
+    DataFrame (cuando la sesión toma una nueva instantánea se vuelve a armar).
+    """
+    df = st.session_state[tabla]
+    guardado = st.session_state.setdefault("etiquetas_por_id", {}).get(tabla)
+    if guardado is None or guardado[0] is not df:
+        guardado = (df, pd.Series(df.index, index=df["id"].to_numpy()))
+        st.session_state["etiquetas_por_id"][tabla] = guardado
+    return guardado[1]
+
+
+def escribir_fila(tabla: str, id_fila: int, datos: dict) -> bool:
+    """
+    Escritura "write-through" de UNA fila: el UPDATE va a SQLite y el mismo cambio se
+    aplica en el DataFrame de la sesión, ubicando la fila por id (sin recargar la tabla).
+
+    Si la escritura falla, o si la sesión no estaba al día con la DB (otra sesión escribió
+    en la tabla), en vez de parchear se sincroniza con el almacén compartido.
+
+    La comprobación "¿estaba al día?" y el UPDATE van en la misma transacción, con el
+    candado de escritura tomado hasta leer la versión nueva de la tabla: ninguna otra
+    sesión puede escribir entre medio sin que se note. Tras parchear, la sesión queda
+    en esa versión, así la siguiente escritura también se aplica sin recargar.
+
+    Args:
+        tabla (str): Nombre de la tabla (ej. 'asignaciones').
+        id_fila (int): ID de la fila a actualizar.
+        datos (dict): Los datos a cambiar (ej. {'estado': 'entregado'})
+
+    Returns:
+        bool: True si fue exitoso, False si falló.
+    """
+    version_antes = version_despues = None
+    try:
+        with conexion_activa.escritura():
+            with conexion_activa.transaccion():
+                version_antes = conexion_activa.version_tabla(tabla)
+                conexion_activa.actualizar_registros(tabla, datos, "id = ?", (id_fila,))
+            # Ya confirmada e invalidada la caché, todavía con el candado: la versión es la de ESTE UPDATE
+            version_despues = conexion_activa.version_tabla(tabla)
+        exito = True
+    except Exception as e:
+        print(f"Error al escribir la fila {id_fila} de {tabla}: {e}")
+        exito = False
+
+    versiones_sesion = st.session_state["versiones_sesion"]
+    al_dia = version_antes is not None and version_antes == versiones_sesion.get(tabla)
+    etiquetas = _etiquetas_por_id(tabla)
+    if not exito or not al_dia or id_fila not in etiquetas.index:
+        sincronizar_tablas()
+        return exito
+
+    df = st.session_state[tabla]
+    for columna, valor in datos.items():
+        df.loc[etiquetas[id_fila], columna] = valor
+
+    # Mantener al día lo que depende de la fila (puntajes / índice de pendientes)
+    if tabla == "usuarios":
+        core.priorizacion.recalcular_puntajes_incremental([etiquetas[id_fila]])
+    elif tabla == "asignaciones":
+        core.priorizacion.actualizar_pendientes({df.loc[etiquetas[id_fila], "id_usuario"]})
+
+    # La sesión ya tiene el cambio: queda en la versión posterior a su propia escritura
+    versiones_sesion[tabla] = version_despues
+    return True
+
+
 def init_session():
 
     if 'pagina_actual' not in st.session_state:
         st.session_state.pagina_actual = "Dashboard"
 
-    if "recursos" not in st.session_state:
-        st.session_state["recursos"] = conexion_activa.cargar_tabla_df("recursos")
-        print(st.session_state["recursos"])
-
-    if "asignaciones" not in st.session_state:
-        st.session_state["asignaciones"] = conexion_activa.cargar_tabla_df("asignaciones")
-        print(st.session_state["asignaciones"])
-
     # Inicializa los pesos globales con un valor por defecto
     if "pesos_globales" not in st.session_state:
         st.session_state["pesos_globales"] = {"ocupacion": 4, "acceso_internet": 5, "dispositivo_propio": 4, "edad": 3}
@@ -33,18 +141,68 @@ def init_session():
     if "last_saved" not in st.session_state:
         st.session_state["last_saved"] = None
 
+    sincronizar_tablas()
+
+
+def sincronizar_tablas():
+    """
+    Carga las tablas en la sesión (primera vez) o la pone al día con lo que cambió
+    en la DB, usando las instantáneas del almacén compartido.
+    """
+    if "recursos" not in st.session_state:
+        _cargar_tabla("recursos")
+    else:
+        _sincronizar_tabla("recursos")
+
+    if "asignaciones" not in st.session_state:
+        _cargar_tabla("asignaciones")
+        # Cambió el conjunto de usuarios con cita: reconstruir el índice de pendientes
+        st.session_state.pop("indice_pendientes", None)
+        cambios_asignaciones = None
+    else:
+        cambios_asignaciones = _sincronizar_tabla("asignaciones")
+
     # inicializar data en session_state para no recargar constantemente
     if "usuarios" not in st.session_state:
-        st.session_state["usuarios"] = conexion_activa.cargar_tabla_df("usuarios")
-        print(st.session_state["usuarios"])
+        _cargar_tabla("usuarios")
 
         if "puntaje" not in st.session_state["usuarios"].columns:
             # 2. Si no existe, créala y asígnale un valor por defecto (ej. 0.0)
             st.session_state["usuarios"]["puntaje"] = 0.0
             print("Columna 'puntaje' virtual añadida a st.session_state['usuarios'].")
 
-    print("Primera carga: Calculando puntajes iniciales...")
-    recalcular_puntajes_asignaciones()
+        # Tabla recién cargada: sus puntajes aún no corresponden a ningún peso
+        st.session_state.pop("pesos_puntaje", None)
+        st.session_state.pop("codigos_usuarios", None)
+        st.session_state.pop("indice_pendientes", None)
+    else:
+        cambios_usuarios = _sincronizar_tabla("usuarios")
+        if cambios_usuarios == "completa":
+            st.session_state["usuarios"]["puntaje"] = 0.0
+            st.session_state.pop("pesos_puntaje", None)
+            st.session_state.pop("codigos_usuarios", None)
+            st.session_state.pop("indice_pendientes", None)
+        elif cambios_usuarios is not None:
+            # Solo se puntúan las filas nuevas/modificadas; los borrados salen del índice
+            etiquetas, _, borrados = cambios_usuarios
+            indice = st.session_state.get("indice_pendientes")
+            for id_usuario in borrados:
+                if indice is not None: indice.eliminar(id_usuario)
+            core.priorizacion.recalcular_puntajes_incremental(etiquetas)
+
+    # Recálculo completo solo si la tabla se recargó o cambiaron los pesos
+    if core.priorizacion.pesos_cambiaron():
+        print("Primera carga: Calculando puntajes iniciales...")
+        recalcular_puntajes_asignaciones()
+
+    # Asignaciones que cambiaron: revisar solo a sus usuarios en el índice de pendientes
+    if cambios_asignaciones == "completa":
+        st.session_state.pop("indice_pendientes", None)
+    elif cambios_asignaciones is not None:
+        etiquetas, anteriores, _ = cambios_asignaciones
+        asignaciones = st.session_state["asignaciones"]
+        ids_usuario = set(asignaciones.loc[etiquetas, "id_usuario"].dropna()) | set(anteriores["id_usuario"].dropna())
+        core.priorizacion.actualizar_pendientes(ids_usuario)
 
 # --- FUNCIONES DE MANEJO DE ESTADO ---
 